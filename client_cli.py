@@ -1,51 +1,94 @@
-import socket
+"""
+Cliente interactivo por consola, sobre la biblioteca de src/client.py.
+
+    python client_cli.py <host> <port> [--binary] [--compress] [--reconnect] [--tls] [--cafile=PEM]
+
+Con --compress se negocia binario con compresión (los lotes difundidos
+llegan comprimidos si el servidor la acepta). Con --reconnect, si se corta
+la conexión se reconecta y recibe lo que se difundió mientras tanto
+(requiere historial en el servidor; implica --binary). Con --tls la
+conexión va cifrada; --cafile=PEM (implica --tls) verifica contra ese
+certificado, p. ej. uno autofirmado de src/tls.py.
+"""
+
+import asyncio
 import sys
 import threading
 
-def recv_loop(rf, stop_event):
+from src.client import ChatClient
+from src.tls import make_client_context
+
+
+def stdin_loop(loop, lines: asyncio.Queue):
+    # input() bloquea: corre en un hilo daemon y pasa cada línea al loop
     try:
-        while not stop_event.is_set():
-            line = rf.readline()
-            if line == "":
-                print("\n[client] servidor cerró la conexión.")
-                stop_event.set()
-                break
-            print(f"\r[recv] {line.rstrip()}\n> ", end="", flush=True)
-    except Exception:
-        # Cierre o error: salimos del loop
-        stop_event.set()
+        while True:
+            loop.call_soon_threadsafe(lines.put_nowait, input("> "))
+    except (EOFError, RuntimeError):
+        pass
+    try:
+        loop.call_soon_threadsafe(lines.put_nowait, None)
+    except RuntimeError:
+        pass  # el loop ya terminó
 
-def main():
-    if len(sys.argv) != 3:
-        print("Uso: python client_cli.py <host> <port>")
-        sys.exit(1)
 
-    host, port = sys.argv[1], int(sys.argv[2])
-    s = socket.create_connection((host, port))
-    rf = s.makefile("r", encoding="utf-8", newline="\n")
-    wf = s.makefile("w", encoding="utf-8", newline="\n")
+async def recv_loop(client: ChatClient, lines: asyncio.Queue):
+    while True:
+        batch = await client.recv_batch()
+        if not batch and client.closed:
+            print("\n[client] servidor cerró la conexión.")
+            lines.put_nowait(None)
+            return
+        for text in batch:
+            print(f"\r[recv] {text}\n> ", end="", flush=True)
 
-    stop_event = threading.Event()
-    t = threading.Thread(target=recv_loop, args=(rf, stop_event), daemon=True)
-    t.start()
 
+async def run(host: str, port: int, binary: bool, compress: bool, reconnect: bool, tls=None):
+    client = ChatClient(
+        host, port, binary=binary, compress=compress, reconnect=reconnect, tls=tls,
+    )
+    await client.connect()
     print(f"[client] conectado a {host}:{port}. Escribe y Enter. Ctrl+C para salir.")
+    lines: asyncio.Queue = asyncio.Queue()
+    threading.Thread(
+        target=stdin_loop, args=(asyncio.get_running_loop(), lines), daemon=True
+    ).start()
+    receiver = asyncio.create_task(recv_loop(client, lines))
     try:
-        while not stop_event.is_set():
-            line = input("> ")
-            wf.write(line.rstrip("\r\n") + "\n")
-            wf.flush()
+        while True:
+            line = await lines.get()
+            if line is None:
+                break
+            client.send(line.rstrip("\r\n"))
+    finally:
+        receiver.cancel()
+        await client.close()
+
+
+def main():
+    args = sys.argv[1:]
+    flags = {a for a in args if a.startswith("--")}
+    args = [a for a in args if not a.startswith("--")]
+    cafiles = {f for f in flags if f.startswith("--cafile=")}
+    flags -= cafiles
+    if len(args) != 2 or len(cafiles) > 1 or flags - {"--binary", "--compress", "--reconnect", "--tls"}:
+        print(
+            "Uso: python client_cli.py <host> <port> [--binary] [--compress] [--reconnect]"
+            " [--tls] [--cafile=PEM]"
+        )
+        sys.exit(1)
+
+    host, port = args[0], int(args[1])
+    tls = None
+    if cafiles or "--tls" in flags:
+        tls = make_client_context(cafiles.pop().partition("=")[2] if cafiles else None)
+    try:
+        asyncio.run(run(
+            host, port, "--binary" in flags, "--compress" in flags, "--reconnect" in flags, tls,
+        ))
     except KeyboardInterrupt:
         pass
-    finally:
-        stop_event.set()
-        try: rf.close()
-        except: pass
-        try: wf.close()
-        except: pass
-        try: s.close()
-        except: pass
-        print("\n[client] bye")
+    print("\n[client] bye")
 
 if __name__ == "__main__":
     main()
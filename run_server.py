@@ -1,10 +1,240 @@
-from src.server import ChatServer
+from src.server import (
+    ChatServer,
+    DEFAULT_BATCH_LINGER,
+    DEFAULT_BATCH_MAX,
+    DEFAULT_COMPRESS_MIN_BYTES,
+    DEFAULT_HISTORY_SIZE,
+    DEFAULT_KEEPALIVE_IDLE,
+    DEFAULT_LISTEN_BACKLOG,
+    DEFAULT_MAX_PENDING,
+)
+from src.message_log import DEFAULT_FSYNC_INTERVAL, DEFAULT_SEGMENT_BYTES
+from src.validation import BYTES, CHARS, MAX_LEN
+from src.bus import DEFAULT_RELAY_QUEUE_BYTES, RelayBus
+from src.event_server import EventChatServer
+from src.cluster import Cluster
+from src.tls import DEFAULT_HANDSHAKE_TIMEOUT
+from src.connection import (
+    DEFAULT_MAX_QUEUE_BYTES,
+    DEFAULT_MAX_QUEUE_MESSAGES,
+    DISCONNECT,
+    POLICIES,
+)
+import argparse
 import signal
 import sys
 import time
 
-def main():
-    srv = ChatServer(host="127.0.0.1", port=0)
+ENGINES = {"threads": ChatServer, "selectors": EventChatServer}
+
+def _address(text: str) -> tuple[str, int]:
+    host, sep, port = text.rpartition(":")
+    if not sep or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"se esperaba HOST:PUERTO: {text!r}")
+    return host or "127.0.0.1", int(port)
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Servidor de chat TCP")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=0)
+    ap.add_argument(
+        "--engine", choices=sorted(ENGINES), default="threads",
+        help="threads: un hilo por cliente; selectors: un único hilo de E/S",
+    )
+    ap.add_argument(
+        "--max-queue-bytes", type=int, default=DEFAULT_MAX_QUEUE_BYTES,
+        help="límite de la cola de salida por cliente en bytes (0 = sin límite)",
+    )
+    ap.add_argument(
+        "--max-queue-messages", type=int, default=DEFAULT_MAX_QUEUE_MESSAGES,
+        help="límite de la cola de salida por cliente en mensajes (0 = sin límite)",
+    )
+    ap.add_argument(
+        "--slow-policy", choices=POLICIES, default=DISCONNECT,
+        help="qué hacer cuando un cliente lento llena su cola",
+    )
+    ap.add_argument(
+        "--batch-max", type=int, default=DEFAULT_BATCH_MAX,
+        help="máximo de mensajes que se difunden juntos en un envío por cliente",
+    )
+    ap.add_argument(
+        "--batch-linger", type=float, default=DEFAULT_BATCH_LINGER,
+        help="segundos que se retiene un mensaje para ordenarlo por llegada",
+    )
+    ap.add_argument(
+        "--no-metrics", dest="metrics", action="store_false",
+        help="desactiva las métricas (el comando STATS responde ERR)",
+    )
+    ap.add_argument(
+        "--history-size", type=int, default=DEFAULT_HISTORY_SIZE,
+        help="mensajes retenidos para HISTORY/SINCE (0 = sin historial)",
+    )
+    ap.add_argument(
+        "--history-replay", type=int, default=0,
+        help="mensajes del historial que recibe cada cliente al conectarse",
+    )
+    ap.add_argument(
+        "--log-dir",
+        help="directorio del log durable de mensajes (por defecto: sin log)",
+    )
+    ap.add_argument(
+        "--log-segment-bytes", type=int, default=DEFAULT_SEGMENT_BYTES,
+        help="tamaño a partir del cual el log abre un segmento nuevo",
+    )
+    ap.add_argument(
+        "--log-fsync-interval", type=float, default=DEFAULT_FSYNC_INTERVAL,
+        help="segundos máximos entre fsync del log (0 = tras cada escritura)",
+    )
+    ap.add_argument(
+        "--rate-limit", type=float, default=0,
+        help="mensajes por segundo por conexión (0 = sin límite)",
+    )
+    ap.add_argument(
+        "--rate-burst", type=float, default=0,
+        help="ráfaga permitida por conexión (por defecto, igual a --rate-limit)",
+    )
+    ap.add_argument(
+        "--global-rate-limit", type=float, default=0,
+        help="mensajes por segundo entre todas las conexiones (0 = sin límite)",
+    )
+    ap.add_argument(
+        "--global-rate-burst", type=float, default=0,
+        help="ráfaga permitida global (por defecto, igual a --global-rate-limit)",
+    )
+    ap.add_argument(
+        "--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+        help="mensajes esperando difusión antes de dejar de leer clientes (0 = sin límite)",
+    )
+    ap.add_argument(
+        "--max-message-len", type=int, default=MAX_LEN,
+        help="largo máximo de un mensaje (en la unidad de --length-unit)",
+    )
+    ap.add_argument(
+        "--length-unit", choices=(CHARS, BYTES), default=CHARS,
+        help="contar --max-message-len en caracteres o en bytes UTF-8",
+    )
+    ap.add_argument(
+        "--reject-control", action="store_true",
+        help="rechazar mensajes con caracteres de control (salvo tab)",
+    )
+    ap.add_argument(
+        "--max-connections", type=int, default=0,
+        help="conexiones simultáneas; las de más reciben ERR y se cierran (0 = sin tope)",
+    )
+    ap.add_argument(
+        "--listen-backlog", type=int, default=DEFAULT_LISTEN_BACKLOG,
+        help="conexiones completadas esperando accept()",
+    )
+    ap.add_argument(
+        "--keepalive-idle", type=float, default=DEFAULT_KEEPALIVE_IDLE,
+        help="segundos sin tráfico antes de las sondas de TCP keepalive (0 = sin keepalive)",
+    )
+    ap.add_argument(
+        "--idle-timeout", type=float, default=0,
+        help="cerrar clientes que no envían nada en estos segundos (0 = nunca)",
+    )
+    ap.add_argument(
+        "--drain-timeout", type=float, default=2.0,
+        help="al detener, segundos para difundir y enviar lo pendiente antes de cerrar",
+    )
+    ap.add_argument(
+        "--no-compression", dest="compression", action="store_false",
+        help="no aceptar \"BINARY ZLIB\" (lotes difundidos comprimidos)",
+    )
+    ap.add_argument(
+        "--compress-min-bytes", type=int, default=DEFAULT_COMPRESS_MIN_BYTES,
+        help="lotes más chicos se envían sin comprimir",
+    )
+    ap.add_argument(
+        "--trace-sample", type=int, default=0, metavar="N",
+        help="trazar 1 de cada N mensajes por etapa (comando TRACE; SIGUSR1 lo vuelca; 0 = no)",
+    )
+    ap.add_argument(
+        "--fanout-workers", type=int, default=0,
+        help="hilos emisores (shards de conexiones) para enviar cada lote (0 = el broadcaster)",
+    )
+    ap.add_argument(
+        "--workers", type=int, default=1,
+        help="procesos que comparten el puerto (>1 requiere fork: Linux/macOS)",
+    )
+    ap.add_argument(
+        "--relay-listen", type=_address, metavar="HOST:PUERTO",
+        help="escuchar a otros nodos (relay TCP entre servidores independientes)",
+    )
+    ap.add_argument(
+        "--relay-peer", type=_address, action="append", default=[], metavar="HOST:PUERTO",
+        help="--relay-listen de otro nodo (repetir por cada uno; la malla debe ser completa)",
+    )
+    ap.add_argument(
+        "--relay-queue-bytes", type=int, default=DEFAULT_RELAY_QUEUE_BYTES,
+        help="cola por nodo par; llena, se descartan los mensajes más viejos",
+    )
+    ap.add_argument("--tls-cert", help="certificado PEM: activa TLS (handshakes fuera del accept)")
+    ap.add_argument("--tls-key", help="clave PEM (si no está en --tls-cert)")
+    ap.add_argument(
+        "--tls-handshake-timeout", type=float, default=DEFAULT_HANDSHAKE_TIMEOUT,
+        help="segundos para completar el handshake TLS; después se cierra",
+    )
+    ap.add_argument(
+        "--tls-handshake-threads", type=int, default=1,
+        help="hilos que completan handshakes TLS",
+    )
+    args = ap.parse_args(argv)
+    if args.tls_key and not args.tls_cert:
+        ap.error("--tls-key requiere --tls-cert")
+    if args.relay_peer and not args.relay_listen:
+        ap.error("--relay-peer requiere --relay-listen")
+    if args.relay_listen and args.workers > 1:
+        ap.error("--relay-listen no se combina con --workers")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = dict(
+        max_queue_bytes=args.max_queue_bytes,
+        max_queue_messages=args.max_queue_messages,
+        slow_consumer_policy=args.slow_policy,
+        batch_max=args.batch_max,
+        batch_linger=args.batch_linger,
+        metrics=args.metrics,
+        history_size=args.history_size,
+        history_replay=args.history_replay,
+        log_dir=args.log_dir,
+        log_segment_bytes=args.log_segment_bytes,
+        log_fsync_interval=args.log_fsync_interval,
+        rate_limit=args.rate_limit,
+        rate_burst=args.rate_burst,
+        global_rate_limit=args.global_rate_limit,
+        global_rate_burst=args.global_rate_burst,
+        max_pending=args.max_pending,
+        max_message_len=args.max_message_len,
+        length_unit=args.length_unit,
+        reject_control=args.reject_control,
+        max_connections=args.max_connections,
+        listen_backlog=args.listen_backlog,
+        keepalive_idle=args.keepalive_idle,
+        idle_timeout=args.idle_timeout,
+        drain_timeout=args.drain_timeout,
+        fanout_workers=args.fanout_workers,
+        compression=args.compression,
+        compress_min_bytes=args.compress_min_bytes,
+        trace_sample=args.trace_sample,
+        tls_cert=args.tls_cert,
+        tls_key=args.tls_key,
+        tls_handshake_timeout=args.tls_handshake_timeout,
+        tls_handshake_threads=args.tls_handshake_threads,
+    )
+    if args.workers > 1:
+        srv = Cluster(
+            args.workers, host=args.host, port=args.port,
+            engine=ENGINES[args.engine], **options,
+        )
+    else:
+        if args.relay_listen:
+            options["bus"] = RelayBus(
+                args.relay_listen, args.relay_peer, max_queue_bytes=args.relay_queue_bytes,
+            )
+        srv = ENGINES[args.engine](host=args.host, port=args.port, **options)
     srv.start()
     h, p = srv.address
     print(f"[server] listening on {h}:{p}. Press Ctrl+C to stop.")
@@ -12,11 +242,21 @@ def main():
     def _stop(*args):
         print("\n[server] stopping...")
         srv.stop()
+        metrics = getattr(srv, "metrics", None)
+        if metrics is not None:
+            print(f"[server] stopped in {metrics.shutdown_ns.max / 1e6:.1f} ms")
         sys.exit(0)
 
     signal.signal(signal.SIGINT, _stop)
     signal.signal(signal.SIGTERM, _stop)
 
+    tracer = getattr(srv, "tracer", None)  # con --workers, TRACE en cada worker
+    if tracer is not None and hasattr(signal, "SIGUSR1"):
+        def _dump_trace(*args):
+            print("\n".join(tracer.render()), file=sys.stderr, flush=True)
+
+        signal.signal(signal.SIGUSR1, _dump_trace)
+
     # dormir “para siempre” hasta que llegue la señal
     try:
         while True:
@@ -0,0 +1,251 @@
+"""
+Backends de difusión (pub/sub) entre el broadcaster y los clientes.
+
+El broadcaster de cada ChatServer no entrega sus lotes directo: los publica
+en un bus, y el bus llama a `deliver` con cada lote que deben recibir los
+clientes de ese nodo. Interfaz (la misma que `HubBus` en src/cluster.py):
+- `start(deliver)`: arranca; `deliver(batch)` entrega un lote ya ordenado
+  de (sala, payload) a los clientes locales.
+- `publish(batch)`: publica un lote que salió del broadcaster de este nodo.
+- `close()`.
+
+Backends:
+- `LocalBus` (por defecto): un solo nodo; `publish` entrega directo.
+- `RelayBus`: varios servidores independientes (detrás de un balanceador)
+  en malla TCP. Cada nodo entrega lo suyo localmente y lo reenvía a cada par
+  por una conexión propia; lo que llega de un par se entrega sin reenviarlo
+  (un salto: la malla debe ser completa). Los lotes se codifican una vez y
+  se agrupan por par en un solo envío; cada par tiene una cola acotada que
+  descarta lo más viejo si el par no lee o está caído (`dropped`).
+  El orden de los mensajes de un mismo nodo se conserva en todos; mensajes
+  de nodos distintos pueden intercalarse distinto en cada nodo (para un
+  orden global único está el hub de src/cluster.py).
+
+Formato en el cable (bus y relay): un mensaje por línea, '*' + payload para
+todos o '@' + payload para una sala (el payload ya empieza con "#sala ").
+"""
+
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from src.connection import DROP_OLDEST, RECV_SIZE, OutboundQueue
+
+Batch = List[Tuple["str | None", bytes]]
+
+# Cola por par: lo que se acumula mientras un par no lee o está caído
+DEFAULT_RELAY_QUEUE_BYTES = 8 << 20
+# Espera entre intentos de conexión a un par caído (segundos)
+RECONNECT_DELAY = 0.2
+
+
+def encode_batch(batch: Iterable[Tuple["str | None", bytes]]) -> bytes:
+    return b"".join(
+        (b"*" if room is None else b"@") + payload + b"\n" for room, payload in batch
+    )
+
+
+def decode_line(line: bytes) -> Tuple["str | None", bytes]:
+    payload = line[1:]
+    if line[:1] == b"*":
+        return None, payload
+    return payload.partition(b" ")[0].decode("utf-8"), payload
+
+
+def read_batches(sock: socket.socket, deliver: Callable[[Batch], None]):
+    """Lee líneas del bus hasta EOF y entrega las completas de cada recv como un lote."""
+    buf = bytearray()
+    while True:
+        data = sock.recv(RECV_SIZE)
+        if not data:
+            return
+        buf += data
+        cut = buf.rfind(b"\n") + 1
+        if cut:
+            lines = bytes(buf[: cut - 1]).split(b"\n")
+            del buf[:cut]
+            deliver([decode_line(line) for line in lines])
+
+
+class LocalBus:
+    """Un solo nodo: lo publicado se entrega en el mismo hilo."""
+
+    def __init__(self, deliver: Callable[[Batch], None] | None = None):
+        self._deliver = deliver
+
+    def start(self, deliver: Callable[[Batch], None]):
+        self._deliver = deliver
+
+    def publish(self, batch: Batch):
+        self._deliver(batch)
+
+    def close(self):
+        pass
+
+
+class _Peer:
+    """Un par remoto: su cola acotada y el hilo que se la envía."""
+
+    def __init__(self, address: Tuple[str, int], max_bytes: int):
+        self.address = address
+        self.outq = OutboundQueue(max_bytes=max_bytes, max_messages=0, policy=DROP_OLDEST)
+        self.ready = threading.Event()
+        self.sock: socket.socket | None = None
+
+
+class RelayBus:
+    """
+    Relay TCP entre nodos. `listen` es la dirección donde recibe de los
+    pares; `peers`, las direcciones de escucha de los demás nodos (también
+    se pueden agregar con `add_peer`, p. ej. cuando se conocen los puertos).
+    """
+
+    def __init__(
+        self,
+        listen: Tuple[str, int] = ("127.0.0.1", 0),
+        peers: Iterable[Tuple[str, int]] = (),
+        max_queue_bytes: int = DEFAULT_RELAY_QUEUE_BYTES,
+    ):
+        if max_queue_bytes < 1:
+            raise ValueError("max_queue_bytes debe ser >= 1")
+        self.max_queue_bytes = max_queue_bytes
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(listen)
+        sock.listen(16)
+        self.sock = sock
+        self.peers: Dict[Tuple[str, int], _Peer] = {}
+        self._deliver: Callable[[Batch], None] | None = None
+        # un nodo entrega de a un lote: lo propio (broadcaster) y lo que
+        # llega de cada par (un hilo por par) forman una sola secuencia
+        self._deliver_lock = threading.Lock()
+        self._running = threading.Event()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._inbound: List[socket.socket] = []
+        for address in peers:
+            self.add_peer(address)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.sock.getsockname()
+
+    @property
+    def dropped(self) -> int:
+        """Mensajes descartados por colas de pares llenas."""
+        return sum(peer.outq.dropped for peer in list(self.peers.values()))
+
+    def add_peer(self, address: Tuple[str, int]):
+        address = (address[0], int(address[1]))
+        with self._lock:
+            if address in self.peers:
+                return
+            peer = self.peers[address] = _Peer(address, self.max_queue_bytes)
+            if self._running.is_set():
+                self._start_sender(peer)
+
+    # -------- ciclo de vida --------
+
+    def start(self, deliver: Callable[[Batch], None]):
+        self._deliver = deliver
+        self._running.set()
+        self._spawn(self._accept_loop, "relay-accept")
+        with self._lock:
+            for peer in self.peers.values():
+                self._start_sender(peer)
+
+    def close(self):
+        self._running.clear()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        with self._lock:
+            for peer in self.peers.values():
+                peer.ready.set()
+            # despierta a los hilos bloqueados en un envío o un recv
+            for s in [peer.sock for peer in self.peers.values()] + self._inbound:
+                if s is None:
+                    continue
+                try:
+                    s.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        for t in self._threads:
+            t.join(timeout=1.0)
+        self._threads = []
+
+    def _spawn(self, target, name: str, *args):
+        t = threading.Thread(target=target, args=args, name=name, daemon=True)
+        self._threads.append(t)
+        t.start()
+
+    def _start_sender(self, peer: _Peer):
+        self._spawn(self._send_loop, f"relay-send-{peer.address[1]}", peer)
+
+    # -------- publicación --------
+
+    def publish(self, batch: Batch):
+        self._deliver_local(batch)
+        peers = list(self.peers.values())
+        if not peers:
+            return
+        data = encode_batch(batch)  # una vez, compartido por todas las colas
+        for peer in peers:
+            peer.outq.push(data, len(batch))
+            peer.ready.set()
+
+    def _deliver_local(self, batch: Batch):
+        with self._deliver_lock:
+            self._deliver(batch)
+
+    def _send_loop(self, peer: _Peer):
+        while self._running.is_set():
+            if peer.sock is None:
+                try:
+                    sock = socket.create_connection(peer.address, timeout=1.0)
+                except OSError:
+                    time.sleep(RECONNECT_DELAY)
+                    continue
+                sock.settimeout(None)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                peer.sock = sock
+            chunks = peer.outq.pop_batch()
+            if not chunks:
+                peer.ready.wait(0.5)
+                peer.ready.clear()
+                continue
+            try:
+                # todo lo acumulado para este par (varios lotes) en un envío
+                peer.sock.sendall(b"".join(chunks))
+            except OSError:
+                # par caído: lo que estaba saliendo se pierde con la conexión
+                peer.sock.close()
+                peer.sock = None
+        if peer.sock is not None:
+            peer.sock.close()
+
+    # -------- recepción --------
+
+    def _accept_loop(self):
+        while self._running.is_set():
+            try:
+                s, _addr = self.sock.accept()
+            except OSError:
+                return
+            with self._lock:
+                self._inbound.append(s)
+            self._spawn(self._read_loop, "relay-recv", s)
+
+    def _read_loop(self, sock: socket.socket):
+        try:
+            read_batches(sock, self._deliver_local)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                if sock in self._inbound:
+                    self._inbound.remove(sock)
+            sock.close()
@@ -0,0 +1,551 @@
+"""
+Cliente asyncio del servidor de chat (biblioteca).
+
+Un solo event loop maneja miles de conexiones, sin un hilo por conexión, así
+que sirve para generar carga realista desde un proceso:
+- Envíos en pipeline: `send`/`send_many` codifican y escriben sin esperar
+  respuesta (`send_many` junta todo en un único write); `drain()` espera
+  cuando el transporte tiene demasiado sin enviar.
+- Lecturas por lotes: lo que trae cada recv se separa de una vez (líneas o
+  frames, con el mismo formato de src/protocol.py) y `recv_batch()` devuelve
+  todo lo acumulado en una sola llamada.
+- Reconexión con reanudación (`reconnect=True`, requiere historial en el
+  servidor; implica el framing binario): el cliente lleva la secuencia del
+  último mensaje visto ("END n" de HISTORY/SINCE más los mensajes recibidos
+  en vivo). Al reconectar vuelve a negociar el framing, a registrar su
+  apodo y entrar en sus salas y pide "SINCE n" (y otro más por cada
+  "MORE n", si la respuesta sale del log por tramos): lo difundido mientras
+  estaba caído llega como mensajes normales antes que lo nuevo, y lo
+  enviado mientras tanto sale después (lo que estaba en vuelo al caerse
+  puede perderse). Los mensajes de salas de las que no es miembro también
+  consumen secuencia: con ellos la cuenta queda atrás y la reanudación puede
+  repetir mensajes, nunca perderlos.
+
+En modo línea una respuesta del servidor se reconoce por su prefijo (ver
+`REPLY_PREFIXES`); en binario, por el tipo de frame. El prefijo es ambiguo
+(cualquiera puede difundir "END 99999"), así que la secuencia de la
+reanudación solo se lleva sobre frames. Con `compress=True` se
+negocia "BINARY ZLIB" y los lotes comprimidos (FRAME_ZMSG) se expanden al
+recibirlos; si el servidor no comprime, queda en binario (`compressed`).
+Con `tls=` (un ssl.SSLContext de cliente, ver src/tls.py) la conexión va
+cifrada; asyncio no expone la sesión TLS, así que cada reconexión hace un
+handshake completo.
+
+`BlockingClient` envuelve un ChatClient para código síncrono (tests,
+scripts): corre en un `ClientLoop`, un event loop en un hilo propio que
+comparten todos los clientes.
+"""
+
+import asyncio
+import collections
+import ssl
+import threading
+from typing import Iterable, List
+
+from src.protocol import (
+    BINARY_COMMAND,
+    BINARY_OK,
+    BINARY_ZLIB_OK,
+    COMPRESS_OPTION,
+    FRAME_CMD,
+    FRAME_DM,
+    FRAME_MSG,
+    FRAME_ZMSG,
+    FrameReader,
+    decompress_frames,
+    encode_frame,
+    encode_line,
+    encode_payload,
+)
+
+# Primeras palabras que en modo binario viajan como comando (FRAME_CMD)
+COMMANDS = frozenset(
+    ("JOIN", "PART", "ROOM", "STATS", "TRACE", "BINARY", "HISTORY", "SINCE", "PING", "NICK",
+     "MSG")
+)
+# Respuestas del servidor en modo línea (el resto son mensajes difundidos)
+REPLY_PREFIXES = ("OK ", "ERR ", "STAT ", "TRACE ", "HIST ", "GAP ", "END ", "MORE ")
+REPLY_WORDS = frozenset(("END", "PONG"))
+
+CONNECT_TIMEOUT = 5.0
+# Reconexión: espera inicial, duplicada en cada intento fallido hasta el tope
+RECONNECT_DELAY = 0.2
+MAX_RECONNECT_DELAY = 5.0
+# Conexiones abiertas a la vez por `connect_many` (no desbordar el backlog)
+CONNECT_CONCURRENCY = 100
+
+# Qué hacer con un bloque HIST/GAP/END que no pidió el usuario
+_RAW = "raw"        # repetición de historial al conectar: se entrega tal cual
+_SKIP = "skip"      # la misma repetición al reconectar: la cubre el SINCE
+_RESUME = "resume"  # respuesta a nuestro SINCE/HISTORY 0: fija la secuencia
+
+
+def is_reply(text: str) -> bool:
+    """True si una línea recibida en modo línea es respuesta del servidor."""
+    return text in REPLY_WORDS or text.startswith(REPLY_PREFIXES)
+
+
+def _parse_hist(text: str):
+    """(seq, texto) de una línea "HIST <seq> <texto>", o None."""
+    _, seq, payload = (text.split(" ", 2) + [""])[:3]
+    return (int(seq), payload) if seq.isdigit() else None
+
+
+class _Protocol(asyncio.Protocol):
+    """Una conexión TCP de un ChatClient (cada reconexión crea otra)."""
+
+    def __init__(self, client: "ChatClient"):
+        self.client = client
+        self.lost = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        # antes de que vuelva create_connection: los datos pueden llegar ya
+        self.client._proto = self
+
+    def data_received(self, data: bytes):
+        if self.client._proto is self:
+            self.client._on_data(data)
+
+    def connection_lost(self, exc):
+        if not self.lost.done():
+            self.lost.set_result(None)
+        if self.client._proto is self:
+            self.client._on_lost()
+
+    def pause_writing(self):
+        self.client._paused = True
+
+    def resume_writing(self):
+        client = self.client
+        client._paused = False
+        if client._drain_waiter is not None and not client._drain_waiter.done():
+            client._drain_waiter.set_result(None)
+
+
+class ChatClient:
+    """
+    Una conexión al servidor. Todos los métodos se llaman desde el event
+    loop donde se conectó (`connect`).
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        *,
+        binary: bool = False,
+        compress: bool = False,
+        reconnect: bool = False,
+        server_replay: bool = False,
+        reconnect_delay: float = RECONNECT_DELAY,
+        tls: ssl.SSLContext | None = None,
+    ):
+        self.host = host
+        self.port = port
+        self.tls = tls
+        # la compresión solo existe sobre el framing binario, y la
+        # reanudación también: en líneas un mensaje imita una respuesta
+        self.binary = binary or compress or reconnect
+        self.compress = compress
+        # el servidor aceptó comprimir (se vuelve a negociar al reconectar)
+        self.compressed = False
+        self.reconnect = reconnect
+        # el servidor repite historial al conectar (history_replay > 0)
+        self.server_replay = server_replay
+        self.reconnect_delay = reconnect_delay
+        # Secuencia del último mensaje visto (None = desconocida)
+        self.last_seq: int | None = None
+        self.rooms: set = set()
+        self.nick: str | None = None
+        self.reconnects = 0
+
+        self._proto: _Protocol | None = None
+        self._transport: asyncio.Transport | None = None
+        self._inbuf = bytearray()
+        self._frames: FrameReader | None = None
+        self._hello: asyncio.Future | None = None
+        # Lo que se envía antes de terminar el handshake (o estando caído)
+        self._outbox: List[bytes] = []
+        self._ready = False
+        self._received: collections.deque = collections.deque()
+        self._waiter: asyncio.Future | None = None
+        self._blocks: collections.deque = collections.deque()
+        # respuestas "OK" a lo que el handshake repite al reconectar
+        self._handshake_oks = 0
+        self._resuming = False
+        self._paused = False
+        self._drain_waiter: asyncio.Future | None = None
+        self._reconnect_task: asyncio.Task | None = None
+        self._closed = False
+        self._eof = False
+
+    @property
+    def connected(self) -> bool:
+        return self._ready
+
+    @property
+    def closed(self) -> bool:
+        """La conexión terminó y no se va a reconectar."""
+        return self._eof
+
+    # -------- conexión --------
+
+    async def connect(self):
+        """Conecta y completa el handshake (framing, salas, secuencia)."""
+        await self._open(resuming=False)
+
+    async def _open(self, resuming: bool):
+        loop = asyncio.get_running_loop()
+        self._inbuf.clear()
+        self._frames = None
+        self._hello = loop.create_future() if self.binary else None
+        transport, proto = await asyncio.wait_for(
+            loop.create_connection(
+                lambda: _Protocol(self), self.host, self.port,
+                ssl=self.tls, server_hostname=self.host if self.tls else None,
+            ),
+            CONNECT_TIMEOUT,
+        )
+        self._transport = transport
+        self._paused = False
+        self._blocks.clear()
+        if self.server_replay:
+            self._blocks.append(_SKIP if resuming else _RAW)
+        try:
+            if self.binary:
+                # hasta "OK BINARY" todo va en líneas (ver negotiate_binary)
+                command = BINARY_COMMAND
+                if self.compress:
+                    command += " " + COMPRESS_OPTION
+                transport.write(encode_line(command))
+                await asyncio.wait_for(self._hello, CONNECT_TIMEOUT)
+            handshake = []
+            if resuming:
+                again = [f"NICK {self.nick}"] if self.nick is not None else []
+                again += [f"JOIN {room}" for room in sorted(self.rooms)]
+                handshake += [self._encode(text) for text in again]
+                self._handshake_oks = len(again)
+            if self.reconnect:
+                if self.last_seq is None:
+                    handshake.append(self._encode("HISTORY 0"))
+                else:
+                    handshake.append(self._encode(f"SINCE {self.last_seq}"))
+                self._blocks.append(_RESUME)
+                self._resuming = resuming
+        except BaseException:
+            transport.abort()
+            raise
+        handshake += self._outbox
+        self._outbox = []
+        if handshake:
+            transport.write(b"".join(handshake))
+        self._ready = True
+        self._eof = False
+
+    def _on_lost(self):
+        was_ready, self._ready = self._ready, False
+        self._transport = None
+        if self._hello is not None and not self._hello.done():
+            self._hello.set_exception(ConnectionError("el servidor cerró durante la negociación"))
+        if self._drain_waiter is not None and not self._drain_waiter.done():
+            self._drain_waiter.set_result(None)
+        if self.reconnect and was_ready and not self._closed:
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+            return
+        self._eof = True
+        self._wake()
+
+    async def _reconnect(self):
+        delay = self.reconnect_delay
+        while not self._closed:
+            await asyncio.sleep(delay)
+            try:
+                await self._open(resuming=True)
+            except (OSError, asyncio.TimeoutError):
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                continue
+            self.reconnects += 1
+            return
+
+    async def close(self):
+        self._closed = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        proto, transport = self._proto, self._transport
+        self._ready = False
+        if transport is not None:
+            transport.close()
+            try:
+                await asyncio.wait_for(proto.lost, 1.0)
+            except asyncio.TimeoutError:
+                transport.abort()
+        self._eof = True
+        self._wake()
+
+    # -------- envío --------
+
+    def _encode(self, text: str) -> bytes:
+        if not self.binary:
+            return encode_line(text)
+        word = text.split(" ", 1)[0]
+        return encode_frame(FRAME_CMD if word in COMMANDS else FRAME_MSG, encode_payload(text))
+
+    def _track(self, text: str):
+        # apodo y salas a repetir al reconectar
+        word, _, arg = text.partition(" ")
+        if word == "NICK":
+            self.nick = arg.strip()
+        elif word == "JOIN":
+            self.rooms.add(arg.strip())
+        elif word == "PART":
+            self.rooms.discard(arg.strip())
+
+    def send(self, text: str):
+        """Encola un mensaje o comando; no espera respuesta (pipeline)."""
+        self._track(text)
+        self._write(self._encode(text))
+
+    def send_many(self, texts: Iterable[str]):
+        """Varios mensajes en orden, en un único write."""
+        chunks = []
+        for text in texts:
+            self._track(text)
+            chunks.append(self._encode(text))
+        self._write(b"".join(chunks))
+
+    def _write(self, data: bytes):
+        if self._ready:
+            self._transport.write(data)
+        elif self._closed:
+            raise ConnectionError("cliente cerrado")
+        else:
+            self._outbox.append(data)
+
+    async def drain(self):
+        """Espera a que el transporte acepte más datos (control de flujo)."""
+        while self._paused and self._ready:
+            self._drain_waiter = asyncio.get_running_loop().create_future()
+            await self._drain_waiter
+        self._drain_waiter = None
+
+    # -------- recepción --------
+
+    def _on_data(self, data: bytes):
+        if self._frames is not None:
+            self._on_frames(self._frames.feed(data))
+        else:
+            buf = self._inbuf
+            buf += data
+            if self._hello is not None and not self._hello.done():
+                self._negotiate()
+            else:
+                cut = buf.rfind(b"\n")
+                if cut >= 0:
+                    # todas las líneas completas de un recv, de una vez
+                    lines = bytes(buf[:cut]).split(b"\n")
+                    del buf[: cut + 1]
+                    for line in lines:
+                        text = line.decode("utf-8")
+                        self._on_item(text, is_reply(text))
+        self._wake()
+
+    def _negotiate(self):
+        # línea por línea: lo que sigue a "OK BINARY" ya son frames
+        buf = self._inbuf
+        while True:
+            i = buf.find(b"\n")
+            if i < 0:
+                return
+            text = buf[:i].decode("utf-8")
+            del buf[: i + 1]
+            if text in (BINARY_OK, BINARY_ZLIB_OK):
+                self.compressed = text == BINARY_ZLIB_OK
+                self._frames = FrameReader()
+                rest = bytes(buf)
+                buf.clear()
+                self._hello.set_result(None)
+                self._on_frames(self._frames.feed(rest))
+                return
+            if text.startswith("ERR"):
+                self._hello.set_exception(ConnectionError(text))
+                return
+            self._on_item(text, is_reply(text))
+
+    def _on_frames(self, frames):
+        for ftype, payload in frames:
+            if ftype == FRAME_ZMSG:
+                self._on_frames(decompress_frames(payload))
+                continue
+            if ftype == FRAME_DM:
+                # mensaje directo: fuera del orden global, sin secuencia
+                self._received.append(payload.decode("utf-8"))
+                continue
+            self._on_item(payload.decode("utf-8"), ftype == FRAME_CMD)
+
+    def _on_item(self, text: str, reply: bool):
+        blocks = self._blocks
+        if reply:
+            if blocks and self._on_block_reply(blocks[0], text):
+                return
+            if self._handshake_oks and text.startswith(("OK NICK ", "OK JOIN ")):
+                self._handshake_oks -= 1
+                return
+            self._received.append(text)
+            return
+        if _RESUME in blocks:
+            # antes del END de nuestro pedido: al reanudar, el SINCE ya lo
+            # incluye; al conectar, la secuencia la fija ese END
+            if not self._resuming:
+                self._received.append(text)
+            return
+        if self.last_seq is not None:
+            self.last_seq += 1
+        self._received.append(text)
+
+    def _on_block_reply(self, mode: str, text: str) -> bool:
+        """Procesa una línea de un bloque pendiente; False si no es de ese bloque."""
+        if text.startswith("HIST "):
+            if mode == _RAW:
+                self._received.append(text)
+            elif mode == _RESUME:
+                entry = _parse_hist(text)
+                if entry is not None and (self.last_seq is None or entry[0] > self.last_seq):
+                    self._received.append(entry[1])
+            return True
+        if text.startswith("GAP "):
+            if mode != _SKIP:
+                self._received.append(text)  # se perdieron mensajes
+            return True
+        if text.startswith("MORE ") and text[5:].isdigit() and mode == _RESUME:
+            # respuesta parcial (del log): el bloque sigue con otro SINCE y
+            # lo que llega en vivo mientras tanto lo cubre ese pedido
+            self.last_seq = int(text[5:])
+            self._write(self._encode(f"SINCE {self.last_seq}"))
+            return True
+        if text.startswith("END ") and text[4:].isdigit():
+            self._blocks.popleft()
+            if mode == _RAW:
+                self._received.append(text)
+            elif mode == _RESUME:
+                self.last_seq = int(text[4:])
+                self._resuming = False
+            return True
+        if text == "ERR History disabled" and mode == _RESUME:
+            # sin historial no hay reanudación posible
+            self._blocks.popleft()
+            self._resuming = False
+            return True
+        return False
+
+    def _wake(self):
+        waiter = self._waiter
+        if waiter is not None and not waiter.done() and (self._received or self._eof):
+            waiter.set_result(None)
+
+    async def _wait(self, timeout: float | None):
+        if self._received or self._eof:
+            return
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiter = None
+
+    async def recv_batch(self, timeout: float | None = None) -> List[str]:
+        """Todo lo recibido hasta ahora (espera hasta `timeout` si no hay nada)."""
+        await self._wait(timeout)
+        out = list(self._received)
+        self._received.clear()
+        return out
+
+    async def recv(self, timeout: float | None = None) -> str | None:
+        """Un mensaje o respuesta; None si no llegó nada o se cerró."""
+        await self._wait(timeout)
+        return self._received.popleft() if self._received else None
+
+    async def recv_until(self, n: int, timeout: float | None = None) -> List[str]:
+        """Hasta `n` elementos, esperando como mucho `timeout` en total."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        out: List[str] = []
+        received = self._received
+        while len(out) < n:
+            while received and len(out) < n:
+                out.append(received.popleft())
+            if len(out) == n or self._eof:
+                break
+            left = None if deadline is None else deadline - loop.time()
+            if left is not None and left <= 0:
+                break
+            await self._wait(left)
+        return out
+
+
+async def connect_many(
+    host: str, port: int, n: int, concurrency: int = CONNECT_CONCURRENCY, **kwargs
+) -> List[ChatClient]:
+    """Abre `n` clientes, como mucho `concurrency` handshakes a la vez."""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one() -> ChatClient:
+        async with sem:
+            client = ChatClient(host, port, **kwargs)
+            await client.connect()
+            return client
+
+    return list(await asyncio.gather(*(one() for _ in range(n))))
+
+
+class ClientLoop:
+    """Event loop en un hilo propio, compartido por varios BlockingClient."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="client-loop", daemon=True)
+        self.thread.start()
+
+    def run(self, coro, timeout: float | None = None):
+        """Corre `coro` en el loop y espera su resultado."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def call(self, fn, *args):
+        """Llama `fn(*args)` en el hilo del loop y devuelve su resultado."""
+
+        async def call():
+            return fn(*args)
+
+        return self.run(call())
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=1.0)
+        self.loop.close()
+
+
+class BlockingClient:
+    """ChatClient con API bloqueante; el trabajo lo hace el hilo del ClientLoop."""
+
+    def __init__(self, loop: ClientLoop, host: str, port: int, **kwargs):
+        self._loop = loop
+        self.client = ChatClient(host, port, **kwargs)
+        loop.run(self.client.connect(), CONNECT_TIMEOUT)
+
+    def send(self, text: str):
+        self._loop.call(self.client.send, text)
+
+    def send_many(self, texts: Iterable[str]):
+        self._loop.call(self.client.send_many, list(texts))
+
+    def recv(self, timeout: float | None = 2.0) -> str | None:
+        return self._loop.run(self.client.recv(timeout))
+
+    def recv_batch(self, timeout: float | None = 2.0) -> List[str]:
+        return self._loop.run(self.client.recv_batch(timeout))
+
+    def recv_until(self, n: int, timeout: float | None = 2.0) -> List[str]:
+        return self._loop.run(self.client.recv_until(n, timeout))
+
+    def close(self):
+        self._loop.run(self.client.close())
@@ -0,0 +1,229 @@
+"""
+Modo multiproceso: N workers (fork) comparten el socket de escucha.
+
+Cada worker corre su propio ChatServer (con su propio GIL) y atiende a los
+clientes que acepta. Para que un mensaje llegue a los clientes de todos los
+workers, cada uno publica sus lotes en un hub que corre en el proceso padre:
+- Worker -> hub: los payloads validados y ya ordenados por llegada, uno por
+  línea (UTF-8, '\\n', sin decodificar), con un prefijo de destino: '*'
+  para todos, '@' para una sala (el texto ya empieza con "#sala ").
+- El hub reenvía a todos los workers (incluido el emisor) las líneas completas
+  en el orden en que las leyó: ese es el orden global, igual para todos los
+  clientes sin importar a qué worker estén conectados.
+- Worker <- hub: un hilo lee del bus y entrega cada lote con `deliver`.
+
+Solo en plataformas con `os.fork` (Linux, macOS).
+"""
+
+import os
+import selectors
+import signal
+import socket
+import threading
+import time
+from typing import Callable, List, Tuple
+
+from src.bus import encode_batch, read_batches
+from src.connection import RECV_SIZE
+from src.server import DEFAULT_LISTEN_BACKLOG, ChatServer
+
+
+class HubBus:
+    """
+    Extremo de un worker en el bus: publica lotes y recibe el orden global
+    (misma interfaz que los backends de src/bus.py).
+    """
+
+    def __init__(self, sock: socket.socket, on_close: Callable[[], None] | None = None):
+        self.sock = sock
+        self.on_close = on_close
+        self._send_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self, deliver: Callable[[List[Tuple[str | None, bytes]]], None]):
+        self._thread = threading.Thread(
+            target=self._read_loop, args=(deliver,), name="bus-reader", daemon=True
+        )
+        self._thread.start()
+
+    def publish(self, batch: List[Tuple[str | None, bytes]]):
+        data = encode_batch(batch)
+        try:
+            with self._send_lock:
+                self.sock.sendall(data)
+        except OSError:
+            pass  # hub caído: el lector del bus avisa con on_close
+
+    def _read_loop(self, deliver):
+        try:
+            read_batches(self.sock, deliver)
+        except OSError:
+            pass
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+
+def relay(peers: List[socket.socket], stop: threading.Event, poll: float = 0.5):
+    """
+    Bucle del hub: lee de cada worker y reenvía a todos las líneas completas.
+    Un worker que se cae deja de recibir; los demás siguen.
+    """
+    sel = selectors.DefaultSelector()
+    for peer in peers:
+        sel.register(peer, selectors.EVENT_READ, bytearray())
+    alive = list(peers)
+    try:
+        while not stop.is_set() and alive:
+            for key, _ in sel.select(timeout=poll):
+                peer, buf = key.fileobj, key.data
+                try:
+                    data = peer.recv(RECV_SIZE)
+                except OSError:
+                    data = b""
+                if not data:
+                    sel.unregister(peer)
+                    alive.remove(peer)
+                    continue
+                buf += data
+                cut = buf.rfind(b"\n") + 1
+                if not cut:
+                    continue
+                out = bytes(buf[:cut])
+                del buf[:cut]
+                for other in list(alive):
+                    try:
+                        other.sendall(out)
+                    except OSError:
+                        sel.unregister(other)
+                        alive.remove(other)
+    finally:
+        sel.close()
+
+
+class Cluster:
+    """Servidor de chat repartido en `workers` procesos con un orden global."""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        engine: type = ChatServer,
+        **server_kwargs,
+    ):
+        if not hasattr(os, "fork"):
+            raise RuntimeError("el modo multiproceso requiere os.fork (Unix)")
+        if workers < 1:
+            raise ValueError("workers debe ser >= 1")
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.engine = engine
+        self.server_kwargs = server_kwargs
+        self.sock: socket.socket | None = None
+        self.pids: List[int] = []
+        self._peers: List[socket.socket] = []
+        self._stop = threading.Event()
+        self.hub_thread: threading.Thread | None = None
+
+    @property
+    def address(self) -> tuple[str, int]:
+        if self.sock is None:
+            return (self.host, self.port)
+        return self.sock.getsockname()
+
+    def start(self):
+        """Crea el socket de escucha, forkea los workers y arranca el hub."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.server_kwargs.get("listen_backlog", DEFAULT_LISTEN_BACKLOG))
+        self.sock = sock
+
+        for index in range(self.workers):
+            hub_end, worker_end = socket.socketpair()
+            pid = os.fork()
+            if pid == 0:  # worker
+                hub_end.close()
+                for peer in self._peers:
+                    peer.close()
+                self._run_worker(worker_end, index)  # no vuelve
+            worker_end.close()
+            self.pids.append(pid)
+            self._peers.append(hub_end)
+
+        self.hub_thread = threading.Thread(
+            target=relay, args=(self._peers, self._stop), name="hub", daemon=True
+        )
+        self.hub_thread.start()
+
+    def _run_worker(self, bus_sock: socket.socket, index: int):
+        code = 0
+        kwargs = dict(self.server_kwargs)
+        if kwargs.get("log_dir"):
+            # cada worker recibe el orden global completo: su propio log
+            kwargs["log_dir"] = os.path.join(kwargs["log_dir"], f"worker-{index}")
+        try:
+            stopped = threading.Event()
+            signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+            signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C lo maneja el padre
+            srv = self.engine(
+                listen_sock=self.sock,
+                bus=HubBus(bus_sock, on_close=stopped.set),
+                **kwargs,
+            )
+            srv.start()
+            while not stopped.wait(0.5):
+                pass
+            srv.stop()
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+
+    def stop(self, timeout: float = 2.0):
+        """Deja de aceptar, detiene los workers y el hub."""
+        self._stop.set()
+        if self.sock is not None:
+            # compartido: despierta el accept de todos los workers
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + timeout
+        for pid in self.pids:
+            while True:
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if done:
+                    break
+                if time.monotonic() > deadline:
+                    os.kill(pid, signal.SIGKILL)
+                    os.waitpid(pid, 0)
+                    break
+                time.sleep(0.01)
+        self.pids = []
+        if self.hub_thread:
+            self.hub_thread.join(timeout=1.0)
+            self.hub_thread = None
+        for peer in self._peers:
+            peer.close()
+        self._peers = []
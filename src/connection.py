@@ -0,0 +1,283 @@
+"""
+Estado por conexión compartido por los motores del servidor.
+
+Cada cliente tiene una cola de salida acotada (`OutboundQueue`): `broadcast`
+solo encola y un escritor la vacía de forma independiente, así un cliente que
+no lee no frena la difusión al resto. Las colas guardan referencias al mismo
+buffer ya codificado (sin copias por destinatario) y el envío junta varios
+mensajes con `sendmsg` (scatter/gather) en lugar de concatenarlos.
+Al superar el límite con lo que ya espera en la cola (una cola vacía acepta
+siempre un lote, por grande que sea) se aplica la política configurada:
+- "drop-oldest": se descartan los mensajes más viejos hasta que entre el nuevo.
+- "drop-newest": se descarta el mensaje nuevo.
+- "disconnect": se desconecta al consumidor lento.
+"""
+
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+DISCONNECT = "disconnect"
+POLICIES = (DROP_OLDEST, DROP_NEWEST, DISCONNECT)
+
+DEFAULT_MAX_QUEUE_BYTES = 1 << 20
+DEFAULT_MAX_QUEUE_MESSAGES = 10_000
+
+# Máximo de bytes / buffers que el escritor saca de la cola por envío
+# (los buffers quedan por debajo de IOV_MAX, 1024 en Linux)
+WRITE_BATCH_BYTES = 64 * 1024
+WRITE_BATCH_CHUNKS = 512
+
+RECV_SIZE = 64 * 1024
+# Una línea sin '\n' más larga que esto se considera abuso: se cierra el cliente.
+MAX_LINE_BYTES = 64 * 1024
+
+# Envío no bloqueante aunque el socket sea bloqueante (lo usa el motor por
+# hilos, cuyo lector espera en un recv_into bloqueante sobre el mismo socket).
+# Sin MSG_DONTWAIT (Windows) el envío puede bloquear al escritor.
+SEND_FLAGS = getattr(socket, "MSG_DONTWAIT", 0)
+
+
+class OutboundQueue:
+    """Cola FIFO de bytes con límite en bytes y/o mensajes (0 = sin límite)."""
+
+    __slots__ = (
+        "_chunks", "_counts", "_lock", "nbytes", "nmessages", "max_bytes",
+        "max_messages", "policy", "dropped", "overflowed",
+    )
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_QUEUE_BYTES,
+        max_messages: int = DEFAULT_MAX_QUEUE_MESSAGES,
+        policy: str = DISCONNECT,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"política desconocida: {policy!r}")
+        self._chunks: deque = deque()
+        # mensajes por chunk: un lote coalescido cuenta como varios
+        self._counts: deque = deque()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.nmessages = 0
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.policy = policy
+        self.dropped = 0
+        self.overflowed = False
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def _full(self, extra: int, count: int) -> bool:
+        # el límite es sobre lo ya encolado: una cola vacía siempre acepta un
+        # lote, aunque solo ya supere el límite (un lote coalescido no debe
+        # desconectar a un cliente que está al día)
+        if not self._chunks:
+            return False
+        if self.max_messages and self.nmessages + count > self.max_messages:
+            return True
+        if self.max_bytes and self.nbytes + extra > self.max_bytes:
+            return True
+        return False
+
+    def push(self, data: bytes, count: int = 1) -> bool:
+        """
+        Encola `data` (`count` mensajes ya enmarcados). Devuelve False solo si
+        la política es "disconnect" y se superó el límite (el llamador debe
+        cerrar la conexión).
+        """
+        n = len(data)
+        with self._lock:
+            if self.overflowed:
+                return False
+            if self._full(n, count):
+                if self.policy == DISCONNECT:
+                    self.overflowed = True
+                    return False
+                if self.policy == DROP_NEWEST:
+                    self.dropped += count
+                    return True
+                # DROP_OLDEST: hacer lugar para el nuevo
+                while self._chunks and self._full(n, count):
+                    old = self._counts.popleft()
+                    self.nbytes -= len(self._chunks.popleft())
+                    self.nmessages -= old
+                    self.dropped += old
+            self._chunks.append(data)
+            self._counts.append(count)
+            self.nbytes += n
+            self.nmessages += count
+            return True
+
+    def pop_batch(
+        self, limit: int = WRITE_BATCH_BYTES, max_chunks: int = WRITE_BATCH_CHUNKS
+    ) -> list:
+        """Saca mensajes completos hasta ~`limit` bytes, sin copiarlos."""
+        with self._lock:
+            chunks, counts = self._chunks, self._counts
+            if not chunks:
+                return []
+            first = chunks.popleft()
+            parts = [first]
+            size = len(first)
+            n = counts.popleft()
+            while chunks and len(parts) < max_chunks and size + len(chunks[0]) <= limit:
+                chunk = chunks.popleft()
+                parts.append(chunk)
+                size += len(chunk)
+                n += counts.popleft()
+            self.nbytes -= size
+            self.nmessages -= n
+        return parts
+
+
+def send_buffers(sock: socket.socket, buffers: list, flags: int = 0) -> int:
+    """Envía varios buffers en una sola llamada (sendmsg) sin concatenarlos."""
+    if len(buffers) == 1:
+        return sock.send(buffers[0], flags)
+    if hasattr(sock, "sendmsg"):
+        return sock.sendmsg(buffers, (), flags)
+    # Windows: sin sendmsg, una copia
+    return sock.send(b"".join(buffers), flags)
+
+
+def send_tls(sock: ssl.SSLSocket, buffers: list) -> int:
+    """
+    Como `send_buffers` para un SSLSocket no bloqueante: sin sendmsg ni flags
+    (una copia). Si OpenSSL pide esperar levanta BlockingIOError; el
+    reintento repite los mismos bytes, como exige SSL_write.
+    """
+    data = buffers[0] if len(buffers) == 1 else b"".join(buffers)
+    try:
+        return sock.send(data)
+    except (ssl.SSLWantWriteError, ssl.SSLWantReadError):
+        raise BlockingIOError from None
+
+
+def _advance(buffers: list, sent: int) -> list:
+    """Descarta `sent` bytes del frente de `buffers` (vistas, no copias)."""
+    i = 0
+    while i < len(buffers) and sent >= len(buffers[i]):
+        sent -= len(buffers[i])
+        i += 1
+    rest = buffers[i:]
+    if sent and rest:
+        rest[0] = memoryview(rest[0])[sent:]
+    return rest
+
+
+class Connection:
+    """Un cliente conectado: socket, buffer de entrada y cola de salida."""
+
+    __slots__ = (
+        "sock", "fd", "inbuf", "outq", "pending", "wlock", "want_write", "closed",
+        "rooms", "nick", "binary", "compress", "reader", "bucket", "parked", "last_active",
+        "trace", "tls", "mode_lock",
+    )
+
+    def __init__(self, sock: socket.socket, outq: OutboundQueue):
+        self.sock = sock
+        # fd guardado al crear: sigue siendo la clave en los selectores aunque
+        # el socket ya esté cerrado (fileno() pasa a -1)
+        self.fd = sock.fileno()
+        self.inbuf = bytearray()
+        self.outq = outq
+        # Buffers sacados de la cola y aún no enviados del todo; solo se
+        # tocan con `wlock` tomado
+        self.pending: list = []
+        # Quien envía (broadcaster en el camino rápido o el escritor) toma el lock
+        self.wlock = threading.Lock()
+        self.want_write = False
+        self.closed = False
+        # Salas a las que pertenece (las mantiene RoomIndex)
+        self.rooms: set = set()
+        # Apodo registrado con "NICK" (lo mantiene NickIndex)
+        self.nick: str | None = None
+        # Framing binario negociado con "BINARY" (ver src/protocol.py); el
+        # FrameReader reemplaza a `inbuf` para la entrada
+        self.binary = False
+        # Recibe lotes comprimidos (FRAME_ZMSG, "BINARY ZLIB")
+        self.compress = False
+        # "BINARY" cambia el formato con este lock (y `_order_lock`, que
+        # ordena la difusión); lo que se encola solo para esta conexión
+        # elige formato y encola con el mismo lock
+        self.mode_lock = threading.Lock()
+        self.reader = None
+        # Límite de tasa propio (TokenBucket o None) y, en el motor de
+        # selectors, lo que quedó sin procesar mientras no se lee el socket
+        self.bucket = None
+        self.parked = None
+        # Último recv con datos (time.monotonic), para cerrar inactivos
+        self.last_active = time.monotonic()
+        # Trazas de lotes muestreados encolados y aún no escritos (src/tracing.py)
+        self.trace = None
+        # SSLSocket no bloqueante (ver src/tls.py): envío sin sendmsg ni flags
+        self.tls = isinstance(sock, ssl.SSLSocket)
+
+    def feed(self, data, n: int | None = None) -> list[bytes]:
+        """
+        Agrega bytes recibidos y devuelve las líneas completas (sin '\n').
+        Con `n`, solo cuentan los primeros `n` bytes de `data` (un buffer
+        reutilizable llenado con recv_into): todas las líneas del bloque salen
+        de una sola copia y solo la línea incompleta se guarda en `inbuf`.
+        El resto queda en `inbuf`; el llamador decide si es demasiado largo.
+        """
+        if n is None:
+            n = len(data)
+        buf = self.inbuf
+        view = memoryview(data)
+        last = data.rfind(b"\n", 0, n)
+        if last < 0:
+            buf += view[:n]
+            return []
+        if buf:
+            buf += view[:last]
+            chunk = bytes(buf)
+            buf.clear()
+        else:
+            chunk = bytes(view[:last])
+        buf += view[last + 1:n]
+        return chunk.split(b"\n")
+
+    def flush(self, flags: int = 0) -> bool:
+        """
+        Envía lo pendiente sin bloquear (socket no bloqueante o `flags` con
+        MSG_DONTWAIT; con TLS el socket ya es no bloqueante y `flags` no se
+        usa). Devuelve True si la cola quedó vacía.
+        Propaga OSError si el socket murió. Llamar con `wlock` tomado.
+        """
+        while True:
+            if not self.pending:
+                self.pending = self.outq.pop_batch()
+                if not self.pending:
+                    return True
+            try:
+                if self.tls:
+                    sent = send_tls(self.sock, self.pending)
+                else:
+                    sent = send_buffers(self.sock, self.pending, flags)
+            except (BlockingIOError, InterruptedError):
+                return False
+            self.pending = _advance(self.pending, sent)
+            if not self.pending and not self.outq:
+                # lo que se encole después lo entrega quien lo encoló (o el
+                # escritor, si este lock sigue tomado)
+                return True
+
+    def close(self):
+        self.closed = True
+        # shutdown primero: despierta a un lector bloqueado en recv() de otro
+        # hilo (close() solo no lo hace en Linux)
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except Exception:
+            pass
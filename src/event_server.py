@@ -0,0 +1,324 @@
+"""
+Motor alternativo del servidor de chat basado en `selectors`.
+
+En lugar de un hilo por cliente, un único hilo de E/S multiplexa el socket
+de escucha y todas las conexiones (sockets no bloqueantes):
+- Mismo protocolo por líneas (UTF-8, '\\n') y misma validación, con el
+  mismo framing binario opcional.
+- El orden global se conserva reutilizando `msg_q` y el hilo broadcaster
+  heredados de ChatServer.
+- `broadcast` (heredado) codifica el mensaje una sola vez y lo deja en la
+  cola de salida acotada de cada conexión; lo que no sale al primer intento
+  lo vacía el hilo de E/S cuando el socket admite más datos, así que un
+  cliente lento no bloquea al resto.
+- Un cliente que supera su límite de tasa (o que encuentra `msg_q` llena)
+  no se atiende con un sleep: lo que falta procesar queda estacionado en la
+  conexión, se deja de leer su socket y un temporizador del hilo de E/S lo
+  retoma.
+- `stop` con drenaje: el hilo de E/S sigue atendiendo (sin aceptar) hasta
+  que se vacían `msg_q` y las colas de salida o vence el plazo.
+- Con TLS los handshakes los completan los hilos de src/tls.py; el hilo de
+  E/S recibe la conexión ya negociada y lee con `recv_tls_into`.
+"""
+
+import heapq
+import itertools
+import selectors
+import socket
+import threading
+import time
+from typing import List
+
+from src.connection import Connection, RECV_SIZE
+from src.protocol import FrameError, enable_timestamps
+from src.server import ChatServer
+from src.tls import recv_tls_into
+
+_ACCEPT = "accept"
+_WAKE = "wake"
+
+
+class EventChatServer(ChatServer):
+    """ChatServer con un único hilo de E/S (selectors) para todos los clientes."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **kwargs):
+        super().__init__(host, port, **kwargs)
+        self.selector: selectors.BaseSelector | None = None
+        self.io_thread: threading.Thread | None = None
+        # Aceptadas fuera del hilo de E/S (por el broadcaster): el selector
+        # solo lo toca el hilo de E/S, que las registra al despertar
+        self._new_conns: List[Connection] = []
+        # Conexiones frenadas por límite de tasa: (cuándo retomar, orden, conn)
+        self._timers: list = []
+        self._timer_seq = itertools.count()
+        # Buffer de recepción único: lo usa solo el hilo de E/S y de cada
+        # recv solo queda en la conexión la línea incompleta
+        self._rxbuf = bytearray(RECV_SIZE)
+        self._rxview = memoryview(self._rxbuf)
+
+    # -------- ciclo de vida --------
+
+    def start(self):
+        """Inicializa el socket y arranca el hilo de E/S y el broadcaster."""
+        self.sock = self._listen()
+        self._open_wakeup()
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ, _ACCEPT)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, _WAKE)
+        self.running.set()
+        self._restore_log()
+        self.bus.start(self.deliver)
+        self._start_shards()
+        self._start_tls()
+
+        self.io_thread = threading.Thread(
+            target=self.io_loop, name="io-loop", daemon=True
+        )
+        self.io_thread.start()
+
+        self.bcast_thread = threading.Thread(
+            target=self.broadcast_loop, name="broadcast-loop", daemon=True
+        )
+        self.bcast_thread.start()
+
+    def stop(self, drain: float | None = None):
+        """Detiene el servidor (con drenaje opcional); el hilo de E/S cierra sockets al salir."""
+        started = time.monotonic_ns()
+        self.stopping.set()
+        if self.sock and self._listen_sock is None:
+            # el socket queda legible: el hilo de E/S lo saca del selector
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._stop_tls()
+        drain = self.drain_timeout if drain is None else drain
+        if drain > 0:
+            self._drain(time.monotonic() + drain)
+        self.running.clear()
+        self._wake()
+
+        try:
+            self.msg_q.put(None, timeout=1.0)
+        except Exception:
+            pass
+
+        if self.io_thread:
+            self.io_thread.join(timeout=1.0)
+            self.io_thread = None
+
+        if self.bcast_thread:
+            self.bcast_thread.join(timeout=1.0)
+            self.bcast_thread = None
+        self._stop_shards()
+        self.bus.close()
+        if self.log is not None:
+            self.log.close()
+        self._stopped(started)
+
+    # -------- bucle de E/S --------
+
+    def io_loop(self):
+        assert self.selector is not None
+        sel = self.selector
+        try:
+            while self.running.is_set():
+                timeout = 0.5
+                if self._timers:
+                    timeout = min(timeout, max(0.0, self._timers[0][0] - time.monotonic()))
+                reap_at = self.reaper.next_deadline() if self.reaper is not None else None
+                if reap_at is not None:
+                    timeout = min(timeout, max(0.0, reap_at - time.monotonic()))
+                events = sel.select(timeout=timeout)
+                conns: List[tuple] = []
+                woken = False
+                for key, mask in events:
+                    if key.data is _ACCEPT:
+                        # Primero aceptar: un cliente que ya completó el
+                        # handshake debe quedar registrado antes de procesar
+                        # mensajes que llegaron después.
+                        if not self._accept_pending():
+                            # stop() en curso: el resto queda en el backlog
+                            sel.unregister(self.sock)
+                    elif key.data is _WAKE:
+                        woken = True
+                    else:
+                        conns.append((key.data, mask))
+
+                pending = self._take_pending() if woken else ()
+                # después de tomar las pendientes: toda conexión con envíos
+                # pendientes ya figura registrada en el selector
+                if self._new_conns:
+                    self._watch_new()
+                for conn in pending:
+                    self._flush(conn)
+
+                for conn, mask in conns:
+                    if conn.closed:
+                        continue
+                    if mask & selectors.EVENT_WRITE:
+                        self._flush(conn)
+                    if mask & selectors.EVENT_READ and not conn.closed:
+                        self._on_readable(conn)
+                if self._timers:
+                    self._resume_parked()
+                if reap_at is not None and reap_at <= time.monotonic():
+                    for conn in self.reaper.expired():
+                        self._reap(conn)
+        finally:
+            self._close_all()
+
+    def _register(self, client_sock: socket.socket):
+        if self.tls_context is None:
+            # con TLS ya es no bloqueante y tiene TCP_NODELAY (ver _handshake)
+            client_sock.setblocking(False)
+            try:
+                client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except Exception:
+                pass
+            enable_timestamps(client_sock)
+
+        conn = self._new_connection(client_sock)
+        self._add_client(conn)
+        with self.lock:
+            self._new_conns.append(conn)
+        if threading.current_thread() is not self.io_thread:
+            self._wake()
+
+    def _watch_new(self):
+        with self.lock:
+            conns, self._new_conns = self._new_conns, []
+        for conn in conns:
+            if not conn.closed:
+                self.selector.register(conn.fd, selectors.EVENT_READ, conn)
+
+    def _on_readable(self, conn: Connection):
+        reader = conn.reader
+        recv = recv_tls_into if conn.tls else self._recv_plain
+        try:
+            n, arrived = recv(conn, self._rxview)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._close(conn)
+            return
+
+        if n:
+            conn.last_active = time.monotonic()
+        else:
+            # EOF: una última línea sin '\n' se procesa igual que readline()
+            # (un frame incompleto se descarta)
+            if reader is None and conn.inbuf:
+                self.process_line(conn, bytes(conn.inbuf), arrived)
+            self._close(conn)
+            return
+
+        try:
+            if reader is not None:
+                # modo binario: el parser solo guarda el frame incompleto
+                ok = self.handle_frames(conn, reader.feed(self._rxbuf, n), arrived)
+            else:
+                ok = self.handle_data(conn, self._rxbuf, arrived, n)
+        except FrameError:
+            ok = False
+        if not ok:
+            # mismo efecto que el motor por hilos: error de protocolo -> fuera
+            self._close(conn)
+        elif conn.tls and conn.parked is None and not conn.closed and conn.sock.pending():
+            # lo que OpenSSL ya descifró no vuelve a marcar el socket legible
+            self._on_readable(conn)
+
+    def _throttle(self, conn: Connection, items: list, index: int, wait: float) -> bool:
+        # sin dormir el hilo de E/S: estacionar el resto y dejar de leer
+        conn.parked = (items, index)
+        heapq.heappush(self._timers, (time.monotonic() + wait, next(self._timer_seq), conn))
+        self._set_events(conn)
+        return True
+
+    def _resume_parked(self):
+        now = time.monotonic()
+        timers = self._timers
+        while timers and timers[0][0] <= now:
+            _, _, conn = heapq.heappop(timers)
+            if conn.closed or conn.parked is None:
+                continue
+            items, index = conn.parked
+            conn.parked = None
+            try:
+                ok = self.handle_items(conn, items, time.time_ns(), index)
+            except FrameError:
+                ok = False
+            if not ok:
+                self._close(conn)
+            elif conn.parked is None:
+                self._set_events(conn)  # volver a leer
+
+    def _set_events(self, conn: Connection):
+        """Interés en el selector según lectura estacionada y escritura pendiente."""
+        events = 0 if conn.parked is not None else selectors.EVENT_READ
+        if conn.want_write:
+            events |= selectors.EVENT_WRITE
+        key = self.selector.get_map().get(conn.fd)
+        if key is None:
+            if events:
+                self.selector.register(conn.fd, events, conn)
+        elif not events:
+            self.selector.unregister(conn.fd)
+        elif key.events != events:
+            self.selector.modify(conn.fd, events, conn)
+
+    def _flush(self, conn: Connection):
+        """Escribe lo pendiente sin bloquear; pide EVENT_WRITE si queda algo."""
+        if conn.closed:
+            return
+        if conn.outq.overflowed:
+            # consumidor lento con política "disconnect"
+            self._close(conn)
+            return
+        try:
+            with conn.wlock:
+                drained = conn.flush()
+        except OSError:
+            self._close(conn)
+            return
+
+        if drained and conn.trace is not None:
+            self._traced_write(conn)
+        want = not drained
+        if want != conn.want_write:
+            conn.want_write = want
+            self._set_events(conn)
+
+    def _reap(self, conn: Connection):
+        if conn.parked is not None:
+            # frenada por límite de tasa, no inactiva: sigue vigilada
+            conn.last_active = time.monotonic()
+            self.reaper.add(conn)
+            return
+        # el reaper corre en el hilo de E/S (ver io_loop): cierre directo
+        self._notify_idle(conn)
+        self._close(conn)
+
+    def _close(self, conn: Connection):
+        if conn.closed:
+            return
+        try:
+            self.selector.unregister(conn.fd)
+        except Exception:
+            pass
+        conn.close()
+        if self.clients.remove(conn):
+            self._count_disconnect(conn)
+        self._release(conn)
+
+    def _close_all(self):
+        # el selector primero: cerrar las conexiones ya no necesita desregistrarlas
+        for closee in (self.selector, self.sock, self._wake_r, self._wake_w):
+            try:
+                if closee is not None:
+                    closee.close()
+            except Exception:
+                pass
+        self._close_connections(self.clients.snapshot())
+        self.clients.clear()
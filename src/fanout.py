@@ -0,0 +1,76 @@
+"""
+Envío en paralelo: las conexiones se reparten en K shards (por fd) y cada
+shard tiene un hilo emisor propio.
+
+El broadcaster sigue encolando cada lote en todas las colas de salida bajo
+`_order_lock` (una copia compartida, una inserción por cliente): ese es el
+punto que fija el orden global. Después solo avisa a los shards, O(K) para
+un lote a todos; cada emisor vacía las colas de sus conexiones con envíos
+no bloqueantes (el send libera el GIL) y lo que no entra se lo deja al
+escritor. Como el orden de cada conexión ya quedó fijado en su cola, cada
+cliente ve el orden global aunque los shards avancen a distinto ritmo. Si
+un emisor va atrasado, los avisos se juntan y varios lotes salen en un solo
+envío por conexión.
+"""
+
+import threading
+from typing import Callable, Iterable
+
+from src.connection import Connection
+from src.registry import ClientRegistry
+
+
+class SenderShard:
+    """Un hilo emisor y las conexiones que le tocan (`members`)."""
+
+    def __init__(self, index: int, deliver: Callable[[Iterable[Connection]], None]):
+        self.index = index
+        self.members = ClientRegistry()
+        self._deliver = deliver
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        # avisos pendientes: todas las conexiones del shard o algunas
+        self._all = False
+        self._pending: set = set()
+        self._stop = False
+        self.thread: threading.Thread | None = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self._run, name=f"sender-{self.index}", daemon=True
+        )
+        self.thread.start()
+
+    def flush_all(self):
+        """Pide vaciar las colas de todas sus conexiones (lote a todos)."""
+        with self._lock:
+            self._all = True
+        self._ready.set()
+
+    def flush(self, conns: Iterable[Connection]):
+        """Pide vaciar las colas de `conns` (lote a una sala)."""
+        with self._lock:
+            self._pending.update(conns)
+        self._ready.set()
+
+    def close(self):
+        with self._lock:
+            self._stop = True
+        self._ready.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def _run(self):
+        while True:
+            self._ready.wait()
+            with self._lock:
+                self._ready.clear()
+                stop, flush_all, pending = self._stop, self._all, self._pending
+                self._all = False
+                self._pending = set()
+            conns = self.members.snapshot() if flush_all else pending
+            if conns:
+                self._deliver(conns)
+            if stop:
+                return
@@ -0,0 +1,68 @@
+"""
+Historial en memoria de los últimos mensajes difundidos.
+
+Un ring buffer de capacidad fija: cada mensaje entregado recibe un número de
+secuencia (1, 2, 3...) en el orden global y ocupa la posición
+`seq % capacidad`, pisando al más viejo. Guarda el payload ya codificado
+(bytes, sin '\\n') y su sala, así responder "HISTORY"/"SINCE" no decodifica
+ni vuelve a codificar nada.
+
+No tiene lock propio: el servidor lo modifica y lo lee bajo el mismo lock
+que ordena la difusión (ver `ChatServer._order_lock`), así una respuesta de
+historial nunca repite ni saltea mensajes respecto de lo difundido en vivo.
+"""
+
+from typing import Iterable, List, Tuple
+
+# (seq, sala o None, payload)
+Entry = Tuple[int, "str | None", bytes]
+
+
+class History:
+    """Ring buffer de (seq, sala, payload) con los últimos `capacity` mensajes."""
+
+    __slots__ = ("capacity", "_rooms", "_payloads", "_start", "next_seq")
+
+    def __init__(self, capacity: int, next_seq: int = 1):
+        if capacity < 1:
+            raise ValueError("capacity debe ser >= 1")
+        self.capacity = capacity
+        self._rooms: list = [None] * capacity
+        self._payloads: List[bytes] = [b""] * capacity
+        # secuencia del primer mensaje agregado (al retomar desde un log, > 1)
+        self._start = next_seq
+        self.next_seq = next_seq
+
+    def __len__(self) -> int:
+        return min(self.next_seq - self._start, self.capacity)
+
+    @property
+    def last_seq(self) -> int:
+        """Secuencia del último mensaje (0 si no hubo ninguno)."""
+        return self.next_seq - 1
+
+    @property
+    def first_seq(self) -> int:
+        """Secuencia del mensaje más viejo que se conserva."""
+        return self.next_seq - len(self)
+
+    def extend(self, batch: Iterable[Tuple["str | None", bytes]]):
+        """Agrega un lote ya ordenado de (sala, payload)."""
+        cap, seq = self.capacity, self.next_seq
+        rooms, payloads = self._rooms, self._payloads
+        for room, payload in batch:
+            i = seq % cap
+            rooms[i] = room
+            payloads[i] = payload
+            seq += 1
+        self.next_seq = seq
+
+    def since(self, seq: int) -> List[Entry]:
+        """Mensajes con secuencia mayor que `seq`, del más viejo al más nuevo."""
+        start = max(seq + 1, self.first_seq)
+        cap, rooms, payloads = self.capacity, self._rooms, self._payloads
+        return [(s, rooms[s % cap], payloads[s % cap]) for s in range(start, self.next_seq)]
+
+    def last(self, n: int) -> List[Entry]:
+        """Los últimos `n` mensajes (o menos si no hay tantos)."""
+        return self.since(self.next_seq - 1 - n)
@@ -0,0 +1,341 @@
+"""
+Log durable (append-only) de los mensajes entregados.
+
+- Registros `[crc32][largo][seq][largo sala][sala][payload]` en archivos de
+  segmento `<primera seq>.log`; al superar `segment_bytes` se abre otro.
+- El broadcaster solo agrega el lote a una lista en memoria (`append`); un
+  hilo escritor lo vuelca en un único `write` y hace `fsync` como mucho cada
+  `fsync_interval` segundos (group commit): el camino caliente nunca toca
+  el disco.
+- Índice disperso por segmento: una entrada (seq, offset) cada
+  `index_every` bytes. Leer desde una secuencia busca el segmento y el
+  offset con bisect y recorre el archivo con `mmap`, sin leer lo anterior.
+  Los segmentos cerrados guardan su índice en `<primera seq>.idx`.
+- Al abrir se valida la cola del último segmento (crc y largo) y se trunca
+  un registro a medio escribir (caída durante un `write`).
+- Ningún `fsync` se hace con el lock de E/S tomado (ver `sync` y
+  `_rotate`): un lector que lo necesita nunca espera al disco.
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Iterable, List, Tuple
+
+# crc32, largo del payload, seq, largo de la sala (el crc cubre todo lo demás)
+RECORD = struct.Struct("!IIQH")
+_CRC = struct.Struct("!I")
+_BODY = struct.Struct("!IQH")
+INDEX_ENTRY = struct.Struct("!QQ")
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_FSYNC_INTERVAL = 0.05
+DEFAULT_INDEX_EVERY = 4096
+
+# (seq, sala o None, payload)
+Entry = Tuple[int, "str | None", bytes]
+
+
+def encode_record(seq: int, room: "str | None", payload: bytes) -> bytes:
+    room_b = room.encode("utf-8") if room is not None else b""
+    body = _BODY.pack(len(payload), seq, len(room_b)) + room_b + payload
+    return _CRC.pack(zlib.crc32(body)) + body
+
+
+def iter_records(buf, offset: int = 0, end: int | None = None):
+    """
+    Recorre registros válidos de `buf` desde `offset`; produce
+    (offset, seq, sala, payload, offset siguiente). Se detiene en el primer
+    registro incompleto o corrupto.
+    """
+    end = len(buf) if end is None else end
+    hsize = RECORD.size
+    while end - offset >= hsize:
+        crc, plen, seq, rlen = RECORD.unpack_from(buf, offset)
+        nxt = offset + hsize + rlen + plen
+        if nxt > end or zlib.crc32(buf[offset + 4:nxt]) != crc:
+            return
+        start = offset + hsize
+        room = bytes(buf[start:start + rlen]).decode("utf-8") if rlen else None
+        yield offset, seq, room, bytes(buf[start + rlen:nxt]), nxt
+        offset = nxt
+
+
+class Segment:
+    """Un archivo de segmento con su índice disperso (seq, offset)."""
+
+    __slots__ = ("first_seq", "path", "size", "last_seq", "index_seqs", "index_offsets")
+
+    def __init__(self, directory: str, first_seq: int):
+        self.first_seq = first_seq
+        self.path = os.path.join(directory, f"{first_seq:020d}.log")
+        self.size = 0
+        self.last_seq = first_seq - 1
+        self.index_seqs: List[int] = []
+        self.index_offsets: List[int] = []
+
+    @property
+    def index_path(self) -> str:
+        return self.path[:-4] + ".idx"
+
+    def add_index(self, seq: int, offset: int):
+        self.index_seqs.append(seq)
+        self.index_offsets.append(offset)
+
+    def offset_for(self, seq: int) -> int:
+        """Offset de un registro con secuencia <= `seq` (por donde empezar a leer)."""
+        i = bisect.bisect_right(self.index_seqs, seq) - 1
+        return self.index_offsets[i] if i >= 0 else 0
+
+    def save_index(self):
+        data = b"".join(
+            INDEX_ENTRY.pack(s, o) for s, o in zip(self.index_seqs, self.index_offsets)
+        )
+        with open(self.index_path, "wb") as f:
+            f.write(data)
+
+    def load_index(self) -> bool:
+        try:
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return False
+        for seq, offset in INDEX_ENTRY.iter_unpack(data):
+            self.add_index(seq, offset)
+        return True
+
+    def scan(self, index_every: int) -> int:
+        """Reconstruye índice y última seq leyendo el archivo; devuelve el largo válido."""
+        self.index_seqs, self.index_offsets = [], []
+        valid = 0
+        last_indexed = -index_every
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                return 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                for offset, seq, _room, _payload, nxt in iter_records(buf):
+                    if offset - last_indexed >= index_every:
+                        self.add_index(seq, offset)
+                        last_indexed = offset
+                    self.last_seq = seq
+                    valid = nxt
+        return valid
+
+
+class MessageLog:
+    """Log de segmentos con escritura en segundo plano y lectura por mmap."""
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+        index_every: int = DEFAULT_INDEX_EVERY,
+    ):
+        if segment_bytes < 1 or fsync_interval < 0 or index_every < 1:
+            raise ValueError("segment_bytes e index_every deben ser >= 1 y fsync_interval >= 0")
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.index_every = index_every
+        os.makedirs(directory, exist_ok=True)
+
+        # Lotes (primera seq, [(sala, payload)]) aún no escritos; los toma el escritor
+        self._cond = threading.Condition()
+        self._pending: list = []
+        self._closing = False
+        # Serializa escrituras y lecturas del segmento activo
+        self._io_lock = threading.Lock()
+        self._file = None
+        # Segmentos cerrados por rotación: fsync y cierre fuera del lock
+        self._retired: list = []
+        self._last_indexed = 0
+        self._unsynced = False
+        self._last_sync = time.monotonic()
+        self._thread: threading.Thread | None = None
+        self.segments: List[Segment] = []
+        self._open_segments()
+        self.last_seq = self.segments[-1].last_seq if self.segments else 0
+        # Última secuencia ya escrita al archivo (visible para `read(flush=False)`)
+        self.flushed_seq = self.last_seq
+
+    # -------- apertura --------
+
+    def _open_segments(self):
+        firsts = sorted(
+            int(name[:-4]) for name in os.listdir(self.directory)
+            if name.endswith(".log") and name[:-4].isdigit()
+        )
+        for i, first in enumerate(firsts):
+            seg = Segment(self.directory, first)
+            active = i == len(firsts) - 1
+            if active or not seg.load_index():
+                valid = seg.scan(self.index_every)
+                if active:
+                    # un write a medio hacer deja basura al final
+                    with open(seg.path, "r+b") as f:
+                        f.truncate(valid)
+                elif seg.index_seqs:
+                    seg.save_index()
+            else:
+                # índice guardado: la última seq es la primera del siguiente - 1
+                seg.last_seq = firsts[i + 1] - 1
+            seg.size = os.path.getsize(seg.path)
+            self.segments.append(seg)
+        if self.segments:
+            seg = self.segments[-1]
+            self._file = open(seg.path, "ab")
+            self._last_indexed = seg.index_offsets[-1] if seg.index_offsets else -self.index_every
+
+    def start(self):
+        self._thread = threading.Thread(target=self._writer_loop, name="log-writer", daemon=True)
+        self._thread.start()
+
+    # -------- escritura --------
+
+    def append(self, first_seq: int, batch: List[Tuple["str | None", bytes]]):
+        """Agrega un lote ya secuenciado; no bloquea en disco."""
+        with self._cond:
+            self._pending.append((first_seq, batch))
+            self._cond.notify()
+
+    def _writer_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    timeout = None
+                    if self._unsynced:
+                        timeout = max(0.0, self._last_sync + self.fsync_interval - time.monotonic())
+                        if timeout == 0.0:
+                            break
+                    self._cond.wait(timeout)
+                closing = self._closing
+            self.flush()
+            if self._unsynced and time.monotonic() - self._last_sync >= self.fsync_interval:
+                self.sync()
+            if closing:
+                return
+
+    def flush(self):
+        """Escribe (sin fsync) todo lo pendiente."""
+        # tomar lo pendiente con el lock de E/S: dos flush concurrentes no
+        # pueden escribir lotes fuera de orden
+        with self._io_lock:
+            with self._cond:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            for first_seq, batch in pending:
+                self._write_batch(first_seq, batch)
+            self._file.flush()
+            self._unsynced = True
+            self.flushed_seq = self.last_seq
+            retired, self._retired = self._retired, []
+        for f, seg in retired:
+            os.fsync(f.fileno())
+            f.close()
+            seg.save_index()
+
+    def _write_batch(self, first_seq: int, batch: Iterable[Tuple["str | None", bytes]]):
+        records = []
+        seg = self.segments[-1] if self.segments else None
+        offset = seg.size if seg else 0
+        for seq, (room, payload) in enumerate(batch, first_seq):
+            if seg is None or seg.size >= self.segment_bytes:
+                if records:
+                    self._file.write(b"".join(records))
+                    records = []
+                seg = self._rotate(seq)
+                offset = 0
+            record = encode_record(seq, room, payload)
+            if offset - self._last_indexed >= self.index_every:
+                seg.add_index(seq, offset)
+                self._last_indexed = offset
+            records.append(record)
+            offset += len(record)
+            seg.size = offset
+            seg.last_seq = seq
+            self.last_seq = seq
+        if records:
+            self._file.write(b"".join(records))
+
+    def _rotate(self, first_seq: int) -> Segment:
+        if self._file is not None:
+            # el fsync y el cierre los hace flush() ya sin el lock de E/S
+            self._file.flush()
+            self._retired.append((self._file, self.segments[-1]))
+        seg = Segment(self.directory, first_seq)
+        self.segments.append(seg)
+        self._file = open(seg.path, "ab")
+        self._last_indexed = -self.index_every
+        return seg
+
+    def sync(self):
+        """fsync del segmento activo, sin el lock de E/S (sobre un fd duplicado)."""
+        with self._io_lock:
+            fd = os.dup(self._file.fileno()) if self._file is not None else None
+            self._unsynced = False
+            self._last_sync = time.monotonic()
+        if fd is not None:
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def close(self):
+        """Vuelca lo pendiente, hace fsync y detiene el escritor."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self.sync()
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # -------- lectura --------
+
+    @property
+    def first_seq(self) -> int:
+        return self.segments[0].first_seq if self.segments else 1
+
+    def read(self, after_seq: int, limit: int, flush: bool = True) -> List[Entry]:
+        """
+        Hasta `limit` mensajes con secuencia mayor que `after_seq`. Con
+        `flush=False` no vuelca lo pendiente: solo ve hasta `flushed_seq`.
+        """
+        if flush:
+            self.flush()
+        out: List[Entry] = []
+        with self._io_lock:
+            segments = list(self.segments)
+        firsts = [seg.first_seq for seg in segments]
+        i = max(0, bisect.bisect_right(firsts, after_seq + 1) - 1)
+        for seg in segments[i:]:
+            if len(out) >= limit:
+                break
+            if seg.last_seq <= after_seq:
+                continue
+            with self._io_lock:
+                size = seg.size
+            if not size:
+                continue
+            with open(seg.path, "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                start = seg.offset_for(after_seq + 1)
+                for _off, seq, room, payload, _nxt in iter_records(buf, start, min(size, len(buf))):
+                    if seq <= after_seq:
+                        continue
+                    out.append((seq, room, payload))
+                    if len(out) >= limit:
+                        break
+        return out
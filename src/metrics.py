@@ -0,0 +1,131 @@
+"""
+Métricas del servidor: contadores e histogramas baratos de actualizar.
+
+- Contadores: atributos enteros (`m.accepted += 1`), sin locks. Un `+=` sobre
+  un atributo no es atómico (leer, sumar y guardar): con varios hilos
+  incrementando a la vez se puede perder alguna suma, así que bajo
+  concurrencia los contadores son aproximados.
+- Histogramas: cubetas por potencia de 2 (índice = `valor.bit_length()`), así
+  registrar un valor es una suma en una lista; los percentiles son aproximados
+  (cota superior de la cubeta). `observe` toma un lock propio (sin
+  contención casi siempre) para que cubetas, `count` y `total` no se
+  desfasen entre sí.
+
+Con `ChatServer(metrics=False)` el servidor no crea el objeto y el camino
+caliente solo comprueba `if metrics is not None`.
+"""
+
+import threading
+from typing import Dict, List
+
+# cubetas 0..64: alcanza para cualquier entero de 64 bits (ns, bytes, tamaños)
+_BUCKETS = 65
+
+
+class Histogram:
+    """Histograma de enteros no negativos con cubetas log2."""
+
+    __slots__ = ("counts", "count", "total", "max", "_lock")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        # lo observan varios hilos (shards, handshakes TLS): las cuatro
+        # sumas van juntas o no van
+        self._lock = threading.Lock()
+
+    def observe(self, value: int, n: int = 1):
+        """Registra `value` (`n` veces: p. ej. un lote con la misma demora)."""
+        with self._lock:
+            self.counts[value.bit_length()] += n
+            self.count += n
+            self.total += value * n
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, p: float) -> int:
+        """Cota superior aproximada del percentil `p` (0..1); 0 si está vacío."""
+        with self._lock:
+            return self._percentile(p, list(self.counts), self.count, self.max)
+
+    @staticmethod
+    def _percentile(p: float, counts: List[int], count: int, top: int) -> int:
+        if not count:
+            return 0
+        rank = p * count
+        seen = 0
+        for i, n in enumerate(counts):
+            seen += n
+            if seen >= rank and n:
+                return min((1 << i) - 1, top) if i else 0
+        return top
+
+    def summary(self) -> Dict[str, int]:
+        # una sola foto bajo el lock: count, avg y percentiles coinciden
+        with self._lock:
+            counts, count, total, top = list(self.counts), self.count, self.total, self.max
+        return {
+            "count": count,
+            "avg": total // count if count else 0,
+            "p50": self._percentile(0.50, counts, count, top),
+            "p99": self._percentile(0.99, counts, count, top),
+            "max": top,
+        }
+
+
+class Metrics:
+    """Contadores e histogramas de un ChatServer (un proceso)."""
+
+    COUNTERS = (
+        "accepted",           # conexiones aceptadas
+        "rejected",           # conexiones rechazadas por max_connections
+        "reaped",             # conexiones cerradas por inactividad
+        "undrained",          # conexiones cerradas por stop() con salida sin enviar
+        "disconnected",       # conexiones cerradas (incluye clientes muertos)
+        "slow_disconnected",  # desconectados por llenar su cola de salida
+        "received",           # mensajes válidos recibidos
+        "invalid",            # mensajes rechazados con ERR
+        "throttled",          # veces que un lector dejó de leer por límite de tasa o cola llena
+        "broadcast",          # mensajes difundidos (por lote, no por destinatario)
+        "direct",             # mensajes directos (MSG) entregados
+        "batches",            # lotes difundidos
+        "compressed",         # lotes comprimidos (una vez por lote, no por destinatario)
+        "compressed_bytes_in",   # bytes de esos lotes antes de comprimir
+        "compressed_bytes_out",  # y ya comprimidos (con su cabecera de frame)
+        "tls_handshakes",     # handshakes TLS completos
+        "tls_resumed",        # de esos, con sesión reanudada (ticket)
+        "tls_failed",         # handshakes fallidos o vencidos (socket cerrado)
+    )
+    HISTOGRAMS = (
+        "queue_delay_ns",     # llegada -> salida del broadcaster
+        "fanout_ns",          # duración de encolar + enviar un lote a todos
+        "batch_size",         # mensajes por lote
+        "shutdown_ns",        # duración de stop() (drenaje + cierre)
+        "tls_handshake_ns",   # accept -> handshake TLS completo
+    )
+
+    __slots__ = COUNTERS + HISTOGRAMS
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        for name in self.HISTOGRAMS:
+            setattr(self, name, Histogram())
+
+    def snapshot(self, **gauges) -> Dict[str, int]:
+        """Valores planos (nombre -> entero); `gauges` agrega valores del momento."""
+        out: Dict[str, int] = dict(gauges)
+        for name in self.COUNTERS:
+            out[name] = getattr(self, name)
+        for name in self.HISTOGRAMS:
+            for key, value in getattr(self, name).summary().items():
+                out[f"{name}_{key}"] = value
+        return out
+
+    def render(self, **gauges) -> List[str]:
+        """Líneas "STAT nombre valor" terminadas en "END" (comando STATS)."""
+        lines = [f"STAT {k} {v}" for k, v in self.snapshot(**gauges).items()]
+        lines.append("END")
+        return lines
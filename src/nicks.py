@@ -0,0 +1,51 @@
+"""
+Apodos: índice apodo -> conexión para los mensajes directos.
+
+"MSG <apodo> <texto>" busca al destinatario en un dict (O(1)) y encola el
+mensaje solo en su cola de salida: no pasa por `msg_q` ni por el
+broadcaster y no toma el lock del servidor ni `_order_lock`, solo el
+`mode_lock` del destinatario (los mensajes directos no tienen secuencia
+global ni quedan en el historial). El índice
+tiene su propio lock solo para altas y bajas; cada conexión guarda su apodo
+(`Connection.nick`) para liberarlo al desconectarse.
+"""
+
+import threading
+from typing import Dict
+
+from src.connection import Connection
+
+
+class NickIndex:
+    """Apodo -> conexión; un apodo pertenece a una sola conexión a la vez."""
+
+    def __init__(self):
+        self._nicks: Dict[str, Connection] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._nicks)
+
+    def register(self, nick: str, conn: Connection) -> bool:
+        """Asigna `nick` a `conn` (libera el anterior). False si es de otra conexión."""
+        with self._lock:
+            owner = self._nicks.get(nick)
+            if owner is not None and owner is not conn:
+                return False
+            if conn.nick is not None and self._nicks.get(conn.nick) is conn:
+                del self._nicks[conn.nick]
+            self._nicks[nick] = conn
+            conn.nick = nick
+            return True
+
+    def lookup(self, nick: str) -> Connection | None:
+        # un get sobre el dict, sin lock: el camino de cada mensaje directo
+        return self._nicks.get(nick)
+
+    def release(self, conn: Connection):
+        """Limpieza al desconectarse: el apodo queda libre."""
+        with self._lock:
+            nick = conn.nick
+            if nick is not None and self._nicks.get(nick) is conn:
+                del self._nicks[nick]
+            conn.nick = None
@@ -1,8 +1,22 @@
 """
-Utilidades de protocolo: envolver sockets en interfaces de texto por línea.
+Utilidades de protocolo: envolver sockets en interfaces de texto por línea
+y, opcionalmente, framing binario con largo y tipo (ver más abajo).
 """
 
 import socket
+import struct
+import sys
+import time
+import zlib
+
+# Marca de tiempo de llegada del kernel (Linux). Permite ordenar mensajes de
+# distintas conexiones por su llegada real y no por el orden en que cada hilo
+# lector consigue el GIL. En otras plataformas se usa la hora de lectura.
+SO_TIMESTAMPNS = getattr(
+    socket, "SO_TIMESTAMPNS", 35 if sys.platform.startswith("linux") else None
+)
+_TIMESPEC = struct.Struct("@ll")
+_ANC_SIZE = socket.CMSG_SPACE(_TIMESPEC.size) if SO_TIMESTAMPNS else 0
 
 def wrap(sock: socket.socket):
     """
@@ -14,6 +28,14 @@ def wrap(sock: socket.socket):
     wf = sock.makefile("w", encoding="utf-8", newline="\n")
     return rf, wf
 
+def encode_payload(text: str) -> bytes:
+    """Contenido de un mensaje en UTF-8, sin el '\\n' final."""
+    return text.rstrip("\r\n").encode("utf-8")
+
+def encode_line(text: str) -> bytes:
+    """Codifica una línea una sola vez (UTF-8, un único '\\n' final)."""
+    return (text.rstrip("\r\n") + "\n").encode("utf-8")
+
 def send_line(wf, text: str):
     """Envía una línea garantizando un único '\\n' final."""
     wf.write(text.rstrip("\r\n") + "\n")
@@ -33,3 +55,279 @@ def recv_line(rf, timeout=None) -> str | None:
     if line == "":
         return None
     return line.rstrip("\n")
+
+def enable_timestamps(sock: socket.socket) -> None:
+    """Pide al kernel la marca de llegada de cada segmento (si existe)."""
+    if SO_TIMESTAMPNS is None:
+        return
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+    except OSError:
+        pass
+
+# Sondas de keepalive antes de dar por muerto al otro extremo
+KEEPALIVE_PROBES = 4
+
+def enable_keepalive(sock: socket.socket, idle: float) -> None:
+    """
+    TCP keepalive: tras `idle` segundos sin tráfico el kernel sondea al otro
+    extremo y cierra la conexión si no responde (un cliente que desapareció
+    sin FIN deja de ocupar un hilo y un fd). Los ajustes finos solo existen
+    en algunas plataformas.
+    """
+    idle = max(1, int(idle))
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # macOS llama TCP_KEEPALIVE a lo que Linux llama TCP_KEEPIDLE
+        keepidle = getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None))
+        for opt, value in (
+            (keepidle, idle),
+            (getattr(socket, "TCP_KEEPINTVL", None), max(1, idle // KEEPALIVE_PROBES)),
+            (getattr(socket, "TCP_KEEPCNT", None), KEEPALIVE_PROBES),
+        ):
+            if opt is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, opt, value)
+    except OSError:
+        pass
+
+def recv_stamped_into(sock: socket.socket, view: memoryview) -> tuple[int, int]:
+    """
+    Lee en `view` (sin crear bytes nuevos) y devuelve (n_bytes, llegada_ns)
+    en tiempo de reloj (comparable con time.time_ns()). 0 indica EOF.
+    """
+    if not _ANC_SIZE:
+        return sock.recv_into(view), time.time_ns()
+    nbytes, ancdata, _flags, _addr = sock.recvmsg_into([view], _ANC_SIZE)
+    for level, kind, payload in ancdata:
+        if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS:
+            sec, nsec = _TIMESPEC.unpack(payload[: _TIMESPEC.size])
+            return nbytes, sec * 1_000_000_000 + nsec
+    return nbytes, time.time_ns()
+
+# -------- framing binario (opcional, negociado) --------
+#
+# El cliente envía la línea "BINARY"; el servidor responde la línea
+# "OK BINARY" y desde ahí ambos sentidos usan frames:
+#   [largo del payload: u32 big-endian][tipo: u8][payload]
+# FRAME_MSG lleva un mensaje de chat (UTF-8, sin '\n'); FRAME_CMD lleva un
+# comando ("JOIN #sala") o una respuesta del servidor ("OK ...", "ERR ...").
+# FRAME_DM (solo del servidor al cliente) lleva un mensaje directo
+# ("MSG remitente texto"): fuera del orden global, no consume secuencia; por
+# el tipo, un mensaje difundido que empieza con "MSG " no pasa por uno.
+
+FRAME_HEADER = struct.Struct("!IB")
+FRAME_MSG = 1
+FRAME_CMD = 2
+FRAME_DM = 4
+MAX_FRAME = 64 * 1024
+BINARY_COMMAND = "BINARY"
+BINARY_OK = "OK BINARY"
+
+
+class FrameError(ValueError):
+    """Frame inválido (más largo que MAX_FRAME o comprimido corrupto)."""
+
+
+# -------- compresión (opcional, negociada con el framing) --------
+#
+# Con "BINARY ZLIB" en lugar de "BINARY" el servidor confirma con
+# "OK BINARY ZLIB" (o con "OK BINARY" si no comprime) y además de los frames
+# de siempre puede enviar FRAME_ZMSG: deflate crudo con el diccionario
+# ZLIB_DICT que, descomprimido, es una secuencia de frames normales (los
+# FRAME_MSG de un lote). Cada lote se comprime solo, sin estado entre lotes:
+# así el servidor lo comprime una vez y envía el mismo buffer a todos los
+# clientes que comprimen. El diccionario da contexto a lotes cortos, donde
+# deflate sin historia casi no gana. Lo que va del cliente al servidor nunca
+# se comprime.
+
+FRAME_ZMSG = 3
+COMPRESS_OPTION = "ZLIB"
+BINARY_ZLIB_OK = f"{BINARY_OK} {COMPRESS_OPTION}"
+# Tope de un lote descomprimido (el servidor no comprime lotes más grandes)
+MAX_INFLATE = 4 << 20
+COMPRESS_LEVEL = 6
+# deflate crudo: sin cabecera ni checksum de zlib (TCP ya verifica). El
+# compresor usa ventana de 8 KiB y memLevel 6: alcanza para el diccionario y
+# lotes de chat, y crear el compresor cuesta unos µs en lugar de decenas
+# (con los valores por defecto inicializar las tablas domina en lotes
+# chicos). El descompresor acepta la ventana máxima.
+_WBITS = -13
+_INFLATE_WBITS = -15
+_MEM_LEVEL = 6
+
+# Diccionario preestablecido: texto típico de chat y del protocolo. deflate
+# busca coincidencias hacia atrás, así que lo más frecuente va al final.
+ZLIB_DICT = (
+    b"https://www. .com .org .html .png .jpg :) :( :D jaja jajaja haha lol xd "
+    b"the you that this what have with for are but not just can know like "
+    b"will was your about there they would when how all get now out one "
+    b"thanks please sorry yes okay good morning night hello bye "
+    b"que de la el en los las por con una para como pero del lo se su "
+    b"mas ya esta este eso bien si no hay muy hoy todo nada algo tambien "
+    b"donde cuando porque ma\xc3\xb1ana tarde noche gracias buenas buenos dias "
+    b"hola chau saludos alguien sabe tengo tienen puedo puede hacer vamos "
+    b"#general #dev #random #ayuda "
+    b"\x00\x00\x00\x01#general \x00\x00\x00\x01#dev \x00\x00\x00\x01"
+)
+
+
+def compress_frames(frames: bytes) -> bytes:
+    """Comprime frames ya codificados (un lote) en el payload de un FRAME_ZMSG."""
+    c = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, _WBITS, _MEM_LEVEL, zdict=ZLIB_DICT)
+    return c.compress(frames) + c.flush()
+
+def decompress_frames(payload: bytes) -> list[tuple[int, bytes]]:
+    """Los frames (tipo, payload) de un FRAME_ZMSG."""
+    d = zlib.decompressobj(_INFLATE_WBITS, zdict=ZLIB_DICT)
+    try:
+        data = d.decompress(payload, MAX_INFLATE)
+    except zlib.error as e:
+        raise FrameError(f"frame comprimido inválido: {e}") from None
+    if d.unconsumed_tail:
+        raise FrameError(f"frame comprimido de más de {MAX_INFLATE} bytes")
+    frames = []
+    pos, end, hsize = 0, len(data), FRAME_HEADER.size
+    while pos < end:
+        if end - pos < hsize:
+            raise FrameError("frame incompleto dentro de FRAME_ZMSG")
+        length, ftype = FRAME_HEADER.unpack_from(data, pos)
+        pos += hsize
+        if length > MAX_FRAME or end - pos < length:
+            raise FrameError("frame incompleto dentro de FRAME_ZMSG")
+        frames.append((ftype, data[pos:pos + length]))
+        pos += length
+    return frames
+
+
+def encode_frame(ftype: int, payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(payload), ftype) + payload
+
+def send_frame(sock: socket.socket, ftype: int, payload: bytes):
+    sock.sendall(encode_frame(ftype, payload))
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes | None:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+def recv_frame(sock: socket.socket) -> tuple[int, bytes] | None:
+    """Lee un frame completo (bloqueante). Si hay EOF, retorna None."""
+    header = _recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    length, ftype = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME:
+        raise FrameError(f"frame de {length} bytes")
+    payload = _recv_exact(sock, length) if length else b""
+    if payload is None:
+        return None
+    return ftype, payload
+
+def negotiate_binary(sock: socket.socket) -> list[str]:
+    """
+    Pasa la conexión a modo binario. Devuelve las líneas que llegaron antes
+    de la confirmación (mensajes difundidos mientras tanto).
+    Lee byte a byte para no consumir frames que vengan detrás.
+    """
+    before, _reply = _negotiate(sock, BINARY_COMMAND)
+    return before
+
+def negotiate_compressed(sock: socket.socket) -> tuple[list[str], bool]:
+    """
+    Como `negotiate_binary`, pidiendo además compresión ("BINARY ZLIB").
+    Devuelve (líneas previas, True si el servidor la aceptó); si no, la
+    conexión queda en binario sin comprimir.
+    """
+    before, reply = _negotiate(sock, f"{BINARY_COMMAND} {COMPRESS_OPTION}")
+    return before, reply == BINARY_ZLIB_OK
+
+def _negotiate(sock: socket.socket, command: str) -> tuple[list[str], str]:
+    sock.sendall((command + "\n").encode("utf-8"))
+    before = []
+    line = bytearray()
+    while True:
+        b = sock.recv(1)
+        if not b:
+            raise ConnectionError("el servidor cerró durante la negociación")
+        if b != b"\n":
+            line += b
+            continue
+        text = line.decode("utf-8")
+        line.clear()
+        if text in (BINARY_OK, BINARY_ZLIB_OK):
+            return before, text
+        if text.startswith("ERR"):
+            raise ConnectionError(text)
+        before.append(text)
+
+
+class FrameReader:
+    """
+    Parser de frames que no tiene buffer propio: el motor recibe con
+    `recv_into` en su buffer compartido (por hilo o del hilo de E/S) y
+    `feed(buf, n)` devuelve los frames completos de esos bytes. Por conexión
+    solo queda el frame incompleto (`partial`), que crece a demanda y se
+    suelta al completarse. Cada payload se copia una vez; nunca se decodifica.
+    """
+
+    __slots__ = ("partial",)
+
+    def __init__(self):
+        self.partial = bytearray()
+
+    def feed(self, data, n: int | None = None) -> list[tuple[int, bytes]]:
+        """Frames completos con los primeros `n` bytes de `data` (todos, sin `n`)."""
+        view = memoryview(data)
+        if n is not None:
+            view = view[:n]
+        hsize = FRAME_HEADER.size
+        frames = []
+        if self.partial:
+            view = self._complete(view, frames)
+            if self.partial:
+                return frames
+        start, end = 0, len(view)
+        while end - start >= hsize:
+            length, ftype = FRAME_HEADER.unpack_from(view, start)
+            if length > MAX_FRAME:
+                raise FrameError(f"frame de {length} bytes")
+            if end - start - hsize < length:
+                break
+            start += hsize
+            frames.append((ftype, bytes(view[start:start + length])))
+            start += length
+        if start < end:
+            self.partial += view[start:]
+            self._check_header()
+        return frames
+
+    def _complete(self, view: memoryview, frames: list) -> memoryview:
+        """Completa el frame pendiente con el frente de `view`; devuelve el resto."""
+        partial, hsize = self.partial, FRAME_HEADER.size
+        if len(partial) < hsize:
+            take = hsize - len(partial)
+            partial += view[:take]
+            view = view[take:]
+            if len(partial) < hsize:
+                return view
+            self._check_header()
+        length, ftype = FRAME_HEADER.unpack_from(partial)
+        take = hsize + length - len(partial)
+        partial += view[:take]
+        view = view[take:]
+        if len(partial) == hsize + length:
+            frames.append((ftype, bytes(partial[hsize:])))
+            # soltar la memoria del frame (puede ser de hasta MAX_FRAME)
+            self.partial = bytearray()
+        return view
+
+    def _check_header(self):
+        partial = self.partial
+        if len(partial) >= FRAME_HEADER.size:
+            length, _ = FRAME_HEADER.unpack_from(partial)
+            if length > MAX_FRAME:
+                raise FrameError(f"frame de {length} bytes")
@@ -0,0 +1,44 @@
+"""
+Límites de tasa con token buckets.
+
+Cada línea (o frame) recibida consume un token del bucket de su conexión y
+otro del bucket global. Sin tokens no se descarta nada: el lector deja de
+leer ese socket hasta que se recargue (el kernel llena su buffer y TCP frena
+al cliente), así un cliente que inunda no hace crecer la memoria del
+servidor ni le quita turno al resto.
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """`rate` tokens por segundo con ráfagas de hasta `burst` (thread-safe)."""
+
+    __slots__ = ("rate", "burst", "tokens", "stamp", "_lock")
+
+    def __init__(self, rate: float, burst: float | None = None):
+        if rate <= 0:
+            raise ValueError("rate debe ser > 0")
+        self.rate = rate
+        self.burst = max(1.0, burst if burst else rate)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        """Consume un token y devuelve 0; sin tokens, devuelve los segundos hasta el próximo."""
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if tokens >= 1.0:
+                self.tokens = tokens - 1.0
+                return 0.0
+            self.tokens = tokens
+            return (1.0 - tokens) / self.rate
+
+    def refund(self):
+        """Devuelve un token tomado (el otro bucket no dejó pasar la línea)."""
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + 1.0)
@@ -0,0 +1,59 @@
+"""
+Cierre de conexiones inactivas con un único heap de vencimientos.
+
+Cada conexión tiene una sola entrada (vencimiento, orden, conexión) en el
+heap, no un timeout por socket. Recibir datos solo actualiza
+`conn.last_active`; el heap se corrige de forma perezosa: al vencer una
+entrada, si la conexión tuvo actividad se vuelve a encolar con su nuevo
+vencimiento y si no, está inactiva. Así el camino caliente no toca el heap
+y revisar miles de conexiones cuesta O(log n) por vencimiento.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import List
+
+
+class IdleReaper:
+    """Vencimientos por inactividad de `timeout` segundos (thread-safe)."""
+
+    def __init__(self, timeout: float):
+        if timeout <= 0:
+            raise ValueError("timeout debe ser > 0")
+        self.timeout = timeout
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add(self, conn):
+        """Empieza a vigilar `conn` (su `last_active` ya debe estar fijado)."""
+        with self._lock:
+            heapq.heappush(self._heap, (conn.last_active + self.timeout, next(self._seq), conn))
+
+    def next_deadline(self) -> "float | None":
+        """Momento (time.monotonic) del próximo vencimiento, o None."""
+        heap = self._heap
+        return heap[0][0] if heap else None
+
+    def expired(self, now: "float | None" = None) -> List:
+        """Saca y devuelve las conexiones inactivas; las cerradas se olvidan."""
+        if now is None:
+            now = time.monotonic()
+        idle = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                _, _, conn = heapq.heappop(heap)
+                if conn.closed:
+                    continue
+                deadline = conn.last_active + self.timeout
+                if deadline > now:
+                    heapq.heappush(heap, (deadline, next(self._seq), conn))
+                else:
+                    idle.append(conn)
+        return idle
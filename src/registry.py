@@ -0,0 +1,65 @@
+"""
+Registro de conexiones con alta/baja O(1) y snapshot copy-on-write.
+
+`broadcast` necesita recorrer a todos los clientes sin sostener un lock
+mientras envía. En lugar de copiar la lista completa en cada mensaje, el
+registro arma una tupla inmutable solo cuando cambió la membresía y la
+reutiliza en todos los mensajes siguientes; `version` sube en cada cambio.
+"""
+
+import threading
+from typing import Dict, Iterator
+
+from src.connection import Connection
+
+
+class ClientRegistry:
+    """Conexiones indexadas por identidad (no hay comparaciones ni búsquedas lineales)."""
+
+    __slots__ = ("_conns", "_lock", "_snapshot", "version")
+
+    def __init__(self):
+        self._conns: Dict[int, Connection] = {}
+        self._lock = threading.Lock()
+        self._snapshot: tuple | None = ()
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._conns)
+
+    def __contains__(self, conn) -> bool:
+        return self._conns.get(id(conn)) is conn
+
+    def __iter__(self) -> Iterator[Connection]:
+        return iter(self.snapshot())
+
+    def add(self, conn: Connection):
+        with self._lock:
+            self._conns[id(conn)] = conn
+            self._snapshot = None
+            self.version += 1
+
+    def remove(self, conn: Connection) -> bool:
+        """Quita `conn`. Devuelve False si no estaba (ya la quitó otro hilo)."""
+        with self._lock:
+            if self._conns.pop(id(conn), None) is None:
+                return False
+            self._snapshot = None
+            self.version += 1
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._conns.clear()
+            self._snapshot = ()
+            self.version += 1
+
+    def snapshot(self) -> tuple:
+        """Tupla inmutable de las conexiones; solo se reconstruye tras un cambio."""
+        snap = self._snapshot
+        if snap is None:
+            with self._lock:
+                snap = self._snapshot
+                if snap is None:
+                    snap = self._snapshot = tuple(self._conns.values())
+        return snap
@@ -0,0 +1,69 @@
+"""
+Salas (canales): índice sala -> conjunto de miembros.
+
+La difusión a una sala recorre solo a sus miembros, así el costo escala con
+el tamaño de la sala y no con el del servidor. Cada conexión guarda además
+las salas en las que está (`Connection.rooms`), de modo que entrar, salir y
+limpiar a un cliente que se va son O(1) por sala. Los miembros de cada sala
+son un `ClientRegistry`: el snapshot para difundir se reutiliza mientras la
+sala no cambie.
+"""
+
+import threading
+from typing import Dict
+
+from src.connection import Connection
+from src.registry import ClientRegistry
+
+
+class RoomIndex:
+    """Índice de membresía con su propio lock (no usa el del servidor)."""
+
+    def __init__(self):
+        self._rooms: Dict[str, ClientRegistry] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def join(self, room: str, conn: Connection) -> bool:
+        """Agrega `conn` a `room`. Devuelve False si ya era miembro."""
+        with self._lock:
+            if room in conn.rooms:
+                return False
+            members = self._rooms.get(room)
+            if members is None:
+                members = self._rooms[room] = ClientRegistry()
+            members.add(conn)
+            conn.rooms.add(room)
+            return True
+
+    def part(self, room: str, conn: Connection) -> bool:
+        """Saca a `conn` de `room`. Devuelve False si no era miembro."""
+        with self._lock:
+            if room not in conn.rooms:
+                return False
+            conn.rooms.discard(room)
+            self._discard(room, conn)
+            return True
+
+    def leave_all(self, conn: Connection):
+        """Limpieza al desconectarse: sale de todas sus salas."""
+        with self._lock:
+            for room in conn.rooms:
+                self._discard(room, conn)
+            conn.rooms.clear()
+
+    def members(self, room: str) -> tuple:
+        """Snapshot de los miembros actuales (vacío si la sala no existe)."""
+        members = self._rooms.get(room)
+        return members.snapshot() if members is not None else ()
+
+    def _discard(self, room: str, conn: Connection):
+        members = self._rooms.get(room)
+        if members is None:
+            return
+        members.remove(conn)
+        if not members:
+            # las salas vacías desaparecen
+            del self._rooms[room]
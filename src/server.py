@@ -4,33 +4,356 @@ Servidor de chat con sockets TCP (line-based).
 - Mensajes delimitados por '\n'
 - Broadcast a todos (incluye emisor)
 - Mensajes inválidos -> "ERR Invalid message"
+- Salas: "JOIN #sala", "PART #sala" y "ROOM #sala texto"; un mensaje a una
+  sala llega solo a sus miembros como "#sala texto" (ver src/rooms.py).
+- Cada cliente tiene una cola de salida acotada que vacía un hilo escritor
+  con envíos no bloqueantes (un cliente lento no frena al resto).
+- `broadcast` codifica cada mensaje una sola vez y comparte el mismo buffer
+  entre todas las colas de salida.
+- La entrada se lee con `recv_into` sobre un buffer reutilizable; todas las
+  líneas completas de un recv se separan de una vez y sus mensajes pasan al
+  broadcaster en un único ítem de `msg_q`.
+- Cada mensaje lleva su marca de llegada. El broadcaster retiene cada
+  mensaje como mucho `batch_linger` segundos desde su llegada (ventana de
+  reordenamiento), así el orden global es el de llegada y no el de
+  planificación de los hilos lectores; todo lo que ya cumplió la ventana sale
+  junto, hasta `batch_max` mensajes, en un único envío por cliente.
+- Con `fanout_workers=K` los envíos de cada lote los hacen K hilos
+  emisores, cada uno dueño de un shard de las conexiones (src/fanout.py);
+  el orden global lo sigue fijando el broadcaster al encolar.
+- Control de admisión: `max_connections` (las de más reciben
+  "ERR Server full" y se cierran), backlog de escucha configurable, TCP
+  keepalive e `idle_timeout`: un único reaper con un heap de vencimientos
+  (src/reaper.py) cierra a quien no envió nada en ese tiempo ("PING" sirve
+  para mantenerse vivo).
+- `stop(drain=...)` (o `drain_timeout`) detiene con drenaje: deja de aceptar,
+  difunde lo que quedó en `msg_q` y vacía las colas de salida hasta un
+  plazo; después cierra las conexiones en paralelo. La duración queda en la
+  métrica `shutdown_ns`.
+- Mensajes directos: "NICK apodo" registra un apodo y "MSG apodo texto"
+  llega solo a esa conexión como "MSG remitente texto", por un índice
+  apodo -> conexión (src/nicks.py), sin pasar por el broadcaster ni tomar
+  sus locks: solo el `mode_lock` del destinatario, que lo ordena frente a
+  un "BINARY" de esa conexión.
+- Antes de cada lote se aceptan las conexiones ya completadas en el backlog:
+  un cliente que terminó de conectarse antes de que llegara un mensaje lo
+  recibe aunque el hilo de accept todavía no lo hubiera registrado.
+- Métricas (src/metrics.py) consultables con el comando "STATS"; con
+  `metrics=False` no se registra nada.
+- Framing binario opcional: "BINARY" pasa la conexión a frames con largo y
+  tipo (src/protocol.py). Los mensajes viajan por el servidor como payload
+  en bytes, sin decodificar, y cada lote se codifica una vez por modo
+  (líneas o frames) y se comparte entre las conexiones de ese modo.
+- Compresión opcional por conexión ("BINARY ZLIB"): un lote de al menos
+  `compress_min_bytes` se comprime una vez (zlib con diccionario
+  preestablecido) y el mismo buffer va a todas las conexiones que comprimen;
+  los lotes más chicos salen sin comprimir.
+- Historial acotado (src/history.py): cada mensaje entregado recibe un
+  número de secuencia; "HISTORY n" y "SINCE seq" devuelven lo retenido
+  (y opcionalmente se repite al conectar) sin frenar la difusión.
+- Log durable opcional (src/message_log.py, `log_dir`): los lotes entregados
+  se escriben en segundo plano; al reiniciar se retoma la secuencia y el
+  historial, y "SINCE" lee del log lo que ya no está en memoria.
+- El broadcaster publica cada lote en un `bus` (src/bus.py), que lo entrega
+  a los clientes con `deliver`: por defecto directo (`LocalBus`); con
+  `RelayBus`, también a los clientes de otros nodos (malla TCP), y con el
+  hub de src/cluster.py (modo multiproceso) en un orden global entre procesos.
+- Trazas muestreadas (src/tracing.py, `trace_sample=N`): uno de cada N ítems
+  de `msg_q` lleva marcas de lectura, encolado, salida de la cola, lote,
+  fan-out y escritura a cada destinatario; "TRACE" devuelve los histogramas
+  por etapa y los destinatarios más lentos.
+- TLS opcional (src/tls.py, `tls_cert`/`tls_key`): el accept sigue siendo
+  TCP y los handshakes los completan hilos aparte, con plazo
+  (`tls_handshake_timeout`); un cliente lento en negociar no frena al resto.
+  El contexto emite tickets, así que una reconexión reanuda la sesión.
 """
 
+import heapq
+import itertools
+import selectors
 import socket
 import threading
 import queue
 import time
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple
 
-from src.validation import is_valid_message
-from src.protocol import wrap, send_line, recv_line
+from src.validation import CHARS, MAX_LEN, Validator, is_valid_nick, is_valid_room
+from src.bus import LocalBus
+from src.fanout import SenderShard
+from src.history import History
+from src.message_log import DEFAULT_FSYNC_INTERVAL, DEFAULT_SEGMENT_BYTES, MessageLog
+from src.metrics import Metrics
+from src.ratelimit import TokenBucket
+from src.reaper import IdleReaper
+from src.tracing import Tracer
+from src.tls import (
+    DEFAULT_HANDSHAKE_TIMEOUT,
+    HandshakePool,
+    make_server_context,
+    recv_tls_into,
+    wait_readable,
+)
+from src.registry import ClientRegistry
+from src.nicks import NickIndex
+from src.rooms import RoomIndex
+from src.protocol import (
+    BINARY_OK,
+    BINARY_ZLIB_OK,
+    COMPRESS_OPTION,
+    FRAME_CMD,
+    FRAME_DM,
+    FRAME_HEADER,
+    FRAME_MSG,
+    FRAME_ZMSG,
+    MAX_FRAME,
+    MAX_INFLATE,
+    FrameReader,
+    compress_frames,
+    enable_keepalive,
+    enable_timestamps,
+    encode_frame,
+    encode_line,
+    encode_payload,
+    recv_stamped_into,
+)
+from src.connection import (
+    Connection,
+    OutboundQueue,
+    DEFAULT_MAX_QUEUE_BYTES,
+    DEFAULT_MAX_QUEUE_MESSAGES,
+    DISCONNECT,
+    MAX_LINE_BYTES,
+    POLICIES,
+    RECV_SIZE,
+    SEND_FLAGS,
+)
 
-Client = Tuple[socket.socket, object, object]  # (sock, rf, wf)
+# Lote máximo de mensajes por difusión y ventana de reordenamiento (segundos)
+DEFAULT_BATCH_MAX = 1024
+DEFAULT_BATCH_LINGER = 0.002
+# Lotes más chicos (en bytes, ya como frames) salen sin comprimir: ahí
+# deflate gana poco y cuesta más que enviarlos
+DEFAULT_COMPRESS_MIN_BYTES = 256
+# Mensajes retenidos para HISTORY/SINCE (0 = sin historial)
+DEFAULT_HISTORY_SIZE = 1000
+# Máximo de mensajes por respuesta a "SINCE" leída del log
+LOG_READ_LIMIT = 10_000
+# Mensajes esperando al broadcaster antes de frenar a los lectores, y cada
+# cuánto reintenta un lector frenado por la cola llena (segundos)
+DEFAULT_MAX_PENDING = 100_000
+QUEUE_FULL_RETRY = 0.001
+# Conexiones completadas esperando accept() y segundos sin tráfico antes de
+# las sondas de TCP keepalive (0 = sin keepalive)
+DEFAULT_LISTEN_BACKLOG = 100
+DEFAULT_KEEPALIVE_IDLE = 60.0
+# Cada cuánto, como mucho, revisa el reaper (segundos)
+REAP_INTERVAL = 0.5
+# Al detener con drenaje: cada cuánto se revisan las colas de salida
+DRAIN_POLL = 0.005
+# Cierre de conexiones al detener: tandas de este tamaño, una por hilo
+CLOSE_CHUNK = 256
+CLOSE_WORKERS = 8
+
+
+class MessageQueue(queue.Queue):
+    """
+    `queue.Queue` cuyo tamaño cuenta mensajes y no ítems: un ítem puede
+    traer una lista de payloads (los de un mismo recv) y ocupa lo que trae.
+    """
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self.messages = 0
+
+    def _qsize(self):
+        return self.messages
+
+    def _put(self, item):
+        self.queue.append(item)
+        self.messages += 1 if item is None or type(item[1]) is bytes else len(item[1])
+
+    def _get(self):
+        item = self.queue.popleft()
+        self.messages -= 1 if item is None or type(item[1]) is bytes else len(item[1])
+        return item
 
 
 class ChatServer:
-    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        max_queue_bytes: int = DEFAULT_MAX_QUEUE_BYTES,
+        max_queue_messages: int = DEFAULT_MAX_QUEUE_MESSAGES,
+        slow_consumer_policy: str = DISCONNECT,
+        batch_max: int = DEFAULT_BATCH_MAX,
+        batch_linger: float = DEFAULT_BATCH_LINGER,
+        listen_sock: socket.socket | None = None,
+        bus=None,
+        metrics: bool = True,
+        history_size: int = DEFAULT_HISTORY_SIZE,
+        history_replay: int = 0,
+        log_dir: str | None = None,
+        log_segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        log_fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+        rate_limit: float = 0,
+        rate_burst: float = 0,
+        global_rate_limit: float = 0,
+        global_rate_burst: float = 0,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        max_message_len: int = MAX_LEN,
+        length_unit: str = CHARS,
+        reject_control: bool = False,
+        max_connections: int = 0,
+        listen_backlog: int = DEFAULT_LISTEN_BACKLOG,
+        keepalive_idle: float = DEFAULT_KEEPALIVE_IDLE,
+        idle_timeout: float = 0,
+        drain_timeout: float = 0,
+        fanout_workers: int = 0,
+        compression: bool = True,
+        compress_min_bytes: int = DEFAULT_COMPRESS_MIN_BYTES,
+        trace_sample: int = 0,
+        tls_cert: str | None = None,
+        tls_key: str | None = None,
+        tls_handshake_timeout: float = DEFAULT_HANDSHAKE_TIMEOUT,
+        tls_handshake_threads: int = 1,
+    ):
+        if slow_consumer_policy not in POLICIES:
+            raise ValueError(f"política desconocida: {slow_consumer_policy!r}")
+        if batch_max < 1 or batch_linger < 0:
+            raise ValueError("batch_max debe ser >= 1 y batch_linger >= 0")
+        if history_size < 0 or history_replay < 0:
+            raise ValueError("history_size y history_replay deben ser >= 0")
+        if min(rate_limit, rate_burst, global_rate_limit, global_rate_burst, max_pending) < 0:
+            raise ValueError("los límites de tasa y max_pending deben ser >= 0")
+        if min(max_connections, keepalive_idle, idle_timeout) < 0 or listen_backlog < 1:
+            raise ValueError(
+                "max_connections, keepalive_idle e idle_timeout deben ser >= 0 y listen_backlog >= 1"
+            )
+        if min(drain_timeout, fanout_workers, compress_min_bytes, trace_sample) < 0:
+            raise ValueError(
+                "drain_timeout, fanout_workers, compress_min_bytes y trace_sample deben ser >= 0"
+            )
+        if tls_key is not None and tls_cert is None:
+            raise ValueError("tls_key requiere tls_cert")
+        if tls_handshake_timeout <= 0 or tls_handshake_threads < 1:
+            raise ValueError("tls_handshake_timeout debe ser > 0 y tls_handshake_threads >= 1")
         self.host = host
         self.port = port
         self.sock: socket.socket | None = None
-        self.clients: List[Client] = []
+        # Socket de escucha heredado (workers de un cluster)
+        self._listen_sock = listen_sock
+        # Backend de difusión: publish(batch) y start(deliver) / close()
+        self.bus = bus if bus is not None else LocalBus(self.deliver)
+
+        # Salas y comandos del protocolo (primera palabra de la línea)
+        self.rooms = RoomIndex()
+        self.nicks = NickIndex()
+        self._commands = {
+            "JOIN": self._cmd_join,
+            "PART": self._cmd_part,
+            "ROOM": self._cmd_room,
+            "STATS": self._cmd_stats,
+            "BINARY": self._cmd_binary,
+            "HISTORY": self._cmd_history,
+            "SINCE": self._cmd_since,
+            "PING": self._cmd_ping,
+            "NICK": self._cmd_nick,
+            "MSG": self._cmd_msg,
+            "TRACE": self._cmd_trace,
+        }
+        # Verbos en bytes: una línea válida solo se decodifica si es un comando
+        self._command_verbs = frozenset(verb.encode() for verb in self._commands)
+        # Reglas de validación de mensajes, aplicadas sobre los bytes recibidos
+        self.validator = Validator(max_message_len, length_unit, reject_control)
+        # Ordena lo que se encola en las colas de salida respecto de la
+        # difusión: altas de clientes, cambio a binario y respuestas de
+        # historial. Solo se sostiene mientras se encola, nunca al enviar.
+        self._order_lock = threading.Lock()
+
+        # Últimos mensajes entregados con su secuencia; `history_replay` se
+        # envían a cada cliente nuevo al conectarse
+        self.history: History | None = History(history_size) if history_size else None
+        self.history_replay = history_replay if self.history is not None else 0
+        # Límites de tasa (mensajes/s, 0 = sin límite): un bucket por
+        # conexión (ver `_new_bucket`) y uno global compartido
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.rate_limiter: TokenBucket | None = (
+            TokenBucket(global_rate_limit, global_rate_burst) if global_rate_limit else None
+        )
+
+        # Secuencia del próximo mensaje entregado (continúa la del log)
+        self._next_seq = 1
+        self.log: MessageLog | None = None
+        if log_dir is not None:
+            self.log = MessageLog(
+                log_dir, segment_bytes=log_segment_bytes, fsync_interval=log_fsync_interval
+            )
+
+        # Admisión: tope de conexiones (0 = sin tope), backlog de listen(),
+        # keepalive y cierre de inactivas (un heap para todas, ver reap_loop)
+        self.max_connections = max_connections
+        self.listen_backlog = listen_backlog
+        self.keepalive_idle = keepalive_idle
+        self.reaper: IdleReaper | None = IdleReaper(idle_timeout) if idle_timeout else None
+        self.reaper_thread: threading.Thread | None = None
+
+        # None = métricas deshabilitadas (el camino caliente no hace nada)
+        self.metrics: Metrics | None = Metrics() if metrics else None
+        # None = sin trazas; si no, una de cada `trace_sample` ítems de msg_q
+        self.tracer: Tracer | None = Tracer(trace_sample) if trace_sample else None
+        self.started = time.monotonic()
+        self.clients = ClientRegistry()
         self.lock = threading.RLock()
         self.running = threading.Event()
+        # stop() en curso: no se aceptan más conexiones (ver _accept_pending);
+        # `drain_timeout` es el plazo por defecto para vaciar lo pendiente
+        self.stopping = threading.Event()
+        self.drain_timeout = drain_timeout
         self.accept_thread: threading.Thread | None = None
+        # Lo toman el hilo de accept y el broadcaster (ver _accept_pending)
+        self._accept_lock = threading.Lock()
 
-        # Cola de mensajes y thread broadcaster (orden global)
-        self.msg_q: "queue.Queue[str | None]" = queue.Queue()
+        # Cola de mensajes (llegada_ns, payload, sala) y thread broadcaster
+        # (orden global); sala None = todos. El payload es UTF-8 sin '\n', o
+        # una lista de payloads con la misma llegada (un recv entero).
+        # Acotada (`max_pending` mensajes, 0 = sin límite): llena, los
+        # lectores dejan de leer sus sockets en lugar de acumular memoria
+        # (ver `_admit`); un recv puede pasarse del límite por lo que trae.
+        self.msg_q: "queue.Queue[tuple[int, bytes | list, str | None] | None]" = MessageQueue(
+            max_pending
+        )
         self.bcast_thread: threading.Thread | None = None
+        # Hilos emisores (0 = el broadcaster envía); cada conexión pertenece
+        # al shard `fd % K`
+        self.fanout_workers = fanout_workers
+        self.shards: List[SenderShard] = []
+        self.batch_max = batch_max
+        self.batch_linger = batch_linger
+        # Aceptar "BINARY ZLIB" y tamaño mínimo de un lote para comprimirlo
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        # TLS: contexto (None = en claro) e hilos que completan los handshakes
+        self.tls_context = make_server_context(tls_cert, tls_key) if tls_cert else None
+        self.tls_handshake_timeout = tls_handshake_timeout
+        self.tls_handshake_threads = tls_handshake_threads
+        self.handshakers: HandshakePool | None = None
+
+        # Colas de salida por cliente y escritor independiente
+        self.max_queue_bytes = max_queue_bytes
+        self.max_queue_messages = max_queue_messages
+        self.slow_consumer_policy = slow_consumer_policy
+        self.writer_thread: threading.Thread | None = None
+        self._wsel: selectors.BaseSelector | None = None
+
+        # Conexiones con datos pendientes + despertador del select() del escritor
+        self._wake_r: socket.socket | None = None
+        self._wake_w: socket.socket | None = None
+        self._pending_lock = threading.Lock()
+        self._pending: set = set()
+        self._woken = False
 
     @property
     def address(self) -> tuple[str, int]:
@@ -43,11 +366,16 @@ class ChatServer:
 
     def start(self):
         """Inicializa el socket y arranca los hilos de aceptación y broadcast."""
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.sock.bind((self.host, self.port))
-        self.sock.listen(100)
+        self.sock = self._listen()
+        self._open_wakeup()
+        self._wsel = selectors.DefaultSelector()
+        self._wsel.register(self._wake_r, selectors.EVENT_READ, None)
+        self.stopping.clear()
         self.running.set()
+        self._restore_log()
+        self.bus.start(self.deliver)
+        self._start_shards()
+        self._start_tls()
 
         self.accept_thread = threading.Thread(
             target=self.accept_loop, name="accept-loop", daemon=True
@@ -60,142 +388,1202 @@ class ChatServer:
         )
         self.bcast_thread.start()
 
-    def stop(self):
-        """Detiene el servidor y cierra todos los clientes."""
+        # Hilo que vacía las colas de salida de todos los clientes
+        self.writer_thread = threading.Thread(
+            target=self.writer_loop, name="writer-loop", daemon=True
+        )
+        self.writer_thread.start()
+
+        if self.reaper is not None:
+            self.reaper_thread = threading.Thread(
+                target=self.reap_loop, name="idle-reaper", daemon=True
+            )
+            self.reaper_thread.start()
+
+    def _listen(self) -> socket.socket:
+        """Crea el socket de escucha (compartido por todos los motores)."""
+        if self._listen_sock is not None:
+            sock = self._listen_sock
+            sock.setblocking(False)
+            return sock
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.listen_backlog)
+        # no bloqueante: el broadcaster también acepta (_accept_pending)
+        sock.setblocking(False)
+        return sock
+
+    def _start_tls(self):
+        if self.tls_context is None:
+            return
+        self.handshakers = HandshakePool(
+            self.tls_context,
+            self._tls_ready,
+            threads=self.tls_handshake_threads,
+            timeout=self.tls_handshake_timeout,
+            metrics=self.metrics,
+        )
+        self.handshakers.start()
+
+    def _stop_tls(self):
+        # los handshakes a medio hacer se cierran: ya no se registra a nadie
+        if self.handshakers is not None:
+            self.handshakers.close()
+            self.handshakers = None
+
+    def _start_shards(self):
+        self.shards = [SenderShard(i, self._deliver) for i in range(self.fanout_workers)]
+        for shard in self.shards:
+            shard.start()
+
+    def _stop_shards(self):
+        for shard in self.shards:
+            shard.close()
+
+    def _restore_log(self):
+        """Retoma secuencia e historial desde el log y arranca su escritor."""
+        if self.log is None:
+            return
+        last = self.log.last_seq
+        self._next_seq = last + 1
+        if self.history is not None:
+            cap = self.history.capacity
+            tail = self.log.read(max(0, last - cap), cap)
+            self.history = History(cap, next_seq=tail[0][0] if tail else last + 1)
+            self.history.extend((room, payload) for _seq, room, payload in tail)
+        self.log.start()
+
+    def _open_wakeup(self):
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+
+    def _new_connection(self, sock: socket.socket) -> Connection:
+        if self.keepalive_idle:
+            enable_keepalive(sock, self.keepalive_idle)
+        conn = Connection(sock, self._new_queue())
+        if self.rate_limit:
+            conn.bucket = TokenBucket(self.rate_limit, self.rate_burst)
+        return conn
+
+    def _new_queue(self) -> OutboundQueue:
+        return OutboundQueue(
+            max_bytes=self.max_queue_bytes,
+            max_messages=self.max_queue_messages,
+            policy=self.slow_consumer_policy,
+        )
+
+    def stop(self, drain: float | None = None):
+        """
+        Detiene el servidor y cierra todos los clientes. Con `drain` segundos
+        (por defecto `drain_timeout`), antes de cerrar difunde lo que quedó
+        en `msg_q` y espera a que se vacíen las colas de salida.
+        """
+        started = time.monotonic_ns()
+        self.stopping.set()
+        # Un socket heredado es compartido con otros procesos: shutdown() los
+        # dejaría a todos sin escuchar (lo hace el proceso padre del cluster)
+        if self.sock and self._listen_sock is None:
+            # shutdown() despierta al select() del hilo de accept; close() solo
+            # no lo hace en Linux, y cerrar antes de que despierte le quita el
+            # evento (se cierra después de esperarlo)
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._stop_tls()
+        drain = self.drain_timeout if drain is None else drain
+        if drain > 0:
+            self._drain(time.monotonic() + drain)
         self.running.clear()
-        try:
-            if self.sock:
-                # cerrar el listen socket para desbloquear accept()
-                self.sock.close()
-        except Exception:
-            pass
 
         # Avisar al broadcaster que debe terminar (centinela)
         try:
-            self.msg_q.put(None)
+            self.msg_q.put(None, timeout=1.0)
         except Exception:
             pass
 
         # Cerrar clientes
-        with self.lock:
-            for sock, rf, wf in list(self.clients):
-                for closee in (rf, wf, sock):
-                    try:
-                        closee.close()
-                    except Exception:
-                        pass
-            self.clients.clear()
+        self._close_connections(self.clients.snapshot())
+        self.clients.clear()
 
         # Esperar fin de hilos
         if self.accept_thread:
             self.accept_thread.join(timeout=1.0)
             self.accept_thread = None
+        if self.reaper_thread:
+            self.reaper_thread.join(timeout=1.0)
+            self.reaper_thread = None
+        try:
+            if self.sock:
+                self.sock.close()
+        except Exception:
+            pass
 
         if self.bcast_thread:
             self.bcast_thread.join(timeout=1.0)
             self.bcast_thread = None
+        self._stop_shards()
+        self.bus.close()
+        if self.log is not None:
+            # lo ya entregado (incluido lo que vació el broadcaster) queda en disco
+            self.log.close()
+
+        self._wake()
+        if self.writer_thread:
+            self.writer_thread.join(timeout=1.0)
+            self.writer_thread = None
+        for closee in (self._wsel, self._wake_r, self._wake_w):
+            try:
+                if closee is not None:
+                    closee.close()
+            except Exception:
+                pass
+        self._stopped(started)
+
+    def _drain(self, deadline: float) -> bool:
+        """
+        Vacía lo pendiente antes de cerrar (ambos motores): el broadcaster
+        difunde todo `msg_q` y termina, y después se espera a que las colas
+        de salida queden vacías. Devuelve False si venció `deadline` antes.
+        """
+        try:
+            self.msg_q.put(None, timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Full:
+            return False
+        if self.bcast_thread:
+            self.bcast_thread.join(timeout=max(0.0, deadline - time.monotonic()))
+            if self.bcast_thread.is_alive():
+                return False
+            self.bcast_thread = None
+        while True:
+            busy = [c for c in self.clients.snapshot() if not c.closed and (c.pending or c.outq)]
+            if not busy:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            # el escritor (o el hilo de E/S) las vacía; sin consumidor, vence el plazo
+            self._schedule_write(busy)
+            time.sleep(DRAIN_POLL)
+
+    def _close_connections(self, conns: List[Connection]):
+        """Cierra `conns` (shutdown + close) en tandas de CLOSE_CHUNK, en paralelo."""
+        if self.metrics is not None:
+            self.metrics.undrained += sum(1 for c in conns if c.pending or c.outq)
+        if len(conns) <= CLOSE_CHUNK:
+            self._close_chunk(conns)
+            return
+        chunks = [conns[i:i + CLOSE_CHUNK] for i in range(0, len(conns), CLOSE_CHUNK)]
+        with ThreadPoolExecutor(min(CLOSE_WORKERS, len(chunks))) as pool:
+            for chunk in chunks:
+                pool.submit(self._close_chunk, chunk)
+
+    @staticmethod
+    def _close_chunk(conns: List[Connection]):
+        for conn in conns:
+            conn.close()
+
+    def _stopped(self, started: int):
+        if self.metrics is not None:
+            self.metrics.shutdown_ns.observe(time.monotonic_ns() - started)
 
     # -------- bucles internos --------
 
     def accept_loop(self):
         assert self.sock is not None
-        while self.running.is_set():
-            try:
-                client_sock, _ = self.sock.accept()
-            except OSError:
-                # socket cerrado al hacer stop()
-                break
+        sel = selectors.DefaultSelector()
+        sel.register(self.sock, selectors.EVENT_READ)
+        try:
+            while self.running.is_set():
+                sel.select(timeout=0.5)
+                if not self._accept_pending():
+                    # socket cerrado al hacer stop()
+                    break
+        finally:
+            sel.close()
+
+    def _accept_pending(self) -> bool:
+        """
+        Acepta sin bloquear todo lo que ya está en el backlog y lo registra.
+        Lo llama también el broadcaster antes de cada lote; el lock garantiza
+        que al volver no quede ningún cliente a medio registrar.
+        Devuelve False si el socket de escucha ya no sirve.
+        """
+        if self.sock is None or self.stopping.is_set():
+            return False
+        with self._accept_lock:
+            while True:
+                try:
+                    client_sock, _ = self.sock.accept()
+                except (BlockingIOError, InterruptedError):
+                    return True
+                except OSError:
+                    return False
+                if self.max_connections and self._admitted() >= self.max_connections:
+                    self._refuse(client_sock)
+                    continue
+                if self.handshakers is not None:
+                    self._handshake(client_sock)
+                else:
+                    self._register(client_sock)
 
-            # Optimización de latencia
+    def _admitted(self) -> int:
+        """Conexiones que cuentan para `max_connections` (con TLS, también las que negocian)."""
+        handshakers = self.handshakers
+        return len(self.clients) + (len(handshakers) if handshakers is not None else 0)
+
+    def _handshake(self, client_sock: socket.socket):
+        """Pasa el socket a los hilos de handshake: el accept no espera a TLS."""
+        try:
+            client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except Exception:
+            pass
+        self.handshakers.submit(client_sock)
+
+    def _tls_ready(self, tls_sock):
+        """Handshake completo (desde un hilo de handshake): registrar como cualquier cliente."""
+        if self.stopping.is_set():
+            tls_sock.close()
+            return
+        self._register(tls_sock)
+
+    def _refuse(self, client_sock: socket.socket):
+        """Rechaza una conexión por encima de `max_connections`."""
+        if self.metrics is not None:
+            self.metrics.rejected += 1
+        if self.tls_context is None:
+            # con TLS no hay cómo avisar antes del handshake: solo se cierra
             try:
-                client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-            except Exception:
+                client_sock.send(b"ERR Server full\n", SEND_FLAGS)
+            except OSError:
                 pass
+        client_sock.close()
 
-            # *** REGISTRO INMEDIATO DEL CLIENTE ***
-            rf, wf = wrap(client_sock)
-            with self.lock:
-                self.clients.append((client_sock, rf, wf))
+    def _register(self, client_sock: socket.socket):
+        if self.tls_context is not None:
+            # TLS: sigue no bloqueante, el lector espera con poll (_recv_tls)
+            # y TCP_NODELAY ya se puso antes del handshake
+            conn = self._new_connection(client_sock)
+            self._add_client(conn)
+            threading.Thread(target=self.client_loop, args=(conn,), daemon=True).start()
+            return
 
-            # Ahora sí, arrancamos el lector
-            thread = threading.Thread(
-                target=self.client_loop,
-                args=(client_sock, rf, wf),
-                daemon=True,
-            )
-            thread.start()
+        client_sock.setblocking(True)
 
-    def client_loop(self, client_sock: socket.socket, rf, wf):
+        # Optimización de latencia
         try:
-            while self.running.is_set():
-                msg = recv_line(rf)
-                if msg is None:  # EOF o timeout -> cliente se fue
-                    break
+            client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except Exception:
+            pass
 
-                if not is_valid_message(msg):
-                    # avisar solo al emisor
-                    try:
-                        send_line(wf, "ERR Invalid message")
-                    except Exception:
-                        pass
-                    continue
+        enable_timestamps(client_sock)
+
+        # *** REGISTRO INMEDIATO DEL CLIENTE ***
+        conn = self._new_connection(client_sock)
+        self._add_client(conn)
+
+        # Ahora sí, arrancamos el lector
+        thread = threading.Thread(
+            target=self.client_loop,
+            args=(conn,),
+            daemon=True,
+        )
+        thread.start()
 
-                # Encolar para garantizar orden global de difusión
-                self.msg_q.put(msg)
+    def _add_client(self, conn: Connection):
+        """
+        Registra `conn` (ambos motores); el historial inicial va antes que lo
+        que se difunda después.
+        """
+        with self._order_lock:
+            self.clients.add(conn)
+            # en el mismo paso que `clients`: un lote que ya la incluye
+            # avisa a su shard con la conexión adentro
+            if self.shards:
+                self.shards[conn.fd % len(self.shards)].members.add(conn)
+            if self.history_replay:
+                self._push_history(
+                    conn, self.history.last(self.history_replay), self.history.last_seq
+                )
+        if self.history_replay:
+            self._deliver((conn,))
+        if self.reaper is not None:
+            self.reaper.add(conn)
+        if self.metrics is not None:
+            self.metrics.accepted += 1
+
+    def client_loop(self, conn: Connection):
+        # buffer de recepción del hilo, reutilizado en cada recv_into
+        rxbuf = bytearray(RECV_SIZE)
+        rxview = memoryview(rxbuf)
+        recv = self._recv_tls if conn.tls else self._recv_plain
+        try:
+            while self.running.is_set():
+                n, arrived = recv(conn, rxview)
+                reader = conn.reader
+                if reader is not None:
+                    # modo binario: el parser solo guarda el frame incompleto
+                    if not n:  # EOF; un frame incompleto se descarta
+                        break
+                    conn.last_active = time.monotonic()
+                    if not self.handle_frames(conn, reader.feed(rxbuf, n), arrived):
+                        return
+                    continue
+                if not n:  # EOF -> cliente se fue
+                    # una última línea sin '\n' se procesa igual que readline()
+                    if conn.inbuf:
+                        self.process_line(conn, bytes(conn.inbuf), arrived)
+                    break
+                conn.last_active = time.monotonic()
+                if not self.handle_data(conn, rxbuf, arrived, n):
+                    return
 
         except Exception:
             # errores por desconexión o EPIPE: ignoramos y limpiamos
             pass
         finally:
             # remover y cerrar recursos de este cliente
-            with self.lock:
-                try:
-                    self.clients.remove((client_sock, rf, wf))
-                except ValueError:
-                    pass
-            for closee in (rf, wf, client_sock):
-                try:
-                    closee.close()
-                except Exception:
-                    pass
+            self._drop_client(conn)
+
+    @staticmethod
+    def _recv_plain(conn: Connection, view) -> tuple[int, int]:
+        return recv_stamped_into(conn.sock, view)
+
+    def _recv_tls(self, conn: Connection, view) -> tuple[int, int]:
+        """
+        recv bloqueante del motor por hilos sobre un SSLSocket no bloqueante:
+        espera con poll sin tomar `wlock` (los envíos siguen) y lee con el
+        lock tomado. Lo ya descifrado en OpenSSL (`pending`) no despierta al
+        poll, así que se lee sin esperar.
+        """
+        sock = conn.sock
+        while True:
+            if not sock.pending() and not wait_readable(sock):
+                if conn.closed or not self.running.is_set():
+                    return 0, time.time_ns()
+                continue
+            try:
+                return recv_tls_into(conn, view)
+            except BlockingIOError:
+                continue
+
+    def reap_loop(self):
+        """Cierra las conexiones inactivas a medida que vencen (un hilo para todas)."""
+        reaper = self.reaper
+        while self.running.is_set():
+            deadline = reaper.next_deadline()
+            wait = REAP_INTERVAL if deadline is None else deadline - time.monotonic()
+            if wait > 0:
+                # stop() lo despierta: no se cierra por inactividad mientras drena
+                if self.stopping.wait(min(wait, REAP_INTERVAL)):
+                    return
+                continue
+            for conn in reaper.expired():
+                self._reap(conn)
+
+    def _reap(self, conn: Connection):
+        self._notify_idle(conn)
+        self._drop_client(conn)
+
+    def _notify_idle(self, conn: Connection):
+        """Avisa a una conexión inactiva antes de cerrarla (si entra sin bloquear)."""
+        if self.metrics is not None:
+            self.metrics.reaped += 1
+        self._push_payloads(conn, [b"ERR Idle timeout"], FRAME_CMD)
+        try:
+            with conn.wlock:
+                conn.flush(SEND_FLAGS)
+        except OSError:
+            pass
 
     def broadcast_loop(self):
         """Toma mensajes de la cola y los difunde en un único hilo para preservar orden global."""
-        while True:
+        linger_ns = int(self.batch_linger * 1e9)
+        publish = self.bus.publish
+        metrics = self.metrics
+        tracer = self.tracer
+        # (llegada_ns, orden de encolado, sala, payload, plazo): líneas de un
+        # mismo recv() comparten marca y no deben reordenarse entre sí. La
+        # marca es de pared (SO_TIMESTAMPNS) y solo fija el orden; el plazo
+        # (monotónico, al encolar + linger) acota la espera si el reloj de
+        # pared salta hacia atrás y las marcas quedan "en el futuro"
+        heap: list = []
+        seq = itertools.count()
+        # orden de encolado -> Trace de los ítems muestreados que esperan lote
+        traced: dict = {}
+        stop = False
+        while not stop:
+            if heap:
+                head = heap[0]
+                wait = min(
+                    head[0] + linger_ns - time.time_ns(), head[4] - time.monotonic_ns()
+                ) / 1e9
+                timeout = min(max(wait, 0.0), 0.1)
+            else:
+                timeout = 0.1
             try:
-                item = self.msg_q.get(timeout=0.1)
+                item = self.msg_q.get(timeout=timeout)
             except queue.Empty:
-                if not self.running.is_set():
+                if not heap and not self.running.is_set():
                     break
+                item = ()
+            # drenar todo lo que ya está encolado, sin pausas fijas
+            while item is not None:
+                if item:
+                    arrived, payload, room = item
+                    key = next(seq)
+                    # una lista (un recv entero) ocupa una sola entrada
+                    heapq.heappush(
+                        heap, (arrived, key, room, payload, time.monotonic_ns() + linger_ns)
+                    )
+                    if tracer is not None:
+                        trace = tracer.dequeued(item)
+                        if trace is not None:
+                            traced[key] = trace
+                try:
+                    item = self.msg_q.get_nowait()
+                except queue.Empty:
+                    break
+            if item is None:  # centinela de stop(): sale todo lo retenido
+                stop = True
+
+            cutoff = time.time_ns() - linger_ns
+            now = time.monotonic_ns()
+            while heap and (stop or heap[0][0] <= cutoff or heap[0][4] <= now):
+                batch = []
+                traces = []
+                while (
+                    heap and len(batch) < self.batch_max
+                    and (stop or heap[0][0] <= cutoff or heap[0][4] <= now)
+                ):
+                    arrived, key, room, payload, due = heapq.heappop(heap)
+                    if traced and key in traced:
+                        traces.append(traced.pop(key))
+                    if type(payload) is bytes:
+                        batch.append((room, payload))
+                        n = 1
+                    else:
+                        room_left = self.batch_max - len(batch)
+                        if len(payload) > room_left:
+                            # lo que no entra vuelve con la misma clave: sigue primero
+                            heapq.heappush(heap, (arrived, key, room, payload[room_left:], due))
+                            payload = payload[:room_left]
+                        batch += [(room, p) for p in payload]
+                        n = len(payload)
+                    if metrics is not None:
+                        metrics.queue_delay_ns.observe(max(0, time.time_ns() - arrived), n)
+                if metrics is not None:
+                    metrics.batches += 1
+                    metrics.batch_size.observe(len(batch))
+                if traces:
+                    tracer.publishing(traces)
+                publish(batch)
+
+    def deliver(self, batch: List[Tuple[str | None, bytes]]):
+        """Entrega un lote ya ordenado de (sala, payload) a los clientes de este proceso."""
+        self._accept_pending()
+        # tramos consecutivos con el mismo destino: cada cliente recibe lo
+        # suyo en orden y cada tramo sale en un único envío
+        groups = [
+            (room, [payload for _room, payload in items])
+            for room, items in itertools.groupby(batch, key=lambda it: it[0])
+        ]
+        self._fanout(groups, record=batch)
+
+    def handle_data(self, conn: Connection, data, arrived: int, n: int | None = None) -> bool:
+        """
+        Procesa un bloque recibido en modo línea (los primeros `n` bytes de
+        `data` si es un buffer reutilizable). Devuelve False si la conexión
+        debe cerrarse.
+        """
+        items = [(None, raw) for raw in conn.feed(data, n)]
+        if not self.handle_items(conn, items, arrived):
+            return False
+        return len(conn.inbuf) <= MAX_LINE_BYTES
+
+    def handle_frames(self, conn: Connection, frames, arrived: int) -> bool:
+        return self.handle_items(conn, frames, arrived)
+
+    def handle_items(self, conn: Connection, items: list, arrived: int, start: int = 0) -> bool:
+        """
+        Procesa en orden `items`: (None, línea) o (tipo, payload) de un frame.
+        Primero pasan por `_admit` (límites de tasa y lugar en msg_q) todos
+        los que entran sin esperar; solo ese tramo admitido se valida de una
+        vez (`Validator.check_many`), así un cliente limitado no gasta CPU en
+        validar lo que todavía no puede enviar. Si hay que esperar,
+        `_throttle` decide cómo. Si una línea negoció el modo binario, lo que
+        seguía en el bloque ya son frames. Los mensajes se juntan en `out`
+        para encolarlos con un solo put (antes de un comando o de esperar,
+        sale lo juntado hasta ahí).
+        Devuelve False si la conexión debe cerrarse.
+        """
+        out: list = []
+        i, end = start, len(items)
+        admitted = 0  # items[i] ya admitido tras una espera
+        try:
+            while i < end:
+                j, wait = i + admitted, 0.0
+                admitted = 0
+                while j < end:
+                    wait = self._admit(conn)
+                    if wait:
+                        break
+                    j += 1
+                valid = self.validator.check_many([data for _kind, data in items[i:j]])
+                for k in range(i, j):
+                    if conn.closed:
+                        return False
+                    kind, data = items[k]
+                    if kind is not None:
+                        if not self.process_frame(conn, kind, data, arrived, valid[k - i], out):
+                            return False
+                        continue
+                    if not self.process_line(conn, data, arrived, valid[k - i], out):
+                        return False
+                    if conn.reader is not None:
+                        # lo que sigue se vuelve a admitir como frames
+                        self._refund(conn, j - k - 1)
+                        rest = b"\n".join([raw for _kind, raw in items[k + 1:]] + [bytes(conn.inbuf)])
+                        conn.inbuf.clear()
+                        return self.handle_items(conn, conn.reader.feed(rest), arrived)
+                i = j
+                if wait:
+                    self._queue_batch(arrived, out)
+                    if self.metrics is not None:
+                        self.metrics.throttled += 1
+                    while wait:
+                        if self._throttle(conn, items, i, wait):
+                            return True  # estacionado: se retoma más tarde
+                        wait = self._admit(conn)
+                    # se admite ahora: esa es su llegada para el orden global
+                    arrived = time.time_ns()
+                    admitted = 1
+            return True
+        finally:
+            self._queue_batch(arrived, out)
+
+    def _admit(self, conn: Connection) -> float:
+        """
+        0 si la próxima línea de `conn` puede procesarse (y consume sus
+        tokens); si no, segundos a esperar sin leer más de ese socket.
+        """
+        if self.msg_q.full():
+            return QUEUE_FULL_RETRY
+        bucket = conn.bucket
+        if bucket is not None:
+            wait = bucket.take()
+            if wait:
+                return wait
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.take()
+            if wait:
+                if bucket is not None:
+                    bucket.refund()
+                return wait
+        return 0.0
+
+    def _refund(self, conn: Connection, n: int):
+        """Devuelve los tokens de `n` ítems admitidos que no se procesaron."""
+        bucket, limiter = conn.bucket, self.rate_limiter
+        for _ in range(n):
+            if bucket is not None:
+                bucket.refund()
+            if limiter is not None:
+                limiter.refund()
+
+    def _throttle(self, conn: Connection, items: list, index: int, wait: float) -> bool:
+        """
+        Espera `wait` segundos antes de reintentar `items[index]`. En este
+        motor el lector de la conexión simplemente duerme: mientras tanto no
+        lee su socket. Devuelve True si hay que abandonar el bloque (stop()).
+        """
+        if not self.running.is_set():
+            return True
+        # de a poco: stop() no espera a un lector frenado por mucho tiempo
+        time.sleep(min(wait, 0.1))
+        conn.last_active = time.monotonic()  # frenada no es inactiva
+        return False
+
+    def process_line(
+        self, conn: Connection, raw: bytes, arrived: int, valid: bool | None = None, out: list | None = None
+    ) -> bool:
+        """
+        Valida una línea recibida y la encola para difusión (o responde ERR).
+        `valid` es el resultado de `validator.check` si ya se validó en lote;
+        con `out`, el mensaje se agrega ahí en lugar de encolarse solo.
+        Un mensaje válido se encola sin decodificarlo; solo se decodifican
+        los comandos y las líneas inválidas (UTF-8 roto cierra la conexión).
+        Devuelve False si la conexión debe cerrarse.
+        """
+        if valid is None:
+            valid = self.validator.check(raw)
+        if not valid:
+            try:
+                raw.decode("utf-8")
+            except UnicodeDecodeError:
+                return False
+            self._reject(conn)
+            return True
+        if raw.partition(b" ")[0] in self._command_verbs:
+            # lo anterior del mismo bloque sale antes que lo que encole el comando
+            if out:
+                self._queue_batch(arrived, out)
+            if self._run_command(conn, raw.decode("utf-8"), arrived):
+                return True
+
+        # Encolar para garantizar orden global de difusión
+        if self.metrics is not None:
+            self.metrics.received += 1
+        if out is not None:
+            out.append(raw.rstrip(b"\r\n"))
+        else:
+            self._queue_msg((arrived, raw.rstrip(b"\r\n"), None))
+        return True
+
+    def process_frame(
+        self,
+        conn: Connection,
+        ftype: int,
+        payload: bytes,
+        arrived: int,
+        valid: bool | None = None,
+        out: list | None = None,
+    ) -> bool:
+        """
+        Como `process_line` para un frame. Un mensaje se valida sobre los
+        bytes y se encola tal cual. Devuelve False si la conexión debe cerrarse.
+        """
+        if ftype == FRAME_MSG:
+            if valid is None:
+                valid = self.validator.check(payload)
+            if not valid:
+                self._reject(conn)
+                return True
+            if self.metrics is not None:
+                self.metrics.received += 1
+            if out is not None:
+                out.append(payload)
+            else:
+                self._queue_msg((arrived, payload, None))
+            return True
+        if ftype == FRAME_CMD:
+            try:
+                msg = payload.decode("utf-8")
+            except UnicodeDecodeError:
+                return False
+            if out:
+                self._queue_batch(arrived, out)
+            if not self._run_command(conn, msg, arrived):
+                self.send_to(conn, "ERR Unknown command")
+            return True
+        return False  # tipo desconocido: el cliente no habla este protocolo
+
+    def _queue_msg(self, item):
+        # `_admit` ya vio lugar; con varios lectores a la vez puede llenarse
+        # igual y el lector espera (sin leer su socket) hasta que haya
+        if self.tracer is not None:
+            self.tracer.enqueued(item)
+        while True:
+            try:
+                self.msg_q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if not self.running.is_set():
+                    return
+
+    def _queue_batch(self, arrived: int, out: list):
+        """Encola en un solo ítem los mensajes juntados en `out` y lo vacía."""
+        if out:
+            self._queue_msg((arrived, out[0] if len(out) == 1 else out[:], None))
+            out.clear()
+
+    def _run_command(self, conn: Connection, msg: str, arrived: int) -> bool:
+        """Ejecuta `msg` si es un comando conocido; False si no lo es."""
+        verb, _, arg = msg.partition(" ")
+        handler = self._commands.get(verb)
+        if handler is None:
+            return False
+        handler(conn, arg.strip(), arrived)
+        return True
+
+    def _reject(self, conn: Connection):
+        # avisar solo al emisor
+        if self.metrics is not None:
+            self.metrics.invalid += 1
+        self.send_to(conn, "ERR Invalid message")
+
+    # -------- comandos --------
+
+    def _cmd_join(self, conn: Connection, room: str, arrived: int):
+        if not is_valid_room(room):
+            self.send_to(conn, "ERR Invalid room")
+            return
+        self.rooms.join(room, conn)
+        self.send_to(conn, f"OK JOIN {room}")
+
+    def _cmd_part(self, conn: Connection, room: str, arrived: int):
+        if not self.rooms.part(room, conn):
+            self.send_to(conn, "ERR Not in room")
+            return
+        self.send_to(conn, f"OK PART {room}")
+
+    def _cmd_room(self, conn: Connection, arg: str, arrived: int):
+        room, _, text = arg.partition(" ")
+        if room not in conn.rooms:
+            self.send_to(conn, "ERR Not in room")
+            return
+        if not text.strip():
+            self.send_to(conn, "ERR Invalid message")
+            return
+        # pasa por msg_q como cualquier mensaje: mismo orden global
+        if self.metrics is not None:
+            self.metrics.received += 1
+        self._queue_msg((arrived, encode_payload(f"{room} {text}"), room))
+
+    def _cmd_nick(self, conn: Connection, nick: str, arrived: int):
+        if not is_valid_nick(nick):
+            self.send_to(conn, "ERR Invalid nick")
+            return
+        if not self.nicks.register(nick, conn):
+            self.send_to(conn, "ERR Nick taken")
+            return
+        self.send_to(conn, f"OK NICK {nick}")
+
+    def _cmd_msg(self, conn: Connection, arg: str, arrived: int):
+        nick, _, text = arg.partition(" ")
+        if conn.nick is None:
+            self.send_to(conn, "ERR Nick required")
+            return
+        target = self.nicks.lookup(nick)
+        if target is None or target.closed:
+            self.send_to(conn, "ERR No such nick")
+            return
+        if not text.strip():
+            self.send_to(conn, "ERR Invalid message")
+            return
+        # unicast: directo a la cola del destinatario, fuera de msg_q y del
+        # orden global (no lleva secuencia ni queda en el historial)
+        if self.metrics is not None:
+            self.metrics.direct += 1
+        self._push_payloads(target, [encode_payload(f"MSG {conn.nick} {text}")], FRAME_DM)
+        self._deliver((target,))
+
+    def _cmd_ping(self, conn: Connection, arg: str, arrived: int):
+        # mantiene viva la conexión frente a `idle_timeout`
+        self.send_to(conn, "PONG")
+
+    def _cmd_stats(self, conn: Connection, arg: str, arrived: int):
+        if self.metrics is None:
+            self.send_to(conn, "ERR Metrics disabled")
+            return
+        self.send_lines(conn, self.metrics.render(**self.gauges()))
+
+    def _cmd_trace(self, conn: Connection, arg: str, arrived: int):
+        if self.tracer is None:
+            self.send_to(conn, "ERR Tracing disabled")
+            return
+        self.send_lines(conn, self.tracer.render())
+
+    def _cmd_binary(self, conn: Connection, arg: str, arrived: int):
+        if conn.binary:
+            self.send_to(conn, "ERR Already binary")
+            return
+        # la confirmación sale como línea y todo lo que se encole después,
+        # como frame: el cliente cambia de modo al leer "OK BINARY"; una
+        # opción que no se acepta no es un error, se responde sin ella
+        compress = self.compression and arg.strip() == COMPRESS_OPTION
+        with self._order_lock, conn.mode_lock:
+            conn.outq.push(encode_line(BINARY_ZLIB_OK if compress else BINARY_OK))
+            conn.binary = True
+            conn.compress = compress
+        conn.reader = FrameReader()
+        self._deliver((conn,))
+
+    def _cmd_history(self, conn: Connection, arg: str, arrived: int):
+        if not self._history_ready(conn, arg, self.history):
+            return
+        n = int(arg)
+        with self._order_lock:
+            entries = [e for e in self.history.since(0) if self._visible(conn, e)]
+            self._push_history(conn, entries[-n:] if n else [], self.history.last_seq)
+        self._deliver((conn,))
+
+    def _cmd_since(self, conn: Connection, arg: str, arrived: int):
+        # con `is not None`: un History vacío es falso (define __len__)
+        source = self.history if self.history is not None else self.log
+        if not self._history_ready(conn, arg, source):
+            return
+        seq = int(arg)
+        history = self.history
+        boundary = history.first_seq if history is not None else self._next_seq
+        if self.log is not None and seq + 1 < boundary:
+            self._since_from_log(conn, seq, boundary)
+            return
+        with self._order_lock:
+            if history is None:
+                self._push_history(conn, [], self._next_seq - 1)
+            else:
+                gap = history.first_seq if seq + 1 < history.first_seq else 0
+                entries = [e for e in history.since(seq) if self._visible(conn, e)]
+                self._push_history(conn, entries, history.last_seq, gap)
+        self._deliver((conn,))
+
+    def _since_from_log(self, conn: Connection, seq: int, boundary: int):
+        """
+        Lo que ya salió del historial en memoria se lee del log (disco, sin
+        locks de la difusión), hasta `LOG_READ_LIMIT` mensajes. Si la
+        respuesta no llega a la última secuencia (cortó en el límite o en el
+        comienzo del historial), termina con "MORE <seq>" en lugar de "END":
+        se sigue con otro "SINCE <seq>". Corre en el hilo que leyó el
+        comando (en el motor de selectors, el de E/S): se lee lo ya escrito
+        al archivo y solo se vuelca lo pendiente si hace falta para el rango
+        pedido; ninguno de los dos espera un fsync del escritor.
+        """
+        log = self.log
+        flush = log.flushed_seq < boundary - 1
+        raw = log.read(seq, LOG_READ_LIMIT, flush=flush)
+        entries = [e for e in raw if e[0] < boundary]
+        if len(raw) == LOG_READ_LIMIT and len(entries) == len(raw):
+            end = entries[-1][0]
+        else:
+            end = boundary - 1
+        gap = self.log.first_seq if seq + 1 < self.log.first_seq else 0
+        visible = [e for e in entries if self._visible(conn, e)]
+        with self._order_lock:
+            # con el lock, lo difundido después de `end` todavía no se encoló
+            self._push_history(conn, visible, end, gap, more=end < self._next_seq - 1)
+        self._deliver((conn,))
+
+    def _history_ready(self, conn: Connection, arg: str, source) -> bool:
+        if source is None:
+            self.send_to(conn, "ERR History disabled")
+            return False
+        if not arg.isdigit():
+            self.send_to(conn, "ERR Invalid argument")
+            return False
+        return True
+
+    @staticmethod
+    def _visible(conn: Connection, entry) -> bool:
+        room = entry[1]
+        return room is None or room in conn.rooms
+
+    def _push_history(
+        self, conn: Connection, entries, end: int, gap: int = 0, more: bool = False
+    ):
+        """
+        Encola "GAP <seq>" (si se perdieron mensajes), una línea
+        "HIST <seq> <texto>" por entrada y "END <seq>" (la respuesta cubre
+        hasta `end`), o "MORE <seq>" con `more` (quedan mensajes después de
+        `end`). Se llama con `_order_lock` tomado; el envío lo hace quien
+        llama, después de soltarlo.
+        """
+        payloads = [b"GAP %d" % gap] if gap else []
+        payloads += [b"HIST %d %s" % (seq, payload) for seq, _room, payload in entries]
+        payloads.append((b"MORE %d" if more else b"END %d") % end)
+        self._queue_payloads(conn, payloads, FRAME_CMD)
+
+    def gauges(self) -> dict:
+        """Valores instantáneos que acompañan a los contadores en STATS."""
+        return {
+            "uptime_s": int(time.monotonic() - self.started),
+            "clients": len(self.clients),
+            "rooms": len(self.rooms),
+            "nicks": len(self.nicks),
+            "msg_q": self.msg_q.qsize(),
+            "history_seq": self._next_seq - 1,
+            **({"tls_handshaking": len(self.handshakers)} if self.handshakers is not None else {}),
+        }
+
+    def writer_loop(self):
+        """Vacía las colas de salida; nunca bloquea en un socket concreto."""
+        assert self._wsel is not None
+        sel = self._wsel
+        while self.running.is_set():
+            woken = False
+            for key, _ in sel.select(timeout=0.5):
+                if key.data is None:
+                    woken = True
+                else:
+                    self._flush(key.data)
+            if woken:
+                for conn in self._take_pending():
+                    self._flush(conn)
+
+    def _flush(self, conn: Connection):
+        """Intenta enviar lo pendiente de `conn` (solo desde el escritor)."""
+        if conn.closed:
+            self._unwatch(conn)
+            return
+        if conn.outq.overflowed:
+            # consumidor lento con política "disconnect"
+            self._unwatch(conn)
+            self._drop_client(conn)
+            return
+        try:
+            with conn.wlock:
+                drained = conn.flush(SEND_FLAGS)
+        except OSError:
+            self._unwatch(conn)
+            self._drop_client(conn)
+            return
+        if drained:
+            self._unwatch(conn)
+            if conn.trace is not None:
+                self._traced_write(conn)
+        else:
+            self._watch(conn)
+
+    def _watch(self, conn: Connection):
+        if conn.want_write:
+            return
+        sel = self._wsel
+        stale = sel.get_map().get(conn.fd)
+        if stale is not None:
+            # fd reutilizado por el SO tras cerrar otra conexión
+            sel.unregister(conn.fd)
+        sel.register(conn.fd, selectors.EVENT_WRITE, conn)
+        conn.want_write = True
+
+    def _unwatch(self, conn: Connection):
+        if not conn.want_write:
+            return
+        conn.want_write = False
+        key = self._wsel.get_map().get(conn.fd)
+        if key is not None and key.data is conn:
+            self._wsel.unregister(conn.fd)
+
+    def _wake(self):
+        try:
+            if self._wake_w is not None:
+                self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _deliver(self, conns):
+        """
+        Camino rápido: envía ya desde el hilo actual, sin bloquear. Lo que no
+        sale (socket lleno, escritor ocupado, error o desborde) se le deja al
+        escritor, que es quien resuelve esperas y cierres.
+        """
+        backlog = []
+        for conn in conns:
+            if conn.want_write or conn.outq.overflowed or not conn.wlock.acquire(False):
+                backlog.append(conn)
                 continue
-            if item is None:  # centinela de stop()
-                break
+            try:
+                if not conn.flush(SEND_FLAGS):
+                    backlog.append(conn)
+                elif conn.trace is not None:
+                    self._traced_write(conn)
+            except OSError:
+                backlog.append(conn)
+            finally:
+                conn.wlock.release()
+        if backlog:
+            self._schedule_write(backlog)
 
-            # --- micro-batching para capturar clientes recién aceptados ---
-            # Pequeña pausa para que el hilo de accept termine de registrar conexiones
-            # concurrentes antes de este broadcast.
-            time.sleep(0.005)
+    def _traced_write(self, conn: Connection):
+        """La cola de `conn` se vació con lotes muestreados adentro."""
+        traces, conn.trace = conn.trace, None
+        if not traces or self.tracer is None:
+            return
+        try:
+            host, port = conn.sock.getpeername()[:2]
+            who = f"{host}:{port}"
+        except OSError:
+            who = f"fd={conn.fd}"
+        if conn.nick is not None:
+            who += f" nick={conn.nick}"
+        self.tracer.wrote(traces, who)
 
-            self.broadcast(item)
+    def _schedule_write(self, conns):
+        """Pide al escritor que vacíe las colas de `conns` (thread-safe)."""
+        with self._pending_lock:
+            self._pending.update(conns)
+            if self._woken:
+                return
+            self._woken = True
+        self._wake()
+
+    def _take_pending(self) -> set:
+        """Consume el despertador y devuelve las conexiones a vaciar."""
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except OSError:
+            pass
+        with self._pending_lock:
+            pending = self._pending
+            self._pending = set()
+            self._woken = False
+        return pending
+
+    def _drop_client(self, conn: Connection):
+        """Quita al cliente del registro y cierra sus recursos."""
+        if self.clients.remove(conn):
+            self._count_disconnect(conn)
+        self._release(conn)
+        if not conn.closed:
+            conn.close()
+            # el escritor lo saca de su selector
+            self._schedule_write((conn,))
+
+    def _release(self, conn: Connection):
+        """Saca a `conn` de los índices (salas, apodos, shard) al irse (ambos motores)."""
+        self.rooms.leave_all(conn)
+        self.nicks.release(conn)
+        if self.shards:
+            self.shards[conn.fd % len(self.shards)].members.remove(conn)
+
+    def _count_disconnect(self, conn: Connection):
+        if self.metrics is not None:
+            self.metrics.disconnected += 1
+            if conn.outq.overflowed:
+                self.metrics.slow_disconnected += 1
 
     # -------- API --------
 
+    def send_to(self, conn: Connection, text: str):
+        """Encola una línea solo para `conn` (respuestas como ERR)."""
+        self.send_lines(conn, (text,))
+
+    def send_lines(self, conn: Connection, texts: List[str]):
+        """Como `send_to` para varias líneas, en un único envío."""
+        self._push_payloads(conn, [encode_payload(t) for t in texts], FRAME_CMD)
+        self._deliver((conn,))
+
+    def _push_payloads(self, conn: Connection, payloads: List[bytes], ftype: int):
+        """
+        Encola payloads para `conn` en su formato (líneas o frames `ftype`).
+        Con `conn.mode_lock`, como "BINARY": el formato elegido es el de la
+        cola en ese punto (un MSG de otro hilo no queda como línea detrás de
+        "OK BINARY"). Es un lock de la conexión: un mensaje directo no
+        espera a que la difusión termine de encolar un lote.
+        """
+        with conn.mode_lock:
+            self._queue_payloads(conn, payloads, ftype)
+
+    @staticmethod
+    def _queue_payloads(conn: Connection, payloads: List[bytes], ftype: int):
+        """Como `_push_payloads`, con `conn.mode_lock` o `_order_lock` ya tomado."""
+        if conn.binary:
+            data = b"".join(encode_frame(ftype, p) for p in payloads)
+        else:
+            data = b"\n".join(payloads) + b"\n"
+        conn.outq.push(data, len(payloads))
+
+    def _compress(self, frames: bytes) -> bytes:
+        """
+        El FRAME_ZMSG de un lote ya codificado, o b"" si conviene enviarlo
+        así (chico, demasiado grande o sin ganancia).
+        """
+        if not self.compress_min_bytes <= len(frames) <= MAX_INFLATE:
+            return b""
+        payload = compress_frames(frames)
+        if len(payload) > MAX_FRAME or len(payload) + FRAME_HEADER.size >= len(frames):
+            return b""
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.compressed += 1
+            metrics.compressed_bytes_in += len(frames)
+            metrics.compressed_bytes_out += len(payload) + FRAME_HEADER.size
+        return FRAME_HEADER.pack(len(payload), FRAME_ZMSG) + payload
+
+    def _snapshot(self) -> tuple:
+        # sin copia por mensaje: la tupla se rehace solo si cambió el registro
+        return self.clients.snapshot()
+
     def broadcast(self, text: str):
-        with self.lock:
-            clients_snapshot = list(self.clients)
-        muertos: List[Client] = []
-        for sock, rf, wf in clients_snapshot:
-            try:
-                send_line(wf, text)
-            except Exception:
-                muertos.append((sock, rf, wf))
-        if muertos:
-            with self.lock:
-                for sock, rf, wf in muertos:
-                    if (sock, rf, wf) in self.clients:
-                        self.clients.remove((sock, rf, wf))
-                    for c in (rf, wf, sock):
-                        try:
-                            c.close()
-                        except:
-                            pass
+        self.broadcast_many((text,))
+
+    def broadcast_many(self, texts: Iterable[str]):
+        """Difunde varios mensajes, en orden, con un único envío por cliente."""
+        self._fanout([(None, [encode_payload(t) for t in texts])])
+
+    def _fanout(self, groups: List[Tuple[str | None, List[bytes]]], record=None):
+        """
+        Encola cada tramo (sala, payloads) en las conexiones de su destino y
+        después envía. `record` (el lote entregado) se agrega al historial
+        dentro del mismo lock: una respuesta de historial lo incluye o lo
+        recibe en vivo, nunca las dos cosas ni ninguna.
+        """
+        metrics = self.metrics
+        if metrics is not None:
+            t0 = time.perf_counter_ns()
+        tracer = self.tracer
+        # trazas del lote que publicó este hilo (solo en la entrega local)
+        traces = tracer.take_batch() if tracer is not None else None
+        targets = []  # (sala, conexiones)
+        count = 0
+        with self._order_lock:
+            if record is not None:
+                if self.history is not None:
+                    self.history.extend(record)
+                if self.log is not None:
+                    # solo encola: el escritor del log hace la E/S
+                    self.log.append(self._next_seq, record)
+                self._next_seq += len(record)
+            for room, payloads in groups:
+                conns = self._snapshot() if room is None else self.rooms.members(room)
+                if conns:
+                    self._enqueue(conns, payloads)
+                    targets.append((room, conns))
+                count += len(payloads)
+            if traces:
+                tracer.fanned_out(traces)
+                for _room, conns in targets:
+                    for conn in conns:
+                        conn.trace = traces if conn.trace is None else conn.trace + traces
+        if metrics is not None:
+            # antes de enviar: quien ya recibió el mensaje lo ve contado
+            metrics.broadcast += count
+        if self.shards:
+            self._signal_shards(targets)
+        else:
+            for _room, conns in targets:
+                self._deliver(conns)
+        if metrics is not None:
+            metrics.fanout_ns.observe(time.perf_counter_ns() - t0)
+
+    def _signal_shards(self, targets):
+        """Reparte los envíos de un lote entre los hilos emisores."""
+        shards = self.shards
+        k = len(shards)
+        if any(room is None for room, _conns in targets):
+            # a todos: un aviso por shard, sin recorrer las conexiones
+            for shard in shards:
+                shard.flush_all()
+            return
+        parts = [[] for _ in range(k)]
+        for _room, conns in targets:
+            for conn in conns:
+                parts[conn.fd % k].append(conn)
+        for shard, part in zip(shards, parts):
+            if part:
+                shard.flush(part)
+
+    def _enqueue(self, conns: Iterable[Connection], payloads: List[bytes]):
+        # una sola codificación por modo, hecha solo si alguien la usa;
+        # todas las colas de un modo comparten el mismo objeto
+        count = len(payloads)
+        lines = frames = zframe = None
+        for conn in conns:
+            if conn.binary:
+                if frames is None:
+                    frames = b"".join(
+                        FRAME_HEADER.pack(len(p), FRAME_MSG) + p for p in payloads
+                    )
+                data = frames
+                if conn.compress:
+                    if zframe is None:
+                        zframe = self._compress(frames)
+                    if zframe:
+                        data = zframe
+            else:
+                if lines is None:
+                    lines = b"\n".join(payloads) + b"\n"
+                data = lines
+            # un desborde con política "disconnect" lo cierra el escritor
+            conn.outq.push(data, count)
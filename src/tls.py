@@ -0,0 +1,354 @@
+"""
+Modo TLS del servidor: contexto, certificados de prueba y handshakes fuera
+del camino de accept.
+
+Envolver el socket de escucha con `ssl` haría el handshake dentro de
+`accept()` (o en el primer recv del lector), y un cliente lento en mandar su
+ClientHello frenaría a todos los que conectan detrás. En cambio, el accept
+sigue siendo TCP puro y cada socket aceptado pasa a un `TLSHandshaker`: un
+hilo con su propio selector que avanza con `do_handshake()` no bloqueante
+todos los handshakes en curso a la vez. Cada uno tiene un plazo
+(`timeout`); el que no termina a tiempo se cierra. Recién con el handshake
+completo la conexión se registra en el servidor (`on_ready`).
+
+Reanudación de sesión: el contexto emite tickets de sesión (TLS 1.3:
+`num_tickets` por handshake completo; TLS 1.2: tickets RFC 5077), así que
+un cliente que reconecta con `session=` se salta el intercambio de claves
+y la firma del certificado (`session_reused`). Las claves de los tickets
+son propias de cada contexto: con `--workers` cada proceso tiene las suyas
+y un ticket solo sirve en el worker que lo emitió.
+
+Los sockets TLS quedan no bloqueantes en ambos motores: SSLSocket no admite
+`recvmsg`/`sendmsg` ni flags, y lectura y escritura sobre el mismo objeto
+SSL desde hilos distintos se serializan con `conn.wlock` (ver
+`recv_tls_into` y `Connection.flush`).
+"""
+
+import collections
+import itertools
+import os
+import select
+import selectors
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+import time
+from typing import Callable, Dict
+
+# Plazo para completar un handshake desde que se aceptó el socket (segundos)
+DEFAULT_HANDSHAKE_TIMEOUT = 5.0
+# Tickets que emite el servidor por handshake completo (TLS 1.3)
+DEFAULT_TICKETS = 2
+# Espera máxima de un lector por hilos antes de revisar si lo cerraron
+READ_POLL = 0.5
+
+
+def make_server_context(
+    certfile: str, keyfile: str | None = None, tickets: int = DEFAULT_TICKETS
+) -> ssl.SSLContext:
+    """Contexto de servidor (TLS >= 1.2) con tickets de sesión habilitados."""
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+    ctx.load_cert_chain(certfile, keyfile)
+    ctx.options &= ~ssl.OP_NO_TICKET
+    ctx.num_tickets = tickets
+    return ctx
+
+
+def make_client_context(cafile: str | None = None) -> ssl.SSLContext:
+    """Contexto de cliente que verifica el certificado (con `cafile`: uno autofirmado)."""
+    ctx = ssl.create_default_context(cafile=cafile)
+    ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+    return ctx
+
+
+def generate_self_signed(
+    directory: str, common_name: str = "localhost", days: int = 30
+) -> tuple[str, str]:
+    """
+    Genera con el comando `openssl` un certificado autofirmado (ECDSA P-256,
+    válido para `common_name` y 127.0.0.1) y su clave sin cifrar en
+    `directory`. Devuelve (cert.pem, key.pem). Es para pruebas y benchmarks.
+    """
+    openssl = shutil.which("openssl")
+    if openssl is None:
+        raise RuntimeError("no se encontró el comando openssl")
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            openssl, "req", "-x509", "-nodes",
+            "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1",
+            "-keyout", key, "-out", cert, "-days", str(days),
+            "-subj", f"/CN={common_name}",
+            "-addext", f"subjectAltName=DNS:{common_name},IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def recv_tls_into(conn, view: memoryview) -> tuple[int, int]:
+    """
+    Un `recv_into` no bloqueante sobre el SSLSocket de `conn`, con `wlock`
+    tomado (un SSL_read no puede cruzarse con el SSL_write de otro hilo).
+    Devuelve (bytes, llegada en ns de pared); sin datos descifrados todavía
+    levanta BlockingIOError, como un recv no bloqueante en claro.
+    """
+    with conn.wlock:
+        try:
+            n = conn.sock.recv_into(view)
+        except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            raise BlockingIOError from None
+    return n, time.time_ns()
+
+
+def wait_readable(sock: socket.socket, timeout: float = READ_POLL) -> bool:
+    """Espera a que `sock` sea legible (poll; sin poll, select)."""
+    fd = sock.fileno()
+    if fd < 0:
+        return True  # cerrado: el recv siguiente lo informa
+    if hasattr(select, "poll"):
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        return bool(poller.poll(timeout * 1000))
+    return bool(select.select([fd], [], [], timeout)[0])
+
+
+class _Handshake:
+    """Un handshake en curso: socket TLS, plazo e interés en el selector."""
+
+    __slots__ = ("sock", "fd", "deadline", "started", "events", "done")
+
+    def __init__(self, sock: ssl.SSLSocket, deadline: float, started: int):
+        self.sock = sock
+        self.fd = sock.fileno()
+        self.deadline = deadline
+        self.started = started
+        self.events = 0
+        self.done = False
+
+
+class TLSHandshaker:
+    """
+    Hilo que completa handshakes TLS del lado servidor sin bloquear a nadie.
+    `submit` (desde el hilo de accept) solo encola el socket TCP; el hilo lo
+    envuelve y lo avanza cada vez que el selector dice que puede. Terminado,
+    llama a `on_ready(ssl_sock)` desde este hilo; si falla o vence el plazo,
+    cierra el socket.
+    """
+
+    def __init__(
+        self,
+        context: ssl.SSLContext,
+        on_ready: Callable[[ssl.SSLSocket], None],
+        timeout: float = DEFAULT_HANDSHAKE_TIMEOUT,
+        metrics=None,
+        name: str = "tls-handshake",
+    ):
+        if timeout <= 0:
+            raise ValueError("timeout debe ser > 0")
+        self.context = context
+        self.on_ready = on_ready
+        self.timeout = timeout
+        self.metrics = metrics
+        self.name = name
+        self._incoming: collections.deque = collections.deque()
+        self._lock = threading.Lock()
+        self._woken = False
+        # fd -> handshake en curso y los mismos por orden de plazo (el plazo
+        # es fijo, así que el orden de llegada ya es el de vencimiento)
+        self._active: Dict[int, _Handshake] = {}
+        self._deadlines: collections.deque = collections.deque()
+        self._sel: selectors.BaseSelector | None = None
+        self._wake_r: socket.socket | None = None
+        self._wake_w: socket.socket | None = None
+        self._thread: threading.Thread | None = None
+        self._running = False
+
+    def __len__(self) -> int:
+        """Handshakes en curso (incluye los recién encolados)."""
+        return len(self._incoming) + len(self._active)
+
+    def start(self):
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(self._wake_r, selectors.EVENT_READ, None)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def submit(self, sock: socket.socket):
+        """Entrega un socket recién aceptado (thread-safe, no bloquea)."""
+        started = time.monotonic_ns()
+        with self._lock:
+            self._incoming.append((sock, started))
+            if self._woken:
+                return
+            self._woken = True
+        self._wake()
+
+    def close(self):
+        """Detiene el hilo y cierra los handshakes que no terminaron."""
+        self._running = False
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        with self._lock:
+            incoming, self._incoming = self._incoming, collections.deque()
+        for sock, _ in incoming:
+            sock.close()
+        for hs in list(self._active.values()):
+            hs.sock.close()
+        self._active.clear()
+        self._deadlines.clear()
+        for closee in (self._sel, self._wake_r, self._wake_w):
+            if closee is not None:
+                closee.close()
+
+    # -------- hilo --------
+
+    def _wake(self):
+        try:
+            if self._wake_w is not None:
+                self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _run(self):
+        sel = self._sel
+        while self._running:
+            timeout = READ_POLL
+            if self._deadlines:
+                timeout = min(timeout, max(0.0, self._deadlines[0].deadline - time.monotonic()))
+            woken = False
+            for key, _ in sel.select(timeout):
+                if key.data is None:
+                    woken = True
+                else:
+                    self._step(key.data)
+            if woken:
+                self._take_incoming()
+            if self._deadlines:
+                self._expire(time.monotonic())
+
+    def _take_incoming(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except OSError:
+            pass
+        with self._lock:
+            incoming, self._incoming = self._incoming, collections.deque()
+            self._woken = False
+        deadline = time.monotonic() + self.timeout
+        for sock, started in incoming:
+            try:
+                sock.setblocking(False)
+                tls = self.context.wrap_socket(
+                    sock, server_side=True, do_handshake_on_connect=False
+                )
+            except OSError:
+                sock.close()
+                self._count_failed()
+                continue
+            hs = _Handshake(tls, deadline, started)
+            self._active[hs.fd] = hs
+            self._deadlines.append(hs)
+            # el ClientHello suele estar ya en el socket: primer intento ya
+            self._step(hs)
+
+    def _step(self, hs: _Handshake):
+        try:
+            hs.sock.do_handshake()
+        except ssl.SSLWantReadError:
+            self._want(hs, selectors.EVENT_READ)
+            return
+        except ssl.SSLWantWriteError:
+            self._want(hs, selectors.EVENT_WRITE)
+            return
+        except (OSError, ValueError):
+            # SSLError (cliente en claro, certificado rechazado) o socket muerto
+            self._finish(hs)
+            hs.sock.close()
+            self._count_failed()
+            return
+        self._finish(hs)
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.tls_handshakes += 1
+            if hs.sock.session_reused:
+                metrics.tls_resumed += 1
+            metrics.tls_handshake_ns.observe(time.monotonic_ns() - hs.started)
+        try:
+            self.on_ready(hs.sock)
+        except Exception:
+            hs.sock.close()
+
+    def _want(self, hs: _Handshake, events: int):
+        if hs.events == events:
+            return
+        if hs.events:
+            self._sel.modify(hs.fd, events, hs)
+        else:
+            self._sel.register(hs.fd, events, hs)
+        hs.events = events
+
+    def _finish(self, hs: _Handshake):
+        hs.done = True
+        self._active.pop(hs.fd, None)
+        if hs.events:
+            try:
+                self._sel.unregister(hs.fd)
+            except (KeyError, ValueError):
+                pass
+            hs.events = 0
+
+    def _expire(self, now: float):
+        deadlines = self._deadlines
+        while deadlines and (deadlines[0].done or deadlines[0].deadline <= now):
+            hs = deadlines.popleft()
+            if hs.done:
+                continue
+            # cliente mudo o demasiado lento: fuera, sin afectar a los demás
+            self._finish(hs)
+            hs.sock.close()
+            self._count_failed()
+
+    def _count_failed(self):
+        if self.metrics is not None:
+            self.metrics.tls_failed += 1
+
+
+class HandshakePool:
+    """`threads` handshakers; los sockets se reparten en round robin."""
+
+    def __init__(self, context: ssl.SSLContext, on_ready, threads: int = 1, **kwargs):
+        if threads < 1:
+            raise ValueError("threads debe ser >= 1")
+        self.handshakers = [
+            TLSHandshaker(context, on_ready, name=f"tls-handshake-{i}", **kwargs)
+            for i in range(threads)
+        ]
+        self._next = itertools.count()
+
+    def __len__(self) -> int:
+        return sum(len(h) for h in self.handshakers)
+
+    def start(self):
+        for h in self.handshakers:
+            h.start()
+
+    def submit(self, sock: socket.socket):
+        hs = self.handshakers
+        hs[next(self._next) % len(hs)].submit(sock)
+
+    def close(self):
+        for h in self.handshakers:
+            h.close()
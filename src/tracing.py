@@ -0,0 +1,165 @@
+"""
+Trazas muestreadas de latencia por etapa del pipeline del servidor.
+
+Con `ChatServer(trace_sample=N)` se marca uno de cada N ítems de `msg_q`
+(un recv entero o un mensaje) y se le toman marcas (time.monotonic_ns) en:
+- read: llegada al socket (la marca del kernel, pasada a reloj monotónico)
+- enqueue: entrada a `msg_q`, ya validado y admitido
+- dequeue: salida de `msg_q` en el broadcaster
+- batch: el broadcaster lo publica en un lote (después de la ventana)
+- fanout: el lote quedó encolado en todas las colas de salida
+- write: por cada destinatario, la primera vez que su cola queda vacía
+  después de encolar el lote (cota superior del momento del envío; un
+  cliente que nunca vacía su cola no registra escritura)
+
+Cada etapa suma a su histograma (ver src/metrics.py) la diferencia con la
+anterior, y "total" suma read -> write por destinatario. Se guardan los K
+destinatarios más lentos (fanout -> write). `render()` da las líneas del
+comando "TRACE" (y de SIGUSR1 en run_server.py).
+
+Sin tracer (`trace_sample=0`) el servidor solo compara con None una vez por
+ítem o por lote; con tracer, lo no muestreado cuesta un contador. Las marcas
+de lo muestreado se toman sin locks y pueden correrse un poco si dos hilos
+tocan la misma conexión a la vez: son trazas, no contabilidad.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, List
+
+from src.metrics import Histogram
+
+STAGES = ("read", "enqueue", "dequeue", "batch", "fanout", "write")
+# Histogramas: cada etapa medida desde la anterior, más el total
+SPANS = STAGES[1:] + ("total",)
+
+DEFAULT_SLOWEST = 10
+# Ítems marcados esperando al broadcaster; con más, no se marcan nuevos
+# (p. ej. ítems que se perdieron al detener el servidor)
+MAX_PENDING_TRACES = 1024
+
+
+class Trace:
+    """Marcas de un ítem muestreado (ns monotónicos; 0 = todavía no)."""
+
+    __slots__ = STAGES + ("count",)
+
+    def __init__(self, read: int, enqueue: int, count: int):
+        self.read = read
+        self.enqueue = enqueue
+        self.dequeue = self.batch = self.fanout = self.write = 0
+        # mensajes del ítem (una lista de un recv cuenta como varios)
+        self.count = count
+
+
+class Tracer:
+    """Muestreo 1 de cada `sample` ítems de `msg_q` (thread-safe)."""
+
+    def __init__(self, sample: int, slowest: int = DEFAULT_SLOWEST):
+        if sample < 1 or slowest < 0:
+            raise ValueError("sample debe ser >= 1 y slowest >= 0")
+        self.sample = sample
+        self.slowest = slowest
+        self.spans: Dict[str, Histogram] = {name: Histogram() for name in SPANS}
+        self.traces = 0
+        self._tick = itertools.count(1)
+        # id(ítem) -> Trace, del encolado a la salida de msg_q
+        self._pending: Dict[int, Trace] = {}
+        # (latencia, orden, quién): heap de mínimos con los K más lentos
+        self._slow: list = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        # trazas del lote que está publicando cada hilo (publish -> _fanout)
+        self._local = threading.local()
+
+    # -------- marcas --------
+
+    def enqueued(self, item: tuple):
+        """Al encolar un ítem (llegada_ns, payload, sala) en `msg_q`."""
+        if next(self._tick) % self.sample or len(self._pending) >= MAX_PENDING_TRACES:
+            return
+        now = time.monotonic_ns()
+        # la llegada es la marca del kernel en reloj de pared
+        read = now - max(0, time.time_ns() - item[0])
+        payload = item[1]
+        count = 1 if type(payload) is bytes else len(payload)
+        self._pending[id(item)] = Trace(read, now, count)
+
+    def dequeued(self, item: tuple) -> "Trace | None":
+        """Al sacarlo de `msg_q`: su traza, si estaba marcado."""
+        trace = self._pending.pop(id(item), None)
+        if trace is not None:
+            trace.dequeue = time.monotonic_ns()
+        return trace
+
+    def publishing(self, traces: List[Trace]):
+        """El broadcaster publica un lote con estas trazas (en este hilo)."""
+        now = time.monotonic_ns()
+        for trace in traces:
+            trace.batch = now
+        self._local.batch = traces
+
+    def take_batch(self) -> "List[Trace] | None":
+        """Las trazas del lote que este hilo está entregando (una sola vez)."""
+        local = self._local
+        traces = getattr(local, "batch", None)
+        if traces is not None:
+            local.batch = None
+        return traces
+
+    def fanned_out(self, traces: List[Trace]):
+        """El lote quedó en todas las colas de salida."""
+        now = time.monotonic_ns()
+        with self._lock:
+            self.traces += len(traces)
+            spans = self.spans
+            for trace in traces:
+                trace.fanout = now
+                spans["enqueue"].observe(trace.enqueue - trace.read)
+                spans["dequeue"].observe(trace.dequeue - trace.enqueue)
+                spans["batch"].observe(trace.batch - trace.dequeue)
+                spans["fanout"].observe(now - trace.batch)
+
+    def wrote(self, traces: List[Trace], who: str):
+        """La cola de un destinatario quedó vacía después de esos lotes."""
+        now = time.monotonic_ns()
+        with self._lock:
+            spans = self.spans
+            for trace in traces:
+                trace.write = now
+                latency = now - trace.fanout
+                spans["write"].observe(latency)
+                spans["total"].observe(now - trace.read)
+                if not self.slowest:
+                    continue
+                entry = (latency, next(self._order), who)
+                if len(self._slow) < self.slowest:
+                    heapq.heappush(self._slow, entry)
+                elif latency > self._slow[0][0]:
+                    heapq.heapreplace(self._slow, entry)
+
+    # -------- consulta --------
+
+    def slowest_recipients(self) -> List[tuple]:
+        """(latencia fanout -> write en ns, quién), del más lento al más rápido."""
+        with self._lock:
+            return [(lat, who) for lat, _, who in sorted(self._slow, reverse=True)]
+
+    def render(self) -> List[str]:
+        """
+        Líneas "TRACE <etapa> count=.. p50=.. p99=.. max=.." (ns) y
+        "TRACE slow <ns> <quién>", terminadas en "END".
+        """
+        with self._lock:
+            lines = [f"TRACE sampled {self.traces} 1/{self.sample}"]
+            for name in SPANS:
+                s = self.spans[name].summary()
+                lines.append(
+                    f"TRACE {name} count={s['count']} p50={s['p50']} "
+                    f"p99={s['p99']} max={s['max']}"
+                )
+        lines += [f"TRACE slow {lat} {who}" for lat, who in self.slowest_recipients()]
+        lines.append("END")
+        return lines
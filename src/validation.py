@@ -4,9 +4,27 @@ Reglas:
 - No nulos.
 - No vacíos (ni solo espacios) tras quitar \r\n y espacios extremos.
 - Máximo 256 chars.
+
+`Validator` aplica las mismas reglas directamente sobre los bytes recibidos
+(línea sin '\n' o payload de un frame), con reglas configurables: máximo en
+caracteres o en bytes y rechazo de caracteres de control. Un mensaje ASCII
+se valida sin decodificarlo ni copiarlo; solo uno con bytes no ASCII se
+decodifica (hay que comprobar que sea UTF-8 válido). `check_many` valida un
+lote entero (todas las líneas de un recv) en una llamada.
+`is_valid_payload` es `check` con las reglas por defecto.
+
+Nombres de sala: '#' seguido de 1 a 32 letras, dígitos, '-' o '_'.
+Apodos (NICK): de 1 a 32 letras, dígitos, '-' o '_'.
 """
 
+import re
+from itertools import repeat
+from typing import List
+
 MAX_LEN = 256
+ROOM_PREFIX = "#"
+ROOM_MAX_LEN = 32
+NICK_MAX_LEN = 32
 
 def is_valid_message(text: str) -> bool:
     if text is None:
@@ -20,3 +38,121 @@ def is_valid_message(text: str) -> bool:
     if len(trimmed_newlines) > MAX_LEN:
         return False
     return True
+
+# Espacios que str.strip() quita en ASCII (bytes.strip() no incluye \x1c-\x1f)
+_ASCII_SPACE = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+_SPACE_BYTES = frozenset(_ASCII_SPACE)
+# `int in bytes` es un memchr; `b"\n" in bytes` es bastante más lento
+_LF = ord("\n")
+_CR = ord("\r")
+# Controles C0 (salvo tab) y DEL; C1 en el texto decodificado. En bytes
+# se buscan borrándolos con translate (más barato que una regex)
+_CONTROL = bytes(range(0x00, 0x09)) + bytes(range(0x0a, 0x20)) + b"\x7f"
+_CONTROL_TEXT = re.compile("[\x00-\x08\x0b-\x1f\x7f-\x9f]")  # '\n' ya se rechazó antes
+
+CHARS = "chars"
+BYTES = "bytes"
+
+
+class Validator:
+    """
+    Reglas de `is_valid_message` sobre bytes. `unit` indica si `max_len`
+    cuenta caracteres (como siempre) o bytes UTF-8; con `reject_control` se
+    rechazan caracteres de control en el texto (los '\r' de los extremos se
+    ignoran igual que antes).
+    """
+
+    __slots__ = ("max_len", "unit", "reject_control")
+
+    def __init__(self, max_len: int = MAX_LEN, unit: str = CHARS, reject_control: bool = False):
+        if unit not in (CHARS, BYTES):
+            raise ValueError(f"unidad desconocida: {unit!r}")
+        if max_len < 1:
+            raise ValueError("max_len debe ser >= 1")
+        self.max_len = max_len
+        self.unit = unit
+        self.reject_control = reject_control
+
+    def check(self, payload: bytes) -> bool:
+        if _LF in payload:
+            return False
+        # sin copia salvo que haya '\r' en los extremos
+        body = payload.strip(b"\r")
+        if not body.isascii():
+            return self._check_text(body)
+        n = len(body)
+        if not n or n > self.max_len:
+            return False
+        # solo espacios: si un extremo no lo es, ni hace falta recortar
+        if body[0] in _SPACE_BYTES and body[-1] in _SPACE_BYTES and not body.strip(_ASCII_SPACE):
+            return False
+        return not (self.reject_control and len(body.translate(None, _CONTROL)) != n)
+
+    def _check_text(self, body: bytes) -> bool:
+        # camino lento: hay que decodificar para saber si es UTF-8 válido
+        if self.unit == CHARS and len(body) > 4 * self.max_len:
+            return False  # ni con 4 bytes por carácter entra
+        try:
+            text = body.decode("utf-8")
+        except UnicodeDecodeError:
+            return False
+        if not text.strip():
+            return False
+        if (len(text) if self.unit == CHARS else len(body)) > self.max_len:
+            return False
+        return not (self.reject_control and _CONTROL_TEXT.search(text))
+
+    def check_many(self, payloads: List[bytes]) -> List[bool]:
+        """
+        Valida un lote; devuelve un bool por payload, en orden. El caso
+        común (todo válido) se resuelve con unas pocas pasadas en C sobre el
+        lote entero; si alguna falla, se valida uno por uno.
+        """
+        n = len(payloads)
+        if not n:
+            return []
+        joined = b"".join(payloads)
+        if _LF not in joined and _CR not in joined:
+            if joined.isascii():
+                ok = (
+                    max(map(len, payloads)) <= self.max_len
+                    and not (self.reject_control and len(joined.translate(None, _CONTROL)) != len(joined))
+                    # ninguno vacío ni solo espacios (strip sin nada que quitar no copia)
+                    and all(map(bytes.strip, payloads, repeat(_ASCII_SPACE, n)))
+                )
+            else:
+                ok = self._text_batch_ok(payloads)
+            if ok:
+                return [True] * n
+        check = self.check
+        return [check(p) for p in payloads]
+
+    def _text_batch_ok(self, payloads: List[bytes]) -> bool:
+        # un solo decode para todo el lote; '\n' separa (ninguno lo contiene)
+        try:
+            text = b"\n".join(payloads).decode("utf-8")
+        except UnicodeDecodeError:
+            return False
+        texts = text.split("\n")
+        longest = max(map(len, texts if self.unit == CHARS else payloads))
+        return (
+            longest <= self.max_len
+            and not (self.reject_control and _CONTROL_TEXT.search(text))
+            and all(map(str.strip, texts))
+        )
+
+
+is_valid_payload = Validator().check
+
+def is_valid_room(name: str) -> bool:
+    if not name or name[0] != ROOM_PREFIX:
+        return False
+    body = name[1:]
+    if not 0 < len(body) <= ROOM_MAX_LEN:
+        return False
+    return all(c.isalnum() or c in "-_" for c in body)
+
+def is_valid_nick(name: str) -> bool:
+    if not 0 < len(name) <= NICK_MAX_LEN:
+        return False
+    return all(c.isalnum() or c in "-_" for c in name)
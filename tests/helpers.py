@@ -0,0 +1,22 @@
+"""
+Utilidades compartidas por los tests de unit/ e integration/.
+"""
+import time
+
+
+def wait_for(pred, timeout=3.0):
+    """Sondea `pred` hasta que sea verdadero o venza `timeout`; devuelve su último valor."""
+    deadline = time.monotonic() + timeout
+    while not pred() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return pred()
+
+
+def read_until_end(rf, recv_line_fn):
+    """Lee una respuesta de historial hasta su `END`/`MORE` (o hasta que no llegue nada)."""
+    lines = []
+    while True:
+        line = recv_line_fn(rf)
+        lines.append(line)
+        if line is None or line.startswith(("END", "MORE")):
+            return lines
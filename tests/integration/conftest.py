@@ -1,12 +1,21 @@
 import pytest
-import socket
-import time
+from src.client import BlockingClient, ClientLoop
 from src.server import ChatServer
+from src.event_server import EventChatServer
 
+# Toda la suite de integración corre contra ambos motores
+ENGINES = {"threads": ChatServer, "selectors": EventChatServer}
 
-@pytest.fixture(scope="function")
-def server():
-    srv = ChatServer(host="127.0.0.1", port=0)
+
+@pytest.fixture(params=sorted(ENGINES))
+def engine(request):
+    """La clase del servidor; el test corre una vez con cada motor."""
+    return ENGINES[request.param]
+
+
+@pytest.fixture
+def server(engine):
+    srv = engine(host="127.0.0.1", port=0)
     srv.start()
     try:
         yield srv
@@ -14,43 +23,63 @@ def server():
         srv.stop()
 
 
+@pytest.fixture(scope="session")
+def client_loop():
+    """Un event loop (src/client.py) para todos los clientes de la sesión."""
+    loop = ClientLoop()
+    try:
+        yield loop
+    finally:
+        loop.close()
+
+
+class LineClient(BlockingClient):
+    """
+    Cliente de src/client.py con la forma (s, rf, wf) de los tests: los tres
+    son el mismo objeto; `write`/`flush` envían las líneas completas juntas.
+    """
+
+    def __init__(self, loop, addr, timeout):
+        super().__init__(loop, *addr)
+        self.timeout = timeout
+        self._pending = ""
+
+    def write(self, text: str):
+        self._pending += text
+
+    def flush(self):
+        *lines, self._pending = self._pending.split("\n")
+        if lines:
+            self.send_many(lines)
+
+
 @pytest.fixture
-def connect_fn():
+def connect_fn(client_loop):
+    clients = []
+
     def connect(addr: tuple[str, int], timeout: float = 1.0):
-        s = socket.create_connection(addr, timeout=timeout)
-        rf = s.makefile("r", encoding="utf-8", newline="\n")
-        wf = s.makefile("w", encoding="utf-8", newline="\n")
-        return s, rf, wf
-    return connect
+        c = LineClient(client_loop, addr, timeout)
+        clients.append(c)
+        return c, c, c
+
+    yield connect
+    for c in clients:
+        c.close()
 
 
 @pytest.fixture
 def send_line_fn():
     def send(wf, text: str):
-        wf.write(text.rstrip("\r\n") + "\n")
-        wf.flush()
+        wf.send(text.rstrip("\r\n"))
     return send
 
 
 @pytest.fixture
 def recv_line_fn():
     """
-    Lee una línea con reintentos cortos hasta total_timeout.
+    Lee una línea (mensaje o respuesta) esperando hasta total_timeout.
     Devuelve str o None si no llega nada.
     """
     def recv(rf, total_timeout: float = 2.0, step: float = 0.02):
-        deadline = time.time() + total_timeout
-        while time.time() < deadline:
-            try:
-                rf.buffer.raw._sock.settimeout(step)  # type: ignore[attr-defined]
-            except Exception:
-                pass
-            try:
-                line = rf.readline()
-                if line == "":
-                    return None
-                return line.rstrip("\n")
-            except Exception:
-                time.sleep(step)
-        return None
+        return rf.recv(total_timeout)
     return recv
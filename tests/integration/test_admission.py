@@ -0,0 +1,66 @@
+import socket
+import time
+
+from tests.helpers import wait_for
+
+
+def _read_lines(sock, n, timeout=3.0):
+    sock.settimeout(timeout)
+    buf = b""
+    while buf.count(b"\n") < n:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        buf += chunk
+    return buf.decode().split("\n")[:n]
+
+
+def test_connections_beyond_the_limit_are_refused(engine):
+    srv = engine(host="127.0.0.1", port=0, max_connections=2)
+    srv.start()
+    socks = []
+    try:
+        socks = [socket.create_connection(srv.address, timeout=2.0) for _ in range(2)]
+        assert wait_for(lambda: len(srv.clients) == 2)
+        extra = socket.create_connection(srv.address, timeout=2.0)
+        socks.append(extra)
+        assert _read_lines(extra, 2) == ["ERR Server full", ""]
+        assert srv.metrics.rejected == 1
+        # los admitidos siguen funcionando
+        socks[0].sendall(b"hola\n")
+        assert _read_lines(socks[1], 1) == ["hola"]
+    finally:
+        for s in socks:
+            s.close()
+        srv.stop()
+
+
+def test_idle_connections_are_reaped_and_ping_keeps_them(engine):
+    srv = engine(host="127.0.0.1", port=0, idle_timeout=0.3)
+    srv.start()
+    quiet = socket.create_connection(srv.address, timeout=2.0)
+    pinger = socket.create_connection(srv.address, timeout=2.0)
+    try:
+        for _ in range(6):
+            pinger.sendall(b"PING\n")
+            assert _read_lines(pinger, 1) == ["PONG"]
+            time.sleep(0.1)
+        assert _read_lines(quiet, 2) == ["ERR Idle timeout", ""]  # y después EOF
+        assert srv.metrics.reaped == 1
+        assert len(srv.clients) == 1
+    finally:
+        quiet.close(); pinger.close()
+        srv.stop()
+
+
+def test_accepted_sockets_use_keepalive(engine):
+    srv = engine(host="127.0.0.1", port=0, keepalive_idle=30)
+    srv.start()
+    c = socket.create_connection(srv.address, timeout=2.0)
+    try:
+        assert wait_for(lambda: len(srv.clients) == 1)
+        conn = srv.clients.snapshot()[0]
+        assert conn.sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE) == 1
+    finally:
+        c.close()
+        srv.stop()
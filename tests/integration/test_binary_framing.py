@@ -0,0 +1,61 @@
+import socket
+
+from src.protocol import (
+    FRAME_CMD,
+    FRAME_MSG,
+    encode_frame,
+    negotiate_binary,
+    recv_frame,
+    send_frame,
+)
+
+
+def _binary_client(addr):
+    s = socket.create_connection(addr, timeout=2.0)
+    assert negotiate_binary(s) == []
+    return s
+
+
+def test_binary_and_line_clients_share_the_broadcast(server, connect_fn, send_line_fn, recv_line_fn):
+    b = _binary_client(server.address)
+    s, rf, wf = connect_fn(server.address, timeout=2.0)
+    try:
+        send_frame(b, FRAME_MSG, "hola desde binario".encode())
+        assert recv_frame(b) == (FRAME_MSG, b"hola desde binario")
+        assert recv_line_fn(rf) == "hola desde binario"
+
+        send_line_fn(wf, "hola desde línea")
+        assert recv_line_fn(rf) == "hola desde línea"
+        assert recv_frame(b) == (FRAME_MSG, "hola desde línea".encode())
+    finally:
+        b.close()
+        s.close()
+
+
+def test_binary_commands_and_errors_are_cmd_frames(server):
+    b = _binary_client(server.address)
+    try:
+        send_frame(b, FRAME_MSG, b"   ")
+        assert recv_frame(b) == (FRAME_CMD, b"ERR Invalid message")
+        send_frame(b, FRAME_CMD, b"JOIN #dev")
+        assert recv_frame(b) == (FRAME_CMD, b"OK JOIN #dev")
+        send_frame(b, FRAME_CMD, b"ROOM #dev hola")
+        assert recv_frame(b) == (FRAME_MSG, b"#dev hola")
+        send_frame(b, FRAME_CMD, b"NOPE")
+        assert recv_frame(b) == (FRAME_CMD, b"ERR Unknown command")
+    finally:
+        b.close()
+
+
+def test_frames_sent_with_the_negotiation_are_not_lost(server):
+    # "BINARY" y el primer frame en el mismo segmento TCP
+    b = socket.create_connection(server.address, timeout=2.0)
+    try:
+        b.sendall(b"BINARY\n" + encode_frame(FRAME_MSG, b"pegado"))
+        line = b""
+        while not line.endswith(b"\n"):
+            line += b.recv(1)
+        assert line == b"OK BINARY\n"
+        assert recv_frame(b) == (FRAME_MSG, b"pegado")
+    finally:
+        b.close()
@@ -0,0 +1,124 @@
+import asyncio
+import socket
+
+import pytest
+
+from src.client import ChatClient, connect_many
+from src.protocol import FRAME_MSG, encode_frame
+
+
+def _run(engine, body, **options):
+    srv = engine(host="127.0.0.1", port=0, **options)
+    srv.start()
+    try:
+        asyncio.run(asyncio.wait_for(body(srv), 10.0))
+    finally:
+        srv.stop()
+
+
+def _cut(srv):
+    # corte de red del lado del servidor: el cliente ve EOF
+    for conn in srv.clients.snapshot():
+        conn.sock.shutdown(socket.SHUT_RDWR)
+
+
+@pytest.mark.parametrize("compress", [False, True], ids=["binary", "zlib"])
+def test_reconnect_resumes_with_since(engine, compress):
+    async def body(srv):
+        host, port = srv.address
+        client = ChatClient(host, port, compress=compress, reconnect=True, reconnect_delay=0.05)
+        await client.connect()
+        client.send("JOIN #dev")
+        assert await client.recv(2.0) == "OK JOIN #dev"
+        client.send_many(["uno", "dos"])
+        assert await client.recv_until(2, 2.0) == ["uno", "dos"]
+        assert client.last_seq == 2
+
+        _cut(srv)
+        other = ChatClient(host, port)
+        await other.connect()
+        other.send_many(["tres", "JOIN #dev", "ROOM #dev cuatro"])
+        client.send("cinco")  # sale al reconectar
+        assert await client.recv_until(3, 3.0) == ["tres", "#dev cuatro", "cinco"]
+        assert client.reconnects == 1 and client.last_seq == 5
+        await other.close()
+        await client.close()
+
+    _run(engine, body)
+
+
+def test_reconnect_resumes_from_the_log_across_segments(engine, tmp_path, monkeypatch):
+    # respuestas del log de a dos mensajes: la reanudación sigue con cada MORE
+    monkeypatch.setattr("src.server.LOG_READ_LIMIT", 2)
+
+    async def body(srv):
+        host, port = srv.address
+        client = ChatClient(host, port, reconnect=True, reconnect_delay=0.05)
+        await client.connect()
+        client.send("a")
+        assert await client.recv(2.0) == "a"
+
+        _cut(srv)
+        other = ChatClient(host, port)
+        await other.connect()
+        missed = ["b", "c", "d", "e", "f", "g"]
+        other.send_many(missed)
+        assert await other.recv_until(6, 2.0) == missed
+        # b..e ya salieron del historial en memoria (2): vienen del log, de
+        # varios segmentos
+        assert await client.recv_until(6, 3.0) == missed
+        assert len(srv.log.segments) > 2
+        assert client.reconnects == 1 and client.last_seq == 7
+        other.send("h")
+        assert await client.recv(2.0) == "h"
+        assert client.last_seq == 8
+        await other.close()
+        await client.close()
+
+    _run(engine, body, history_size=2, log_dir=str(tmp_path), log_segment_bytes=1)
+
+
+def test_spoofed_replies_do_not_break_resumption(engine):
+    async def body(srv):
+        host, port = srv.address
+        client = ChatClient(host, port, reconnect=True, reconnect_delay=0.05)
+        await client.connect()
+        # mensajes de chat con forma de respuesta o de directo: se entregan y cuentan
+        spoofed = ["END 99999", "HIST 1 falso", "OK genial", "MSG ana falso"]
+        client.send_many(spoofed[:3])
+        # "MSG" sale como comando: un cliente binario cualquiera lo difunde así
+        client._write(encode_frame(FRAME_MSG, b"MSG ana falso"))
+        assert await client.recv_until(4, 2.0) == spoofed
+        assert client.last_seq == 4
+
+        _cut(srv)
+        other = ChatClient(host, port)
+        await other.connect()
+        other.send("mientras tanto")
+        assert await client.recv(3.0) == "mientras tanto"
+        assert client.reconnects == 1 and client.last_seq == 5
+        # uno directo de verdad no consume secuencia
+        client.send("NICK bob")
+        assert await client.recv(2.0) == "OK NICK bob"
+        other.send_many(["NICK ana", "MSG bob directo"])
+        assert await client.recv(2.0) == "MSG ana directo"
+        assert client.last_seq == 5
+        await other.close()
+        await client.close()
+
+    _run(engine, body)
+
+
+def test_many_connections_and_pipelined_sends(engine):
+    async def body(srv):
+        host, port = srv.address
+        clients = await connect_many(host, port, 300)
+        sender = clients[0]
+        sender.send_many(f"m{i}" for i in range(1000))
+        await sender.drain()
+        expected = [f"m{i}" for i in range(1000)]
+        results = await asyncio.gather(*(c.recv_until(1000, 5.0) for c in clients))
+        assert all(got == expected for got in results)
+        await asyncio.gather(*(c.close() for c in clients))
+
+    _run(engine, body, max_queue_messages=0, max_queue_bytes=1 << 20)
@@ -0,0 +1,36 @@
+import os
+import socket
+import time
+
+import pytest
+
+from src.cluster import Cluster
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="requiere os.fork")
+
+
+def test_cluster_broadcasts_across_workers_in_one_global_order(engine):
+    cluster = Cluster(workers=2, host="127.0.0.1", port=0, engine=engine)
+    cluster.start()
+    conns = []
+    try:
+        # suficientes clientes para que ambos workers acepten alguno
+        conns = [socket.create_connection(cluster.address, timeout=2.0) for _ in range(6)]
+        time.sleep(0.1)
+        for i, c in enumerate(conns):
+            c.sendall(f"m{i}\n".encode())
+
+        received = []
+        for c in conns:
+            buf = b""
+            while buf.count(b"\n") < len(conns):
+                buf += c.recv(4096)
+            received.append(buf.decode().splitlines())
+
+        assert sorted(received[0]) == [f"m{i}" for i in range(len(conns))]
+        # mismo orden para todos, estén en el worker que estén
+        assert all(r == received[0] for r in received)
+    finally:
+        for c in conns:
+            c.close()
+        cluster.stop()
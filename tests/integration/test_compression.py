@@ -0,0 +1,92 @@
+import socket
+
+from src.client import BlockingClient
+from src.protocol import (
+    FRAME_MSG,
+    FRAME_ZMSG,
+    decompress_frames,
+    negotiate_binary,
+    negotiate_compressed,
+    recv_frame,
+    send_frame,
+)
+from tests.helpers import wait_for
+
+
+def _recv_msgs(sock, n):
+    """(mensajes, frames comprimidos recibidos) hasta juntar `n` mensajes."""
+    msgs, zframes = [], 0
+    while len(msgs) < n:
+        ftype, payload = recv_frame(sock)
+        if ftype == FRAME_ZMSG:
+            zframes += 1
+            msgs += [p.decode() for t, p in decompress_frames(payload) if t == FRAME_MSG]
+        elif ftype == FRAME_MSG:
+            msgs.append(payload.decode())
+    return msgs, zframes
+
+
+def test_batch_is_compressed_once_for_compressing_clients(engine):
+    # ventana larga: lo enviado de una vez sale en un solo lote
+    srv = engine(host="127.0.0.1", port=0, batch_linger=0.05)
+    srv.start()
+    z1 = socket.create_connection(srv.address, timeout=3.0)
+    z2 = socket.create_connection(srv.address, timeout=3.0)
+    raw = socket.create_connection(srv.address, timeout=3.0)
+    sender = socket.create_connection(srv.address, timeout=3.0)
+    try:
+        assert negotiate_compressed(z1) == ([], True)
+        assert negotiate_compressed(z2) == ([], True)
+        assert negotiate_binary(raw) == []
+        assert wait_for(lambda: len(srv.clients) == 4)
+        expected = ["hola a todos, mensaje número %d" % i for i in range(40)]
+        sender.sendall("".join(m + "\n" for m in expected).encode())
+        for s in (z1, z2):
+            msgs, zframes = _recv_msgs(s, 40)
+            assert msgs == expected and zframes >= 1
+        assert _recv_msgs(raw, 40) == (expected, 0)
+        m = srv.metrics
+        # una compresión por lote, no por destinatario
+        assert 1 <= m.compressed <= m.batches
+        assert m.compressed_bytes_out < m.compressed_bytes_in
+    finally:
+        for s in (z1, z2, raw, sender):
+            s.close()
+        srv.stop()
+
+
+def test_small_batches_go_raw_and_compression_can_be_refused(engine):
+    srv = engine(host="127.0.0.1", port=0, compress_min_bytes=1 << 20)
+    srv.start()
+    off = engine(host="127.0.0.1", port=0, compression=False)
+    off.start()
+    z = socket.create_connection(srv.address, timeout=3.0)
+    refused = socket.create_connection(off.address, timeout=3.0)
+    try:
+        assert negotiate_compressed(z) == ([], True)
+        send_frame(z, FRAME_MSG, b"corto")
+        assert recv_frame(z) == (FRAME_MSG, b"corto")
+        assert srv.metrics.compressed == 0
+        # sin compresión en el servidor la conexión queda en binario
+        assert negotiate_compressed(refused) == ([], False)
+        send_frame(refused, FRAME_MSG, b"hola")
+        assert recv_frame(refused) == (FRAME_MSG, b"hola")
+    finally:
+        z.close(); refused.close()
+        srv.stop(); off.stop()
+
+
+def test_client_library_expands_compressed_batches(engine, client_loop):
+    srv = engine(host="127.0.0.1", port=0, batch_linger=0.05, compress_min_bytes=0)
+    srv.start()
+    c = BlockingClient(client_loop, *srv.address, compress=True)
+    sender = BlockingClient(client_loop, *srv.address)
+    try:
+        assert c.client.compressed is True and c.client.binary is True
+        assert wait_for(lambda: len(srv.clients) == 2)
+        sender.send_many(["m%d" % i for i in range(30)])
+        assert c.recv_until(30) == ["m%d" % i for i in range(30)]
+        assert srv.metrics.compressed >= 1
+    finally:
+        c.close(); sender.close()
+        srv.stop()
@@ -0,0 +1,77 @@
+from tests.helpers import wait_for
+
+
+def test_msg_reaches_only_the_nick(server, connect_fn, send_line_fn, recv_line_fn):
+    s1, r1, w1 = connect_fn(server.address)
+    s2, r2, w2 = connect_fn(server.address)
+    s3, r3, w3 = connect_fn(server.address)
+    try:
+        send_line_fn(w1, "MSG bob hola")
+        assert recv_line_fn(r1) == "ERR Nick required"
+        send_line_fn(w1, "NICK ana")
+        assert recv_line_fn(r1) == "OK NICK ana"
+        send_line_fn(w2, "NICK bob")
+        assert recv_line_fn(r2) == "OK NICK bob"
+        send_line_fn(w3, "NICK ana")
+        assert recv_line_fn(r3) == "ERR Nick taken"
+        send_line_fn(w3, "NICK no válido")
+        assert recv_line_fn(r3) == "ERR Invalid nick"
+
+        send_line_fn(w1, "MSG bob hola bob")
+        assert recv_line_fn(r2) == "MSG ana hola bob"
+        send_line_fn(w1, "MSG nadie hola")
+        assert recv_line_fn(r1) == "ERR No such nick"
+        # nada pasó por el broadcaster: ni difusión ni secuencia
+        assert recv_line_fn(r3, total_timeout=0.2) is None
+        assert server.metrics.direct == 1
+        assert server.metrics.broadcast == 0 and server.gauges()["history_seq"] == 0
+    finally:
+        for s in (s1, s2, s3):
+            s.close()
+
+
+def test_disconnect_releases_the_nick(server, connect_fn, send_line_fn, recv_line_fn):
+    s1, r1, w1 = connect_fn(server.address)
+    s2, r2, w2 = connect_fn(server.address)
+    try:
+        send_line_fn(w1, "NICK ana")
+        assert recv_line_fn(r1) == "OK NICK ana"
+        s1.close()
+        assert wait_for(lambda: len(server.nicks) == 0)
+        send_line_fn(w2, "NICK ana")
+        assert recv_line_fn(r2) == "OK NICK ana"
+    finally:
+        s2.close()
+
+
+def test_msg_racing_binary_switch_keeps_the_framing(server):
+    import socket
+    import threading
+
+    from src.protocol import FRAME_DM, negotiate_binary, recv_frame
+
+    target = socket.create_connection(server.address, timeout=3.0)
+    sender = socket.create_connection(server.address, timeout=3.0)
+    n = 2000
+    try:
+        target.sendall(b"NICK bob\n")
+        sender.sendall(b"NICK ana\n")
+        assert wait_for(lambda: server.nicks.lookup("bob") is not None
+                     and server.nicks.lookup("ana") is not None)
+        flood = threading.Thread(
+            target=sender.sendall,
+            args=(b"".join(b"MSG bob dm %d\n" % i for i in range(n)),),
+        )
+        flood.start()
+        # el cambio a binario cae en medio de los MSG que llegan de otro hilo
+        before = negotiate_binary(target)
+        got = [line for line in before if line.startswith("MSG ")]
+        while len(got) < n:
+            frame = recv_frame(target)
+            assert frame is not None and frame[0] == FRAME_DM
+            got.append(frame[1].decode())
+        flood.join()
+        assert got == [f"MSG ana dm {i}" for i in range(n)]
+    finally:
+        target.close()
+        sender.close()
@@ -0,0 +1,87 @@
+from src.server import ChatServer
+from tests.helpers import read_until_end
+
+
+def test_history_and_since_resume_from_sequence(server, connect_fn, send_line_fn, recv_line_fn):
+    s, r, w = connect_fn(server.address)
+    try:
+        for text in ("uno", "dos", "tres"):
+            send_line_fn(w, text)
+            assert recv_line_fn(r) == text
+
+        send_line_fn(w, "HISTORY 2")
+        assert read_until_end(r, recv_line_fn) == ["HIST 2 dos", "HIST 3 tres", "END 3"]
+        send_line_fn(w, "SINCE 1")
+        assert read_until_end(r, recv_line_fn) == ["HIST 2 dos", "HIST 3 tres", "END 3"]
+        send_line_fn(w, "SINCE 3")
+        assert read_until_end(r, recv_line_fn) == ["END 3"]
+        send_line_fn(w, "SINCE x")
+        assert recv_line_fn(r) == "ERR Invalid argument"
+    finally:
+        r.close(); w.close(); s.close()
+
+
+def test_since_on_an_empty_history(server, connect_fn, send_line_fn, recv_line_fn):
+    s, r, w = connect_fn(server.address)
+    try:
+        send_line_fn(w, "SINCE 0")
+        assert read_until_end(r, recv_line_fn) == ["END 0"]
+        send_line_fn(w, "HISTORY 0")
+        assert read_until_end(r, recv_line_fn) == ["END 0"]
+    finally:
+        r.close(); w.close(); s.close()
+
+
+def test_room_messages_only_replayed_to_members(server, connect_fn, send_line_fn, recv_line_fn):
+    s, r, w = connect_fn(server.address)
+    s2, r2, w2 = connect_fn(server.address)
+    try:
+        send_line_fn(w, "JOIN #dev")
+        assert recv_line_fn(r) == "OK JOIN #dev"
+        send_line_fn(w, "ROOM #dev secreto")
+        assert recv_line_fn(r) == "#dev secreto"
+        send_line_fn(w, "público")
+        assert recv_line_fn(r) == "público"
+        assert recv_line_fn(r2) == "público"
+
+        send_line_fn(w, "HISTORY 10")
+        assert read_until_end(r, recv_line_fn) == ["HIST 1 #dev secreto", "HIST 2 público", "END 2"]
+        send_line_fn(w2, "HISTORY 10")
+        assert read_until_end(r2, recv_line_fn) == ["HIST 2 público", "END 2"]
+    finally:
+        for f in (r, w, r2, w2):
+            f.close()
+        s.close(); s2.close()
+
+
+def test_replay_on_connect_and_gap(connect_fn, send_line_fn, recv_line_fn):
+    srv = ChatServer(host="127.0.0.1", port=0, history_size=2, history_replay=5)
+    srv.start()
+    s, r, w = connect_fn(srv.address)
+    try:
+        assert read_until_end(r, recv_line_fn) == ["END 0"]
+        for text in ("a", "b", "c"):
+            send_line_fn(w, text)
+            assert recv_line_fn(r) == text
+        s2, r2, w2 = connect_fn(srv.address)
+        try:
+            assert read_until_end(r2, recv_line_fn) == ["HIST 2 b", "HIST 3 c", "END 3"]
+        finally:
+            r2.close(); w2.close(); s2.close()
+        send_line_fn(w, "SINCE 0")
+        assert read_until_end(r, recv_line_fn) == ["GAP 2", "HIST 2 b", "HIST 3 c", "END 3"]
+    finally:
+        r.close(); w.close(); s.close()
+        srv.stop()
+
+
+def test_history_disabled(connect_fn, send_line_fn, recv_line_fn):
+    srv = ChatServer(host="127.0.0.1", port=0, history_size=0)
+    srv.start()
+    s, r, w = connect_fn(srv.address)
+    try:
+        send_line_fn(w, "HISTORY 5")
+        assert recv_line_fn(r) == "ERR History disabled"
+    finally:
+        r.close(); w.close(); s.close()
+        srv.stop()
@@ -0,0 +1,34 @@
+from tests.helpers import read_until_end
+
+
+def test_restart_resumes_sequence_and_serves_since_from_log(
+    engine, tmp_path, connect_fn, send_line_fn, recv_line_fn
+):
+    options = dict(host="127.0.0.1", port=0, history_size=2, log_dir=str(tmp_path))
+    srv = engine(**options)
+    srv.start()
+    s, r, w = connect_fn(srv.address)
+    try:
+        for text in ("a", "b", "c", "d"):
+            send_line_fn(w, text)
+            assert recv_line_fn(r) == text
+    finally:
+        r.close(); w.close(); s.close()
+        srv.stop()
+
+    srv = engine(**options)
+    srv.start()
+    s, r, w = connect_fn(srv.address)
+    try:
+        send_line_fn(w, "HISTORY 5")
+        assert read_until_end(r, recv_line_fn) == ["HIST 3 c", "HIST 4 d", "END 4"]
+        send_line_fn(w, "e")
+        assert recv_line_fn(r) == "e"
+        # 1..3 ya no están en memoria: salen del log y MORE dice dónde seguir
+        send_line_fn(w, "SINCE 0")
+        assert read_until_end(r, recv_line_fn) == ["HIST 1 a", "HIST 2 b", "HIST 3 c", "MORE 3"]
+        send_line_fn(w, "SINCE 3")
+        assert read_until_end(r, recv_line_fn) == ["HIST 4 d", "HIST 5 e", "END 5"]
+    finally:
+        r.close(); w.close(); s.close()
+        srv.stop()
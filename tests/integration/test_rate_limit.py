@@ -0,0 +1,36 @@
+import socket
+import time
+
+
+def _read_lines(sock, n, timeout=3.0):
+    sock.settimeout(timeout)
+    buf = b""
+    while buf.count(b"\n") < n:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        buf += chunk
+    return buf.decode().split("\n")[:n]
+
+
+def test_flooding_client_is_slowed_without_losing_or_starving(engine):
+    srv = engine(host="127.0.0.1", port=0, rate_limit=25, rate_burst=2)
+    srv.start()
+    flood = socket.create_connection(srv.address, timeout=2.0)
+    quiet = socket.create_connection(srv.address, timeout=2.0)
+    try:
+        start = time.monotonic()
+        flood.sendall(b"".join(b"f%d\n" % i for i in range(10)))
+        time.sleep(0.05)
+        quiet.sendall(b"hola\n")
+        got = _read_lines(quiet, 11)
+        elapsed = time.monotonic() - start
+        # nada se pierde y el orden del que inunda se mantiene
+        assert [line for line in got if line.startswith("f")] == [f"f{i}" for i in range(10)]
+        # el otro cliente no espera a que termine la inundación
+        assert got.index("hola") < 9
+        assert elapsed >= 0.25  # 8 mensajes por encima de la ráfaga a 25/s
+        assert srv.metrics.throttled >= 1
+    finally:
+        flood.close(); quiet.close()
+        srv.stop()
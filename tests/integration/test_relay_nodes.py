@@ -0,0 +1,68 @@
+import socket
+import time
+
+from src.bus import RelayBus
+from src.server import ChatServer
+
+
+def _read_lines(sock, n, timeout=3.0):
+    sock.settimeout(timeout)
+    buf = b""
+    while buf.count(b"\n") < n:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        buf += chunk
+    return buf.decode().split("\n")[:n]
+
+
+def test_messages_reach_clients_on_every_node(engine):
+    nodes = [engine(host="127.0.0.1", port=0, bus=RelayBus()) for _ in range(3)]
+    for node in nodes:
+        for other in nodes:
+            if other is not node:
+                node.bus.add_peer(other.bus.address)
+        node.start()
+    clients = []
+    try:
+        clients = [socket.create_connection(node.address, timeout=2.0) for node in nodes]
+        time.sleep(0.1)
+        for i, c in enumerate(clients):
+            c.sendall(b"".join(b"n%d-%d\n" % (i, k) for k in range(5)))
+
+        for c in clients:
+            got = _read_lines(c, 15)
+            assert sorted(got) == sorted(f"n{i}-{k}" for i in range(3) for k in range(5))
+            # el orden de cada nodo de origen se conserva en todos
+            for i in range(3):
+                assert [m for m in got if m.startswith(f"n{i}-")] == [f"n{i}-{k}" for k in range(5)]
+    finally:
+        for c in clients:
+            c.close()
+        for node in nodes:
+            node.stop()
+
+
+def test_rooms_span_nodes():
+    nodes = [ChatServer(host="127.0.0.1", port=0, bus=RelayBus()) for _ in range(2)]
+    nodes[0].bus.add_peer(nodes[1].bus.address)
+    nodes[1].bus.add_peer(nodes[0].bus.address)
+    for node in nodes:
+        node.start()
+    a = socket.create_connection(nodes[0].address, timeout=2.0)
+    b = socket.create_connection(nodes[1].address, timeout=2.0)
+    outsider = socket.create_connection(nodes[1].address, timeout=2.0)
+    try:
+        for c in (a, b):
+            c.sendall(b"JOIN #sala\n")
+            assert _read_lines(c, 1) == ["OK JOIN #sala"]
+        a.sendall(b"ROOM #sala hola\n")
+        assert _read_lines(b, 1) == ["#sala hola"]
+        a.sendall(b"fin\n")
+        # quien no está en la sala (en el otro nodo) solo ve lo general
+        assert _read_lines(outsider, 1) == ["fin"]
+    finally:
+        for s in (a, b, outsider):
+            s.close()
+        for node in nodes:
+            node.stop()
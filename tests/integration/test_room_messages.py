@@ -0,0 +1,53 @@
+import time
+
+
+def test_room_messages_reach_only_members(server, connect_fn, send_line_fn, recv_line_fn):
+    addr = server.address
+    s1, r1, w1 = connect_fn(addr)
+    s2, r2, w2 = connect_fn(addr)
+    s3, r3, w3 = connect_fn(addr)
+    try:
+        send_line_fn(w1, "JOIN #dev")
+        assert recv_line_fn(r1) == "OK JOIN #dev"
+        send_line_fn(w2, "JOIN #dev")
+        assert recv_line_fn(r2) == "OK JOIN #dev"
+
+        send_line_fn(w1, "ROOM #dev hola sala")
+        assert recv_line_fn(r1) == "#dev hola sala"
+        assert recv_line_fn(r2) == "#dev hola sala"
+
+        # el tercero no está en la sala: no puede escribir ni recibe nada
+        send_line_fn(w3, "ROOM #dev intruso")
+        assert recv_line_fn(r3) == "ERR Not in room"
+        send_line_fn(w3, "JOIN sin-numeral")
+        assert recv_line_fn(r3) == "ERR Invalid room"
+
+        # un mensaje normal sigue yendo a todos
+        send_line_fn(w3, "para todos")
+        assert [recv_line_fn(r) for r in (r1, r2, r3)] == ["para todos"] * 3
+
+        send_line_fn(w2, "PART #dev")
+        assert recv_line_fn(r2) == "OK PART #dev"
+        send_line_fn(w1, "ROOM #dev solo")
+        assert recv_line_fn(r1) == "#dev solo"
+        send_line_fn(w2, "PART #dev")
+        assert recv_line_fn(r2) == "ERR Not in room"
+    finally:
+        for r, w, s in [(r1, w1, s1), (r2, w2, s2), (r3, w3, s3)]:
+            r.close(); w.close(); s.close()
+
+
+def test_disconnect_cleans_room_membership(server, connect_fn, send_line_fn, recv_line_fn):
+    s1, r1, w1 = connect_fn(server.address)
+    try:
+        send_line_fn(w1, "JOIN #tmp")
+        assert recv_line_fn(r1) == "OK JOIN #tmp"
+        assert server.rooms.members("#tmp")
+    finally:
+        r1.close(); w1.close(); s1.close()
+
+    deadline = time.time() + 2.0
+    while server.rooms.members("#tmp") and time.time() < deadline:
+        time.sleep(0.01)
+    assert server.rooms.members("#tmp") == ()
+    assert len(server.rooms) == 0
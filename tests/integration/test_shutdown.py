@@ -0,0 +1,78 @@
+import socket
+import threading
+import time
+
+from tests.helpers import wait_for
+
+
+def _read_all(sock, timeout=3.0):
+    sock.settimeout(timeout)
+    buf = b""
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return buf
+        buf += chunk
+
+
+def test_drain_delivers_what_was_queued_before_stop(engine):
+    # ventana larga: al llamar a stop() los mensajes siguen en el broadcaster
+    srv = engine(host="127.0.0.1", port=0, batch_linger=0.5, drain_timeout=3.0)
+    srv.start()
+    sender = socket.create_connection(srv.address, timeout=2.0)
+    receiver = socket.create_connection(srv.address, timeout=2.0)
+    try:
+        assert wait_for(lambda: len(srv.clients) == 2)
+        sender.sendall(b"".join(b"m%d\n" % i for i in range(200)))
+        assert wait_for(lambda: srv.metrics.received == 200)
+        srv.stop()
+        # todo llega y después EOF
+        assert _read_all(receiver).split(b"\n")[:-1] == [b"m%d" % i for i in range(200)]
+        assert srv.metrics.shutdown_ns.count == 1
+        assert srv.metrics.undrained == 0
+    finally:
+        sender.close(); receiver.close()
+
+
+def test_drain_stops_at_the_deadline_with_a_client_that_does_not_read(engine):
+    srv = engine(host="127.0.0.1", port=0, max_queue_bytes=64 << 20, max_queue_messages=0)
+    srv.start()
+    stuck = socket.socket()
+    stuck.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    stuck.connect(srv.address)
+    try:
+        assert wait_for(lambda: len(srv.clients) == 1)
+        srv.broadcast_many(["x" * 1000] * 20_000)
+        t0 = time.monotonic()
+        srv.stop(drain=0.3)
+        assert 0.3 <= time.monotonic() - t0 < 2.0
+        assert srv.metrics.undrained == 1
+        assert srv.metrics.shutdown_ns.max >= 300_000_000
+    finally:
+        stuck.close()
+
+
+def test_no_new_connections_while_draining(engine):
+    srv = engine(host="127.0.0.1", port=0, max_queue_bytes=64 << 20, max_queue_messages=0)
+    srv.start()
+    stuck = socket.socket()
+    stuck.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    stuck.connect(srv.address)
+    try:
+        assert wait_for(lambda: len(srv.clients) == 1)
+        srv.broadcast_many(["x" * 1000] * 20_000)
+        stopper = threading.Thread(target=srv.stop, kwargs={"drain": 1.0})
+        stopper.start()
+        assert wait_for(srv.stopping.is_set)
+        try:
+            late = socket.create_connection(srv.address, timeout=0.5)
+        except OSError:
+            pass  # rechazada: el socket de escucha ya no está
+        else:
+            late.close()
+        time.sleep(0.1)
+        assert len(srv.clients) == 1
+        stopper.join(3.0)
+        assert srv.metrics.accepted == 1
+    finally:
+        stuck.close()
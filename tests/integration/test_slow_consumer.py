@@ -0,0 +1,60 @@
+import socket
+import time
+
+import pytest
+
+
+def test_slow_reader_does_not_stall_others_and_gets_disconnected(engine):
+    srv = engine(host="127.0.0.1", port=0, max_queue_bytes=64 * 1024)
+    srv.start()
+    slow = socket.create_connection(srv.address)
+    # buffer de recepción mínimo: el lento se llena enseguida
+    slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    fast = socket.create_connection(srv.address, timeout=3.0)
+    rf = fast.makefile("r", encoding="utf-8", newline="\n")
+    wf = fast.makefile("w", encoding="utf-8", newline="\n")
+    try:
+        time.sleep(0.05)
+        # ~8 MiB en total: más de lo que absorben los buffers del kernel
+        n = 1000
+        body = "x" * 8192
+        # el rápido recibe todo aunque el otro nunca lea
+        for i in range(n):
+            srv.broadcast(f"{i} {body}")
+            assert rf.readline() == f"{i} {body}\n"
+
+        # el consumidor lento superó el límite y fue desconectado
+        deadline = time.time() + 2.0
+        while len(srv.clients) > 1 and time.time() < deadline:
+            time.sleep(0.02)
+        assert len(srv.clients) == 1
+    finally:
+        rf.close(); wf.close(); fast.close(); slow.close()
+        srv.stop()
+
+
+@pytest.mark.parametrize("policy", ["disconnect", "drop-newest"])
+def test_batch_larger_than_queue_limit_reaches_idle_reader(engine, policy):
+    # un lote coalescido de 300 mensajes con colas de 100: la cola vacía lo acepta
+    srv = engine(
+        host="127.0.0.1", port=0, max_queue_messages=100, slow_consumer_policy=policy,
+        batch_linger=0.05,
+    )
+    srv.start()
+    reader = socket.create_connection(srv.address, timeout=3.0)
+    sender = socket.create_connection(srv.address, timeout=3.0)
+    try:
+        deadline = time.time() + 2.0
+        while len(srv.clients) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        sender.sendall(b"".join(b"m%d\n" % i for i in range(300)))
+        data = b""
+        while data.count(b"\n") < 300:
+            chunk = reader.recv(65536)
+            assert chunk, "el lector sano fue desconectado"
+            data += chunk
+        assert data.split(b"\n")[:300] == [b"m%d" % i for i in range(300)]
+        assert len(srv.clients) == 2
+    finally:
+        reader.close(); sender.close()
+        srv.stop()
@@ -0,0 +1,52 @@
+import time
+
+from src.server import ChatServer
+
+
+def _read_stats(rf, recv_line_fn):
+    stats = {}
+    while True:
+        line = recv_line_fn(rf)
+        if line is None or line == "END":
+            return stats
+        _, name, value = line.split(" ")
+        stats[name] = int(value)
+
+
+def test_stats_command_reports_counters(server, connect_fn, send_line_fn, recv_line_fn):
+    s, r, w = connect_fn(server.address)
+    try:
+        send_line_fn(w, "hola")
+        assert recv_line_fn(r) == "hola"
+        send_line_fn(w, "   ")
+        assert recv_line_fn(r) == "ERR Invalid message"
+
+        # fanout_ns se registra después de enviar: esperar a que el
+        # broadcaster termine con el lote
+        deadline = time.monotonic() + 1.0
+        while True:
+            send_line_fn(w, "STATS")
+            stats = _read_stats(r, recv_line_fn)
+            if stats["fanout_ns_count"] or time.monotonic() > deadline:
+                break
+        assert stats["clients"] == 1
+        assert stats["accepted"] >= 1
+        assert stats["received"] == 1
+        assert stats["invalid"] == 1
+        assert stats["broadcast"] == 1
+        assert stats["fanout_ns_count"] == 1
+    finally:
+        r.close(); w.close(); s.close()
+
+
+def test_stats_disabled(connect_fn, send_line_fn, recv_line_fn):
+    srv = ChatServer(host="127.0.0.1", port=0, metrics=False)
+    srv.start()
+    s, r, w = connect_fn(srv.address)
+    try:
+        send_line_fn(w, "STATS")
+        assert recv_line_fn(r) == "ERR Metrics disabled"
+        assert srv.metrics is None
+    finally:
+        r.close(); w.close(); s.close()
+        srv.stop()
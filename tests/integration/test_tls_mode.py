@@ -0,0 +1,111 @@
+import shutil
+import socket
+
+import pytest
+
+from src.client import BlockingClient
+from src.tls import generate_self_signed, make_client_context
+from tests.helpers import wait_for
+
+pytestmark = pytest.mark.skipif(shutil.which("openssl") is None, reason="requiere openssl")
+
+
+@pytest.fixture(scope="module")
+def cert(tmp_path_factory):
+    return generate_self_signed(str(tmp_path_factory.mktemp("tls")))
+
+
+def _connect(srv, cert, session=None, ctx=None):
+    raw = socket.create_connection(srv.address, timeout=3.0)
+    ctx = ctx or make_client_context(cert[0])
+    return ctx.wrap_socket(raw, server_hostname="localhost", session=session)
+
+
+def _recv_line(sock) -> bytes:
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def test_tls_clients_chat_while_a_silent_client_is_handshaking(engine, cert):
+    srv = engine(host="127.0.0.1", port=0, tls_cert=cert[0], tls_key=cert[1])
+    srv.start()
+    # conecta por TCP y nunca manda el ClientHello
+    silent = socket.create_connection(srv.address)
+    try:
+        a, b = _connect(srv, cert), _connect(srv, cert)
+        assert wait_for(lambda: len(srv.clients) == 2)
+        assert len(srv.handshakers) == 1
+        a.sendall(b"hola cifrado\n")
+        assert _recv_line(b) == b"hola cifrado\n"
+        assert _recv_line(a) == b"hola cifrado\n"
+        a.close()
+        b.close()
+    finally:
+        silent.close()
+        srv.stop()
+
+
+def test_reconnect_resumes_tls_session(engine, cert):
+    srv = engine(host="127.0.0.1", port=0, tls_cert=cert[0], tls_key=cert[1])
+    srv.start()
+    # una sesión solo se reanuda con el mismo contexto de cliente
+    ctx = make_client_context(cert[0])
+    try:
+        first = _connect(srv, cert, ctx=ctx)
+        # TLS 1.3: los tickets llegan después del handshake, con lo primero que se lee
+        first.sendall(b"PING\n")
+        assert _recv_line(first) == b"PONG\n"
+        session = first.session
+        first.close()
+
+        again = _connect(srv, cert, session=session, ctx=ctx)
+        assert again.session_reused
+        assert wait_for(lambda: srv.metrics.tls_resumed == 1)
+        assert srv.metrics.tls_handshakes == 2
+        again.sendall(b"de vuelta\n")
+        assert _recv_line(again) == b"de vuelta\n"
+        again.close()
+    finally:
+        srv.stop()
+
+
+def test_tls_handshake_timeout_and_plaintext_clients_are_dropped(engine, cert):
+    srv = engine(
+        host="127.0.0.1", port=0, tls_cert=cert[0], tls_key=cert[1], tls_handshake_timeout=0.3
+    )
+    srv.start()
+    silent = socket.create_connection(srv.address, timeout=2.0)
+    plain = socket.create_connection(srv.address, timeout=2.0)
+    try:
+        plain.sendall(b"hola en claro\n")
+        assert wait_for(lambda: srv.metrics.tls_failed == 2)
+        assert silent.recv(100) == b""
+        assert len(srv.clients) == 0
+    finally:
+        silent.close()
+        plain.close()
+        srv.stop()
+
+
+def test_client_library_speaks_tls_in_binary_mode(engine, cert, client_loop):
+    srv = engine(host="127.0.0.1", port=0, tls_cert=cert[0], tls_key=cert[1])
+    srv.start()
+    tls = make_client_context(cert[0])
+    a = BlockingClient(client_loop, *srv.address, tls=tls, compress=True)
+    b = BlockingClient(client_loop, *srv.address, tls=tls)
+    try:
+        assert wait_for(lambda: len(srv.clients) == 2)
+        # un lote grande: sale comprimido y en varios registros TLS
+        texts = [f"msg {i} " + "x" * 200 for i in range(300)]
+        a.send_many(texts)
+        assert b.recv_until(300, timeout=5.0) == texts
+        assert a.recv_until(300, timeout=5.0) == texts
+    finally:
+        a.close()
+        b.close()
+        srv.stop()
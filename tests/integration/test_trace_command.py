@@ -0,0 +1,51 @@
+import socket
+
+from tests.helpers import wait_for
+
+
+def _read_until(sock, end, timeout=3.0):
+    sock.settimeout(timeout)
+    buf = b""
+    while end not in buf:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        buf += chunk
+    return buf.decode("utf-8").split("\n")
+
+
+def test_trace_command_reports_stages_and_slowest(engine):
+    srv = engine(host="127.0.0.1", port=0, trace_sample=1)
+    srv.start()
+    socks = [socket.create_connection(srv.address, timeout=3.0) for _ in range(3)]
+    try:
+        assert wait_for(lambda: len(srv.clients) == 3)
+        socks[1].sendall(b"NICK bob\n")
+        assert "OK NICK bob" in _read_until(socks[1], b"OK NICK bob\n")
+        for i in range(5):
+            socks[0].sendall(b"m%d\n" % i)
+            _read_until(socks[0], b"m%d\n" % i)
+        # cada destinatario escribió los 5 lotes muestreados
+        assert wait_for(lambda: srv.tracer.spans["write"].count == 15)
+        socks[2].sendall(b"TRACE\n")
+        lines = _read_until(socks[2], b"END\n")
+        lines = lines[lines.index("TRACE sampled 5 1/1"):lines.index("END")]
+        spans = {line.split()[1]: line for line in lines if "count=" in line}
+        assert "count=5 " in spans["dequeue"] and "count=15 " in spans["total"]
+        slow = [line for line in lines if line.startswith("TRACE slow ")]
+        assert len(slow) == 10
+        assert any(line.endswith(" nick=bob") for line in slow)
+    finally:
+        for s in socks:
+            s.close()
+        srv.stop()
+
+
+def test_trace_disabled_by_default(server, connect_fn, send_line_fn, recv_line_fn):
+    s, r, w = connect_fn(server.address)
+    try:
+        send_line_fn(w, "TRACE")
+        assert recv_line_fn(r) == "ERR Tracing disabled"
+        assert server.tracer is None
+    finally:
+        s.close()
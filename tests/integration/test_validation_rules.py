@@ -0,0 +1,43 @@
+import socket
+import time
+
+
+def _read_lines(sock, n, timeout=3.0):
+    sock.settimeout(timeout)
+    buf = b""
+    while buf.count(b"\n") < n:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        buf += chunk
+    return buf.decode().split("\n")[:n]
+
+
+def test_configured_rules_apply_to_a_whole_chunk(engine):
+    srv = engine(host="127.0.0.1", port=0, max_message_len=5, length_unit="bytes", reject_control=True)
+    srv.start()
+    sender = socket.create_connection(srv.address, timeout=2.0)
+    reader = socket.create_connection(srv.address, timeout=2.0)
+    try:
+        time.sleep(0.05)
+        # un solo bloque: se valida en lote y se procesa en orden
+        sender.sendall("uno\na\x1bb\nñññ\nSTATS\ndos\r\n".encode())
+        assert _read_lines(reader, 2) == ["uno", "dos"]
+        assert srv.metrics.invalid == 2
+        assert srv.metrics.received == 2
+    finally:
+        sender.close(); reader.close()
+        srv.stop()
+
+
+def test_invalid_utf8_still_closes_the_connection(engine):
+    srv = engine(host="127.0.0.1", port=0)
+    srv.start()
+    sock = socket.create_connection(srv.address, timeout=2.0)
+    try:
+        sock.sendall(b"\xff\xfe\n")
+        sock.settimeout(2.0)
+        assert sock.recv(4096) == b""
+    finally:
+        sock.close()
+        srv.stop()
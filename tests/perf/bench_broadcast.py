@@ -0,0 +1,122 @@
+"""
+Benchmark: CPU por mensaje de `broadcast` según la cantidad de clientes.
+
+Compara, sobre socketpairs locales:
+- textio: un TextIOWrapper por cliente con send_line (implementación original).
+- per-client: codificar la línea una vez por destinatario y encolarla.
+- encode-once: ChatServer.broadcast (una codificación compartida por todos).
+
+Se mide `time.thread_time()` del hilo que difunde; otro hilo vacía los
+sockets del lado cliente para que el kernel no se llene.
+
+    python -m tests.perf.bench_broadcast --clients 10 100 1000 --messages 500
+"""
+
+import argparse
+import selectors
+import socket
+import threading
+import time
+
+from src.connection import Connection, OutboundQueue
+from src.protocol import encode_line, send_line
+from src.server import ChatServer
+
+TEXT = "hola a todos, este es un mensaje de prueba de tamaño típico"
+
+
+class _Drainer(threading.Thread):
+    """Lee y descarta todo lo que llega a los sockets de los clientes."""
+
+    def __init__(self, socks):
+        super().__init__(daemon=True)
+        self.sel = selectors.DefaultSelector()
+        for s in socks:
+            s.setblocking(False)
+            self.sel.register(s, selectors.EVENT_READ)
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.is_set():
+            for key, _ in self.sel.select(timeout=0.05):
+                try:
+                    key.fileobj.recv(1 << 16)
+                except OSError:
+                    pass
+
+
+def _setup(n):
+    pairs = [socket.socketpair() for _ in range(n)]
+    return [a for a, _ in pairs], [b for _, b in pairs]
+
+
+def _run(fn, messages):
+    start = time.thread_time()
+    for _ in range(messages):
+        fn(TEXT)
+    return (time.thread_time() - start) / messages
+
+
+def bench_textio(n, messages):
+    srv_socks, peers = _setup(n)
+    wfs = [s.makefile("w", encoding="utf-8", newline="\n") for s in srv_socks]
+    drainer = _Drainer(peers)
+    drainer.start()
+
+    def broadcast(text):
+        for wf in wfs:
+            send_line(wf, text)
+
+    try:
+        return _run(broadcast, messages)
+    finally:
+        drainer.stop.set()
+        drainer.join()
+        for s in srv_socks + peers:
+            s.close()
+
+
+def _server_with(n):
+    srv = ChatServer()
+    srv_socks, peers = _setup(n)
+    for s in srv_socks:
+        srv.clients.add(Connection(s, OutboundQueue(max_bytes=0, max_messages=0)))
+    return srv, srv_socks, peers
+
+
+def bench_server(n, messages, encode_once):
+    srv, srv_socks, peers = _server_with(n)
+    drainer = _Drainer(peers)
+    drainer.start()
+
+    def per_client(text):
+        snapshot = srv._snapshot()
+        for conn in snapshot:
+            conn.outq.push(encode_line(text))
+        srv._deliver(snapshot)
+
+    try:
+        return _run(srv.broadcast if encode_once else per_client, messages)
+    finally:
+        drainer.stop.set()
+        drainer.join()
+        for s in srv_socks + peers:
+            s.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--clients", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--messages", type=int, default=500)
+    args = ap.parse_args(argv)
+
+    print(f"{'clientes':>9} {'textio':>12} {'per-client':>12} {'encode-once':>12}  (µs CPU/mensaje)")
+    for n in args.clients:
+        t = bench_textio(n, args.messages)
+        p = bench_server(n, args.messages, encode_once=False)
+        o = bench_server(n, args.messages, encode_once=True)
+        print(f"{n:>9} {t * 1e6:>12.1f} {p * 1e6:>12.1f} {o * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
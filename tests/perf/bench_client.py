@@ -0,0 +1,90 @@
+"""
+Carga con la biblioteca asyncio (src/client.py): abre miles de conexiones
+desde un solo proceso, algunas envían ráfagas en pipeline y todas cuentan lo
+que reciben. Reporta el tiempo de conexión y las entregas/s (mensajes x
+clientes). Sin --address levanta un servidor local en otro proceso; con
+--address mide un despliegue ya corriendo.
+
+    python -m tests.perf.bench_client --clients 2000 --senders 10 --messages 200
+    python -m tests.perf.bench_client --address chat.interno:9000 --clients 5000
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from run_server import ENGINES, _address
+from src.client import connect_many
+from tests.perf.loadgen import _serve
+
+
+async def measure(address, clients: int, senders: int, messages: int, burst: int) -> dict:
+    start = time.perf_counter()
+    conns = await connect_many(*address, clients)
+    connect_s = time.perf_counter() - start
+    expected = senders * messages
+    try:
+        start = time.perf_counter()
+
+        async def send(client):
+            for i in range(0, messages, burst):
+                client.send_many(f"carga {i + j}" for j in range(min(burst, messages - i)))
+                await client.drain()
+
+        async def count(client) -> int:
+            got = 0
+            while got < expected:
+                batch = await client.recv_batch(5.0)
+                if not batch:
+                    break
+                got += len(batch)
+            return got
+
+        sent = asyncio.gather(*(send(c) for c in conns[:senders]))
+        received = await asyncio.gather(*(count(c) for c in conns))
+        await sent
+        elapsed = time.perf_counter() - start
+    finally:
+        await asyncio.gather(*(c.close() for c in conns))
+    return {
+        "connect_s": round(connect_s, 3),
+        "delivered": sum(received),
+        "expected": expected * clients,
+        "deliveries_per_s": round(sum(received) / elapsed),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--address", type=_address, help="HOST:PUERTO de un servidor ya corriendo")
+    ap.add_argument("--engine", choices=sorted(ENGINES), default="selectors")
+    ap.add_argument("--clients", type=int, default=1000)
+    ap.add_argument("--senders", type=int, default=10)
+    ap.add_argument("--messages", type=int, default=100, help="mensajes por emisor")
+    ap.add_argument("--burst", type=int, default=50, help="mensajes por send_many")
+    args = ap.parse_args(argv)
+
+    proc = parent = None
+    address = args.address
+    if address is None:
+        ctx = multiprocessing.get_context("spawn")
+        parent, child = ctx.Pipe()
+        options = {"max_queue_messages": 0, "listen_backlog": 1024}
+        proc = ctx.Process(target=_serve, args=(args.engine, options, child), daemon=True)
+        proc.start()
+        address = parent.recv()
+    try:
+        report = asyncio.run(
+            measure(address, args.clients, min(args.senders, args.clients), args.messages, args.burst)
+        )
+    finally:
+        if proc is not None:
+            parent.send("stop")
+            proc.join(timeout=5.0)
+    for key, value in report.items():
+        print(f"{key:18s} {value}")
+
+
+if __name__ == "__main__":
+    main()
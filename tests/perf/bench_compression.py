@@ -0,0 +1,73 @@
+"""
+Benchmark de la compresión de lotes (FRAME_ZMSG): por tamaño de lote, bytes
+sin comprimir, comprimidos con el diccionario de src/protocol.py y sin él, y
+el costo de comprimir (una vez por lote en el servidor) y descomprimir (una
+vez por cliente). Con N clientes el ahorro de ancho de banda se multiplica
+por N y el costo de comprimir no.
+
+    python -m tests.perf.bench_compression --batches 1 4 16 64 256 --clients 1000
+"""
+
+import argparse
+import random
+import time
+import zlib
+
+from src.protocol import FRAME_MSG, compress_frames, decompress_frames, encode_frame
+
+WORDS = (
+    "hola buenas gracias alguien sabe como hacer esto mañana hoy noche todo bien "
+    "jaja que tal vamos dale ok sí no ya está the build is broken again lol "
+    "deploy listo revisen el PR por favor https://example.com/docs"
+).split()
+
+
+def _messages(n: int, rng: random.Random):
+    out = []
+    for _ in range(n):
+        room = rng.choice(("#general ", "#dev ", ""))
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 14)))
+        out.append((room + text).encode("utf-8"))
+    return out
+
+
+def _timed(fn, arg, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - t0) / repeat
+
+
+def run(batch: int, repeat: int) -> dict:
+    rng = random.Random(batch)
+    frames = b"".join(encode_frame(FRAME_MSG, m) for m in _messages(batch, rng))
+    payload = compress_frames(frames)
+    plain = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return {
+        "raw": len(frames),
+        "dict": len(payload),
+        "nodict": len(plain.compress(frames) + plain.flush()),
+        "compress_us": _timed(compress_frames, frames, repeat) * 1e6,
+        "decompress_us": _timed(decompress_frames, payload, repeat) * 1e6,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--batches", type=int, nargs="+", default=[1, 4, 16, 64, 256])
+    ap.add_argument("--clients", type=int, default=1000)
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args(argv)
+    for batch in args.batches:
+        r = run(batch, args.repeat)
+        saved = (r["raw"] - r["dict"]) * args.clients
+        print(
+            f"lote {batch:4d}: {r['raw']:7d} B -> {r['dict']:6d} B con diccionario "
+            f"({r['dict'] / r['raw']:.0%}), {r['nodict']:6d} B sin él  "
+            f"comprimir {r['compress_us']:7.1f} us  descomprimir {r['decompress_us']:6.1f} us  "
+            f"ahorro con {args.clients} clientes {saved / 1024:8.1f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark del fan-out con K hilos emisores (`fanout_workers`).
+
+Con N clientes conectados (leídos por otro proceso), un cliente envía M
+mensajes a ritmo sostenido. Por cada K reporta:
+- fanout: tiempo del broadcaster por lote (métrica `fanout_ns`): con K > 0
+  solo encola y avisa a los shards; los envíos corren en los emisores.
+- cpu/msg: CPU del proceso servidor por mensaje difundido.
+- tiempo total hasta difundir los M mensajes.
+
+Con un solo núcleo los emisores no corren en paralelo entre sí: se ve el
+broadcaster liberado, no una mejora de throughput; con varios núcleos los
+envíos de distintos shards se solapan (el send libera el GIL).
+
+    python -m tests.perf.bench_fanout --clients 1000 2000 --workers 0 1 2 4
+"""
+
+import argparse
+import multiprocessing
+import selectors
+import socket
+import time
+
+from run_server import ENGINES
+
+
+def _drain(address, clients: int, ready, stop):
+    socks = [socket.create_connection(address) for _ in range(clients)]
+    sel = selectors.DefaultSelector()
+    for s in socks:
+        s.setblocking(False)
+        sel.register(s, selectors.EVENT_READ)
+    ready.set()
+    while not stop.is_set():
+        for key, _ in sel.select(timeout=0.1):
+            try:
+                key.fileobj.recv(1 << 16)
+            except OSError:
+                pass
+
+
+def run(engine: str, clients: int, workers: int, messages: int) -> dict:
+    srv = ENGINES[engine](
+        host="127.0.0.1", port=0, fanout_workers=workers, history_size=0,
+        max_queue_messages=0, listen_backlog=2048, batch_linger=0,
+    )
+    srv.start()
+    ctx = multiprocessing.get_context("spawn")
+    ready, stop = ctx.Event(), ctx.Event()
+    proc = ctx.Process(target=_drain, args=(srv.address, clients, ready, stop), daemon=True)
+    proc.start()
+    sender = None
+    try:
+        ready.wait(60.0)
+        while len(srv.clients) < clients:
+            time.sleep(0.01)
+        sender = socket.create_connection(srv.address)
+        cpu, wall = time.process_time(), time.perf_counter()
+        for i in range(messages):
+            sender.sendall(b"mensaje de prueba %d\n" % i)
+            if i % 20 == 0:
+                time.sleep(0.0005)  # ritmo sostenido: varios lotes
+        while srv.metrics.broadcast < messages:
+            time.sleep(0.005)
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        fanout = srv.metrics.fanout_ns.summary()
+    finally:
+        stop.set()
+        proc.join(timeout=5.0)
+        if sender is not None:
+            sender.close()
+        srv.stop()
+    return {
+        "fanout_avg_ms": fanout["avg"] / 1e6,
+        "fanout_p99_ms": fanout["p99"] / 1e6,
+        "cpu_per_msg_us": cpu / messages * 1e6,
+        "wall_s": wall,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--engine", choices=sorted(ENGINES), default="threads")
+    ap.add_argument("--clients", type=int, nargs="+", default=[1000, 2000])
+    ap.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    ap.add_argument("--messages", type=int, default=2000)
+    args = ap.parse_args(argv)
+    for clients in args.clients:
+        for workers in args.workers:
+            r = run(args.engine, clients, workers, args.messages)
+            print(
+                f"{args.engine:9s} {clients:6d} clientes K={workers}: "
+                f"fanout avg {r['fanout_avg_ms']:7.2f} ms p99 {r['fanout_p99_ms']:7.2f} ms  "
+                f"cpu/msg {r['cpu_per_msg_us']:6.1f} us  total {r['wall_s']:.2f} s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark del log durable: costo de `append` para el broadcaster, tiempo de
+escritura en disco, reapertura y lectura desde el medio (índice disperso +
+mmap) frente a recorrer todo desde el principio.
+
+    python -m tests.perf.bench_message_log --messages 1000000 --batch 64
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from src.message_log import MessageLog
+
+PAYLOAD = b"hola a todos, este es un mensaje de prueba de tamanio tipico"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--messages", type=int, default=1_000_000)
+    ap.add_argument("--batch", type=int, default=64, help="mensajes por lote (append)")
+    ap.add_argument("--segment-bytes", type=int, default=64 * 1024 * 1024)
+    ap.add_argument("--read", type=int, default=1000, help="mensajes leídos desde el medio")
+    args = ap.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="chatlog-")
+    try:
+        log = MessageLog(directory, segment_bytes=args.segment_bytes)
+        log.start()
+        batch = [(None, PAYLOAD)] * args.batch
+        start = time.perf_counter()
+        in_append = 0.0
+        for first in range(1, args.messages + 1, args.batch):
+            t0 = time.perf_counter()
+            log.append(first, batch[: min(args.batch, args.messages - first + 1)])
+            in_append += time.perf_counter() - t0
+        log.close()
+        write = time.perf_counter() - start
+
+        t0 = time.perf_counter()
+        log = MessageLog(directory, segment_bytes=args.segment_bytes)
+        reopen = time.perf_counter() - t0
+
+        middle = args.messages // 2
+        t0 = time.perf_counter()
+        got = log.read(middle, args.read)
+        indexed = time.perf_counter() - t0
+        assert got[0][0] == middle + 1
+
+        t0 = time.perf_counter()
+        full = log.read(0, args.messages)
+        scan = time.perf_counter() - t0
+        assert len(full) == args.messages
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"mensajes: {args.messages}  lote: {args.batch}  segmentos: {len(log.segments)}")
+    print(f"append (broadcaster): {in_append / args.messages * 1e9:8.0f} ns/mensaje")
+    print(f"escritura + fsync:    {args.messages / write:8.0f} mensajes/s")
+    print(f"reabrir:              {reopen * 1e3:8.1f} ms")
+    print(f"leer {args.read} desde el medio: {indexed * 1e3:8.2f} ms (índice disperso)")
+    print(f"leer todo:            {scan * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
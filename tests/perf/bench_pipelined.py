@@ -0,0 +1,63 @@
+"""
+Benchmark de la lectura: un cliente envía ráfagas de mensajes en un solo
+`sendall` (pipelining) y otro cliente cuenta lo que recibe. Mide mensajes/s
+de punta a punta por motor; muestra el efecto de separar todas las líneas
+de un recv de una vez y encolarlas al broadcaster como un único ítem.
+
+    python -m tests.perf.bench_pipelined --messages 200000 --burst 100
+"""
+
+import argparse
+import socket
+import threading
+import time
+
+from run_server import ENGINES
+
+
+def run(engine: str, messages: int, burst: int) -> float:
+    srv = ENGINES[engine](host="127.0.0.1", port=0, metrics=False, history_size=0)
+    srv.start()
+    sender = socket.create_connection(srv.address)
+    reader = socket.create_connection(srv.address)
+    try:
+        time.sleep(0.1)
+        chunk = b"".join(b"mensaje de prueba %d\n" % i for i in range(burst))
+        received = 0
+
+        def drain():
+            nonlocal received
+            reader.settimeout(10.0)
+            while received < messages:
+                data = reader.recv(1 << 16)
+                if not data:
+                    return
+                received += data.count(b"\n")
+
+        t = threading.Thread(target=drain)
+        start = time.perf_counter()
+        t.start()
+        for _ in range(messages // burst):
+            sender.sendall(chunk)
+        t.join()
+        elapsed = time.perf_counter() - start
+        return received / elapsed
+    finally:
+        sender.close(); reader.close()
+        srv.stop()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--engine", choices=sorted(ENGINES), nargs="+", default=sorted(ENGINES))
+    ap.add_argument("--messages", type=int, default=200_000)
+    ap.add_argument("--burst", type=int, default=100, help="mensajes por sendall")
+    args = ap.parse_args(argv)
+    messages = args.messages - args.messages % args.burst
+    for engine in args.engine:
+        rate = run(engine, messages, args.burst)
+        print(f"{engine:10s} ráfagas de {args.burst}: {rate:10.0f} mensajes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Microbenchmark del registro de clientes con 1k/10k clientes simulados.
+
+Compara la lista original (tuplas (sock, rf, wf), copia bajo lock en cada
+broadcast y `list.remove` con comparación de tuplas) con `ClientRegistry`
+(dict por identidad y snapshot copy-on-write).
+
+    python -m tests.perf.bench_registry --clients 1000 10000
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from src.registry import ClientRegistry
+
+
+class _Fake:
+    """Conexión simulada: solo importa la identidad."""
+
+    __slots__ = ()
+
+
+def _timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_list(n, repeat, removals):
+    clients = [(_Fake(), _Fake(), _Fake()) for _ in range(n)]
+    lock = threading.RLock()
+
+    def snapshot():
+        with lock:
+            list(clients)
+
+    snap = _timeit(snapshot, repeat)
+    victims = random.sample(clients, removals)
+    start = time.perf_counter()
+    for v in victims:
+        with lock:
+            clients.remove(v)
+    remove = (time.perf_counter() - start) / removals
+    return snap, remove
+
+
+def bench_registry(n, repeat, removals):
+    reg = ClientRegistry()
+    conns = [_Fake() for _ in range(n)]
+    for c in conns:
+        reg.add(c)
+    reg.snapshot()  # primera construcción fuera de la medición
+
+    snap = _timeit(reg.snapshot, repeat)
+    victims = random.sample(conns, removals)
+    start = time.perf_counter()
+    for v in victims:
+        reg.remove(v)
+    remove = (time.perf_counter() - start) / removals
+    return snap, remove
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--clients", type=int, nargs="+", default=[1000, 10000])
+    ap.add_argument("--repeat", type=int, default=2000, help="snapshots (broadcasts) medidos")
+    ap.add_argument("--removals", type=int, default=500)
+    args = ap.parse_args(argv)
+
+    print(f"{'clientes':>9} {'impl':>9} {'snapshot µs':>12} {'remove µs':>10}")
+    for n in args.clients:
+        for name, bench in (("list", bench_list), ("registry", bench_registry)):
+            snap, remove = bench(n, args.repeat, min(args.removals, n))
+            print(f"{n:>9} {name:>9} {snap * 1e6:>12.2f} {remove * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark del costo de los handshakes TLS, con y sin reanudación de sesión.
+
+Otro proceso abre N conexiones (en `--concurrency` hilos, como una tormenta
+de reconexiones) y cierra cada una apenas termina el handshake. Por modo:
+- plain: TCP sin TLS (referencia: accept + registro).
+- full: handshake completo (ECDHE + firma del certificado).
+- resumed: cada conexión presenta la sesión (ticket) de una conexión
+  anterior y se salta la firma y el intercambio de certificados.
+Reporta la latencia de connect + handshake vista por el cliente (avg/p99),
+conexiones por segundo, la CPU del proceso servidor por conexión y
+`tls_handshake_ns` del servidor (accept -> handshake completo).
+
+En TLS 1.3 la reanudación todavía hace ECDHE (psk_dhe_ke): se ahorra la
+firma y el certificado, no el intercambio de claves. Con `--tls-version 1.2`
+el cliente negocia TLS 1.2, donde la reanudación es abreviada (sin ECDHE).
+
+Con un solo núcleo cliente y servidor compiten por la CPU: la latencia
+incluye la del cliente; la CPU del servidor es solo suya.
+
+    python -m tests.perf.bench_tls --connections 2000 --concurrency 1 16
+    python -m tests.perf.bench_tls --tls-version 1.2
+"""
+
+import argparse
+import multiprocessing
+import socket
+import ssl
+import tempfile
+import threading
+import time
+
+from run_server import ENGINES
+from src.tls import generate_self_signed, make_client_context
+
+MODES = ("plain", "full", "resumed")
+VERSIONS = {"1.2": ssl.TLSVersion.TLSv1_2, "1.3": ssl.TLSVersion.TLSv1_3}
+
+
+def _storm(address, cafile, version, mode: str, connections: int, concurrency: int, results):
+    ctx = None
+    if mode != "plain":
+        ctx = make_client_context(cafile)
+        ctx.maximum_version = VERSIONS[version]
+    session = None
+    if mode == "resumed":
+        # TLS 1.3: el ticket llega después del handshake, con lo primero que se lee
+        with ctx.wrap_socket(socket.create_connection(address), server_hostname="localhost") as s:
+            s.sendall(b"PING\n")
+            s.recv(100)
+            session = s.session
+    latencies, reused = [], []
+
+    def worker(n: int):
+        for _ in range(n):
+            started = time.perf_counter()
+            s = socket.create_connection(address)
+            if ctx is not None:
+                s = ctx.wrap_socket(s, server_hostname="localhost", session=session)
+                reused.append(s.session_reused)
+            latencies.append(time.perf_counter() - started)
+            s.close()
+
+    per = [connections // concurrency + (i < connections % concurrency) for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(n,)) for n in per]
+    wall = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put((latencies, sum(reused), time.perf_counter() - wall))
+
+
+def run(
+    engine: str, mode: str, connections: int, concurrency: int, cert: tuple, version: str = "1.3"
+) -> dict:
+    tls = dict(tls_cert=cert[0], tls_key=cert[1]) if mode != "plain" else {}
+    srv = ENGINES[engine](host="127.0.0.1", port=0, history_size=0, listen_backlog=2048, **tls)
+    srv.start()
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(
+        target=_storm,
+        args=(srv.address, cert[0], version, mode, connections, concurrency, results),
+        daemon=True,
+    )
+    try:
+        # la conexión previa de "resumed" también cuenta como aceptada
+        expected = connections + (mode == "resumed")
+        cpu = time.process_time()
+        proc.start()
+        latencies, reused, wall = results.get(timeout=300.0)
+        while srv.metrics.accepted < expected or len(srv.clients):
+            time.sleep(0.005)
+        cpu = time.process_time() - cpu
+        handshake = srv.metrics.tls_handshake_ns.summary()
+        failed = srv.metrics.tls_failed
+    finally:
+        proc.join(timeout=5.0)
+        srv.stop()
+    latencies.sort()
+    return {
+        "avg_ms": sum(latencies) / len(latencies) * 1e3,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1e3,
+        "per_s": connections / wall,
+        "server_cpu_us": cpu / expected * 1e6,
+        "server_handshake_avg_ms": handshake["avg"] / 1e6,
+        "reused": reused,
+        "failed": failed,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--engine", choices=sorted(ENGINES), default="threads")
+    ap.add_argument("--connections", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    ap.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    ap.add_argument("--tls-version", choices=sorted(VERSIONS), default="1.3")
+    args = ap.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        cert = generate_self_signed(tmp)
+        for concurrency in args.concurrency:
+            for mode in args.modes:
+                r = run(args.engine, mode, args.connections, concurrency, cert, args.tls_version)
+                label = "TCP" if mode == "plain" else f"TLS {args.tls_version}"
+                print(
+                    f"{args.engine:9s} {label:7s} {mode:8s} x{concurrency:<3d}: "
+                    f"conexión avg {r['avg_ms']:6.2f} ms p99 {r['p99_ms']:6.2f} ms  "
+                    f"{r['per_s']:7.0f} conn/s  cpu servidor {r['server_cpu_us']:6.0f} us/conn  "
+                    f"handshake servidor {r['server_handshake_avg_ms']:6.2f} ms  "
+                    f"reanudadas {r['reused']}  fallidas {r['failed']}"
+                )
+
+
+if __name__ == "__main__":
+    main()
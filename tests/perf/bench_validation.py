@@ -0,0 +1,72 @@
+"""
+Benchmark de la validación: la función de texto de siempre (decodificar y
+`is_valid_message`) frente a `Validator.check` sobre los bytes y a
+`check_many` con un lote entero, para mensajes ASCII y no ASCII.
+
+    python -m tests.perf.bench_validation --messages 1000000 --batch 64
+"""
+
+import argparse
+import time
+
+from src.validation import Validator, is_valid_message
+
+SAMPLES = {
+    "ascii": b"hola a todos, este es un mensaje de prueba de tamanio tipico",
+    "utf8": "hola a todos, este es un mensaje de prueba de tamaño típico".encode(),
+}
+
+
+def _text(lines):
+    ok = 0
+    for raw in lines:
+        ok += is_valid_message(raw.decode("utf-8"))
+    return ok
+
+
+def _check(lines, validator):
+    check = validator.check
+    ok = 0
+    for raw in lines:
+        ok += check(raw)
+    return ok
+
+
+def _check_many(lines, validator, batch):
+    ok = 0
+    for i in range(0, len(lines), batch):
+        ok += sum(validator.check_many(lines[i:i + batch]))
+    return ok
+
+
+def _time(fn, *args) -> float:
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--messages", type=int, default=1_000_000)
+    ap.add_argument("--batch", type=int, default=64, help="mensajes por llamada a check_many")
+    args = ap.parse_args(argv)
+
+    validator = Validator()
+    strict = Validator(reject_control=True)
+    for name, sample in SAMPLES.items():
+        lines = [sample] * args.messages
+        results = {
+            "texto (decode + is_valid_message)": _time(_text, lines),
+            "Validator.check": _time(_check, lines, validator),
+            "Validator.check_many": _time(_check_many, lines, validator, args.batch),
+            "check_many + reject_control": _time(_check_many, lines, strict, args.batch),
+        }
+        base = results["texto (decode + is_valid_message)"]
+        print(f"{name} ({len(sample)} bytes, {args.messages} mensajes)")
+        for label, elapsed in results.items():
+            per = elapsed / args.messages * 1e9
+            print(f"  {label:36s} {per:6.0f} ns/mensaje  x{base / elapsed:4.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Generador de carga: levanta un servidor, abre N clientes, envía a M
+mensajes/s y reporta en JSON throughput, latencia extremo a extremo
+(p50/p99/p999) y memoria por conexión.
+
+El servidor corre en otro proceso (no comparte el GIL con el generador) y la
+memoria por conexión es la diferencia de RSS del servidor antes y después de
+conectar a los clientes (solo donde existe /proc).
+
+    python -m tests.perf.loadgen --engine selectors --clients 100 --rate 2000 --duration 5
+    python -m tests.perf.loadgen --output resultado.json
+"""
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import platform
+import selectors
+import socket
+import threading
+import time
+from pathlib import Path
+
+try:
+    import tomllib
+except ImportError:  # Python 3.10
+    tomllib = None
+
+from run_server import ENGINES
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def _serve(engine: str, options: dict, pipe):
+    srv = ENGINES[engine](host="127.0.0.1", port=0, **options)
+    srv.start()
+    pipe.send(srv.address)
+    pipe.recv()  # orden de parar
+    srv.stop()
+
+
+def _rss_bytes(pid: int) -> int | None:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentile(sorted_values: list, p: float) -> float | None:
+    if not sorted_values:
+        return None
+    k = max(0, math.ceil(p * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+class _Receiver(threading.Thread):
+    """Lee de todos los clientes y mide la latencia de cada línea recibida."""
+
+    def __init__(self, socks):
+        super().__init__(name="loadgen-recv", daemon=True)
+        self.sel = selectors.DefaultSelector()
+        for s in socks:
+            self.sel.register(s, selectors.EVENT_READ, bytearray())
+        self.latencies_ns: list = []
+        self.received = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        lat = self.latencies_ns
+        while not self.stop.is_set():
+            for key, _ in self.sel.select(timeout=0.05):
+                data = key.fileobj.recv(1 << 16)
+                if not data:
+                    self.sel.unregister(key.fileobj)
+                    continue
+                now = time.perf_counter_ns()
+                buf = key.data
+                buf += data
+                *lines, rest = buf.split(b"\n")
+                buf[:] = rest
+                for line in lines:
+                    # "<enviado_ns> <seq> <relleno>"
+                    sent_ns = int(line.split(b" ", 1)[0])
+                    lat.append(now - sent_ns)
+                self.received += len(lines)
+
+
+def run_load(
+    engine: str = "threads",
+    clients: int = 10,
+    rate: float = 1000.0,
+    duration: float = 2.0,
+    size: int = 64,
+    drain: float = 5.0,
+    **server_options,
+) -> dict:
+    """Corre una medición y devuelve el reporte como dict (serializable a JSON)."""
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=_serve, args=(engine, server_options, child), daemon=True)
+    proc.start()
+    socks = []
+    try:
+        addr = parent.recv()
+        time.sleep(0.1)
+        rss_before = _rss_bytes(proc.pid)
+
+        socks = [socket.create_connection(addr, timeout=5.0) for _ in range(clients)]
+        for s in socks:
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        time.sleep(0.2)
+        rss_after = _rss_bytes(proc.pid)
+
+        receiver = _Receiver(socks)
+        receiver.start()
+
+        total = int(rate * duration)
+        senders = itertools.cycle(socks)
+        start = time.perf_counter()
+        sent = 0
+        while sent < total:
+            due = min(total, int((time.perf_counter() - start) * rate) + 1)
+            while sent < due:
+                head = f"{time.perf_counter_ns()} {sent} ".encode()
+                line = head + b"x" * max(1, size - len(head)) + b"\n"
+                next(senders).sendall(line)
+                sent += 1
+            time.sleep(0.001)
+        send_elapsed = time.perf_counter() - start
+
+        expected = sent * clients
+        deadline = time.perf_counter() + drain
+        while receiver.received < expected and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        receiver.stop.set()
+        receiver.join(timeout=1.0)
+    finally:
+        for s in socks:
+            s.close()
+        parent.send("stop")
+        proc.join(timeout=5.0)
+        if proc.is_alive():
+            proc.kill()
+
+    lat = sorted(receiver.latencies_ns)
+    mem = None
+    if rss_before is not None and rss_after is not None and clients:
+        mem = (rss_after - rss_before) // clients
+    return {
+        "version": _version(),
+        "python": platform.python_version(),
+        "engine": engine,
+        "clients": clients,
+        "rate": rate,
+        "duration": duration,
+        "size": size,
+        "sent": sent,
+        "expected": expected,
+        "received": receiver.received,
+        "send_rate": round(sent / send_elapsed, 1),
+        "throughput": round(receiver.received / elapsed, 1),
+        "latency_ms": {
+            "p50": _ms(percentile(lat, 0.50)),
+            "p99": _ms(percentile(lat, 0.99)),
+            "p999": _ms(percentile(lat, 0.999)),
+            "max": _ms(lat[-1] if lat else None),
+        },
+        "memory_per_conn_bytes": mem,
+    }
+
+
+def _ms(ns: int | None) -> float | None:
+    return None if ns is None else round(ns / 1e6, 3)
+
+
+def _version() -> str | None:
+    if tomllib is None:
+        return None
+    with open(ROOT / "pyproject.toml", "rb") as f:
+        return tomllib.load(f)["project"]["version"]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generador de carga del servidor de chat")
+    ap.add_argument("--engine", choices=sorted(ENGINES), default="threads")
+    ap.add_argument("--clients", type=int, default=10)
+    ap.add_argument("--rate", type=float, default=1000.0, help="mensajes por segundo (total)")
+    ap.add_argument("--duration", type=float, default=2.0, help="segundos enviando")
+    ap.add_argument("--size", type=int, default=64, help="bytes por mensaje")
+    ap.add_argument("--output", help="archivo JSON (por defecto: stdout)")
+    args = ap.parse_args(argv)
+
+    report = run_load(
+        engine=args.engine, clients=args.clients, rate=args.rate,
+        duration=args.duration, size=args.size,
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
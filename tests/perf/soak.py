@@ -0,0 +1,343 @@
+"""
+Soak / caos: rondas de clientes abusivos contra un servidor en otro proceso,
+midiendo sus recursos entre ronda y ronda para detectar fugas.
+
+Cada ronda, además de un cliente que habla y otro que lee (y verifica que
+le llegue todo), abre:
+- tormenta: conexiones que se abren y se cierran enseguida (la mitad con
+  RST, SO_LINGER 0), algunas después de enviar un mensaje;
+- líneas parciales: envían bytes sin '\\n' y cortan con RST o cierran solo
+  su lado de escritura (semicerradas, sin cerrar del todo);
+- no lectores: buffer de recepción chico y nunca leen mientras el que habla
+  llena sus colas (el servidor debe desconectarlos como consumidores lentos);
+- semiabiertas: conectan y no envían ni cierran nunca (como un cliente que
+  desapareció; el servidor las cierra por `idle_timeout`).
+
+Al terminar la ronda se espera a que el servidor vuelva a tener solo los dos
+clientes fijos y `msg_q` vacía, y se toma una muestra de fds abiertos, hilos,
+RSS, profundidad de `msg_q` y clientes registrados. Después de las rondas de
+calentamiento ninguna serie puede crecer más que su margen (`find_leaks`);
+si crece, el reporte sale con `ok: false` y el proceso termina con código 1.
+
+    python -m tests.perf.soak --engine threads --rounds 20 --clients 2000
+    python -m tests.perf.soak --engine selectors --output soak.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+
+from run_server import ENGINES
+
+# El servidor del soak: colas chicas (los no lectores se desconectan rápido),
+# backlog para las tormentas y cierre de conexiones mudas
+SERVER_OPTIONS = dict(
+    idle_timeout=1.0,
+    max_queue_bytes=64 * 1024,
+    listen_backlog=1024,
+    history_size=0,
+)
+# Márgenes por serie (crecimiento tolerado entre el fin del calentamiento y
+# la última ronda)
+FD_SLACK = 8
+THREAD_SLACK = 4
+RSS_SLACK = 32 << 20
+# Lo que debería volver exacto a su valor al asentarse
+EXACT = ("msg_q", "clients")
+SERIES = ("fds", "threads", "rss", "msg_q", "clients")
+# Mensajes del que habla por ronda (llenan las colas de los no lectores),
+# en tandas que esperan al lector: los fijos no deben desbordar la suya
+TALK_MESSAGES = 1000
+TALK_CHUNK = 100
+TALK_PAD = 200  # bajo el largo máximo de mensaje (256)
+KEEPALIVE_EVERY = 0.3
+_LINGER_RST = struct.pack("ii", 1, 0)
+
+
+# -------- proceso del servidor --------
+
+def _proc_status(field: str) -> int | None:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _open_fds() -> int | None:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def _serve(engine: str, options: dict, pipe):
+    srv = ENGINES[engine](host="127.0.0.1", port=0, **options)
+    srv.start()
+    pipe.send(srv.address)
+    while pipe.recv() == "sample":
+        pipe.send({
+            "fds": _open_fds(),
+            "threads": threading.active_count(),
+            "rss": _proc_status("VmRSS:"),
+            "msg_q": srv.msg_q.qsize(),
+            "clients": len(srv.clients),
+        })
+    srv.stop()
+
+
+# -------- clientes fijos --------
+
+class _Reader(threading.Thread):
+    """Lee todo lo difundido y cuenta los mensajes del que habla."""
+
+    def __init__(self, sock: socket.socket):
+        super().__init__(name="soak-reader", daemon=True)
+        self.sock = sock
+        self.received = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        buf = b""
+        self.sock.settimeout(0.1)
+        while not self.stop.is_set():
+            try:
+                data = self.sock.recv(1 << 16)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            if not data:
+                return
+            buf += data
+            *lines, buf = buf.split(b"\n")
+            self.received += sum(1 for line in lines if line.startswith(b"soak "))
+
+
+# -------- patrones de caos --------
+
+def _connect(addr, rcvbuf: int = 0) -> socket.socket:
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if rcvbuf:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    s.settimeout(5.0)
+    s.connect(addr)
+    return s
+
+
+def _reset(s: socket.socket):
+    """Cierre abrupto: RST en lugar de FIN."""
+    try:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RST)
+    except OSError:
+        pass
+    s.close()
+
+
+def _chaos(addr, n: int, rng: random.Random) -> list:
+    """Una ronda de clientes abusivos; devuelve los que quedan abiertos."""
+    held = []
+    # tormenta de conexiones
+    for i in range(n):
+        s = _connect(addr)
+        if i % 3 == 0:
+            s.sendall(b"hola y chau\n")
+        _reset(s) if i % 2 else s.close()
+    quarter = max(1, n // 4)
+    # líneas parciales
+    for i in range(quarter):
+        s = _connect(addr)
+        s.sendall(b"x" * rng.randint(1, 4000))
+        if i % 2:
+            _reset(s)
+        else:
+            s.shutdown(socket.SHUT_WR)
+            held.append(s)
+    # no lectores y semiabiertas
+    held += [_connect(addr, rcvbuf=4096) for _ in range(quarter)]
+    held += [_connect(addr) for _ in range(quarter)]
+    return held
+
+
+# -------- control --------
+
+def find_leaks(
+    samples: list,
+    warmup: int,
+    slack: dict | None = None,
+) -> list:
+    """
+    Series que crecen sin cota después del calentamiento: la última muestra
+    supera a la primera en más que el margen y la segunda mitad, en promedio,
+    está por encima de la primera (no es un pico aislado). Las series
+    `EXACT` deben volver a su valor inicial.
+    """
+    slack = {
+        "fds": FD_SLACK, "threads": THREAD_SLACK, "rss": RSS_SLACK,
+        **{name: 0 for name in EXACT}, **(slack or {}),
+    }
+    leaks = []
+    for name in SERIES:
+        values = [s[name] for s in samples[warmup:] if s.get(name) is not None]
+        if len(values) < 2:
+            continue
+        first, last = values[0], values[-1]
+        if name in EXACT:
+            if last > first + slack[name]:
+                leaks.append(f"{name}: {first} -> {last}")
+            continue
+        half = len(values) // 2
+        early = sum(values[:half]) / half
+        late = sum(values[half:]) / (len(values) - half)
+        if last - first > slack[name] and late > early:
+            leaks.append(f"{name}: {first} -> {last} (margen {slack[name]})")
+    return leaks
+
+
+def _keepalive(socks, stop: threading.Event, lock: threading.Lock):
+    # los fijos no pueden quedar mudos frente a idle_timeout
+    while not stop.wait(KEEPALIVE_EVERY):
+        for s in socks:
+            with lock:
+                try:
+                    s.sendall(b"PING\n")
+                except OSError:
+                    return
+
+
+def _settle(pipe, base_clients: int, timeout: float) -> dict:
+    """Espera a que el servidor suelte lo de la ronda y devuelve una muestra."""
+    deadline = time.monotonic() + timeout
+    while True:
+        now = time.monotonic()
+        pipe.send("sample")
+        sample = pipe.recv()
+        if sample["clients"] <= base_clients and sample["msg_q"] == 0 or now >= deadline:
+            break
+        time.sleep(0.05)
+    time.sleep(0.2)  # que terminen de salir los hilos de lo que se cerró
+    pipe.send("sample")
+    return pipe.recv()
+
+
+def run_soak(
+    engine: str = "threads",
+    rounds: int = 10,
+    clients: int = 1000,
+    warmup: int = 2,
+    seed: int = 1,
+    **server_options,
+) -> dict:
+    """Corre el soak y devuelve el reporte (serializable a JSON)."""
+    options = {**SERVER_OPTIONS, **server_options}
+    settle_timeout = 3 * options["idle_timeout"] + 5.0
+    rng = random.Random(seed)
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=_serve, args=(engine, options, child), daemon=True)
+    proc.start()
+    talker = reader = rx = echo = None
+    stop_pings = threading.Event()
+    samples, peak_q, missing = [], 0, 0
+    started = time.perf_counter()
+    try:
+        addr = parent.recv()
+        talker, reader = _connect(addr), _connect(addr)
+        rx = _Reader(reader)
+        rx.start()
+        # el que habla también recibe lo difundido: si no lee, es un no lector
+        echo = _Reader(talker)
+        echo.start()
+        send_lock = threading.Lock()
+        threading.Thread(
+            target=_keepalive, args=((talker, reader), stop_pings, send_lock),
+            name="soak-keepalive", daemon=True,
+        ).start()
+
+        samples.append(_settle(parent, 2, settle_timeout))
+        pad = b"p" * TALK_PAD
+        for r in range(rounds):
+            held = _chaos(addr, clients, rng)
+            before = rx.received
+            for start in range(0, TALK_MESSAGES, TALK_CHUNK):
+                with send_lock:
+                    talker.sendall(b"".join(
+                        b"soak %d %d %s\n" % (r, i, pad)
+                        for i in range(start, start + TALK_CHUNK)
+                    ))
+                parent.send("sample")
+                peak_q = max(peak_q, parent.recv()["msg_q"])
+                deadline = time.monotonic() + 5.0
+                while rx.received - before < start + TALK_CHUNK and time.monotonic() < deadline:
+                    time.sleep(0.005)
+            missing += TALK_MESSAGES - (rx.received - before)
+            sample = _settle(parent, 2, settle_timeout)
+            # lo que queda de la ronda ya no cuenta para el servidor
+            for s in held:
+                _reset(s)
+            sample["round"] = r + 1
+            samples.append(sample)
+    finally:
+        stop_pings.set()
+        for t in (rx, echo):
+            if t is not None:
+                t.stop.set()
+                t.join(timeout=1.0)
+        for s in (talker, reader):
+            if s is not None:
+                s.close()
+        try:
+            parent.send("stop")
+        except OSError:
+            pass
+        proc.join(timeout=10.0)
+        if proc.is_alive():
+            proc.kill()
+
+    # el calentamiento cuenta la muestra inicial (antes de la primera ronda)
+    leaks = find_leaks(samples, min(warmup, max(0, len(samples) - 2)))
+    if missing:
+        leaks.append(f"delivery: {missing} mensajes no llegaron al lector")
+    return {
+        "engine": engine,
+        "rounds": rounds,
+        "clients_per_round": clients,
+        "elapsed_s": round(time.perf_counter() - started, 2),
+        "peak_msg_q": peak_q,
+        "samples": samples,
+        "leaks": leaks,
+        "ok": not leaks,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--engine", choices=sorted(ENGINES), default="threads")
+    ap.add_argument("--rounds", type=int, default=10)
+    ap.add_argument("--clients", type=int, default=1000, help="conexiones de la tormenta por ronda")
+    ap.add_argument("--warmup", type=int, default=2, help="rondas que no cuentan para las fugas")
+    ap.add_argument("--output", help="archivo JSON (por defecto: stdout)")
+    args = ap.parse_args(argv)
+    report = run_soak(args.engine, args.rounds, args.clients, args.warmup)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    for leak in report["leaks"]:
+        print(f"[soak] FUGA {leak}", file=sys.stderr)
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+from tests.perf.loadgen import percentile, run_load
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 1001))
+    assert percentile(values, 0.50) == 500
+    assert percentile(values, 0.99) == 990
+    assert percentile(values, 0.999) == 999
+    assert percentile([], 0.5) is None
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("engine", ["threads", "selectors"])
+def test_load_report_delivers_everything(engine):
+    report = run_load(engine=engine, clients=5, rate=500, duration=0.5)
+    json.dumps(report)  # debe poder guardarse como JSON
+    assert report["sent"] == 250
+    assert report["received"] == report["expected"] == 250 * 5
+    lat = report["latency_ms"]
+    assert 0 < lat["p50"] <= lat["p99"] <= lat["p999"] <= lat["max"]
+    assert report["throughput"] > 0
@@ -0,0 +1,31 @@
+import pytest
+
+from tests.perf.soak import find_leaks, run_soak
+
+
+def _samples(**series):
+    n = len(next(iter(series.values())))
+    return [{name: values[i] for name, values in series.items()} for i in range(n)]
+
+
+def test_find_leaks_flags_steady_growth_only():
+    flat = _samples(fds=[20, 21, 20, 21, 20], threads=[7] * 5, msg_q=[0] * 5)
+    assert find_leaks(flat, warmup=0) == []
+    # un pico que se recupera no es una fuga
+    spike = _samples(fds=[20, 60, 21, 20, 22], threads=[7] * 5, msg_q=[0] * 5)
+    assert find_leaks(spike, warmup=0) == []
+    growing = _samples(fds=[20, 30, 40, 50, 60], threads=[7, 9, 11, 13, 15], msg_q=[0, 0, 0, 0, 3])
+    leaks = find_leaks(growing, warmup=0)
+    assert [leak.split(":")[0] for leak in leaks] == ["fds", "threads", "msg_q"]
+    # el calentamiento no cuenta; sin /proc la serie se omite
+    warm = _samples(fds=[20, 80, 80, 81], threads=[None] * 4)
+    assert find_leaks(warm, warmup=1) == []
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("engine", ["threads", "selectors"])
+def test_short_soak_has_no_leaks(engine):
+    report = run_soak(engine=engine, rounds=3, clients=100, warmup=1, idle_timeout=0.5)
+    assert report["leaks"] == []
+    assert report["ok"] and len(report["samples"]) == 4
+    assert all(s["clients"] == 2 and s["msg_q"] == 0 for s in report["samples"])
@@ -0,0 +1,56 @@
+import socket
+
+from src.bus import LocalBus, RelayBus, decode_line, encode_batch
+from tests.helpers import wait_for
+
+
+def test_wire_format_round_trip():
+    batch = [(None, b"hola"), ("#sala", b"#sala chau")]
+    data = encode_batch(batch)
+    assert data == b"*hola\n@#sala chau\n"
+    assert [decode_line(line) for line in data.split(b"\n")[:-1]] == batch
+
+
+def test_local_bus_delivers_in_the_publishing_thread():
+    got = []
+    bus = LocalBus()
+    bus.start(got.append)
+    bus.publish([(None, b"x")])
+    assert got == [[(None, b"x")]]
+
+
+def test_relay_delivers_locally_and_to_peers():
+    a, b = RelayBus(), RelayBus()
+    a.add_peer(b.address)
+    b.add_peer(a.address)
+    got_a, got_b = [], []
+    a.start(got_a.extend)
+    b.start(got_b.extend)
+    try:
+        a.publish([(None, b"de a")])
+        b.publish([("#s", b"#s de b")])
+        assert wait_for(lambda: len(got_a) == 2 and len(got_b) == 2)
+        # lo propio se entrega primero y nada vuelve a rebotar
+        assert got_a == [(None, b"de a"), ("#s", b"#s de b")]
+        assert got_b == [("#s", b"#s de b"), (None, b"de a")]
+    finally:
+        a.close(); b.close()
+
+
+def test_relay_queue_per_peer_is_bounded_and_drops_oldest():
+    # un par que acepta pero nunca lee: la cola hacia él no crece sin límite
+    sink = socket.socket()
+    sink.bind(("127.0.0.1", 0))
+    sink.listen(1)
+    bus = RelayBus(peers=[sink.getsockname()], max_queue_bytes=64 * 1024)
+    bus.start(lambda batch: None)
+    try:
+        payload = b"x" * 1000
+        for _ in range(20_000):  # ~20 MB: mucho más que los buffers del kernel
+            bus.publish([(None, payload)])
+        peer = bus.peers[sink.getsockname()]
+        assert peer.outq.nbytes <= 64 * 1024
+        assert wait_for(lambda: bus.dropped > 0)
+    finally:
+        bus.close()
+        sink.close()
@@ -0,0 +1,93 @@
+import asyncio
+
+from src.client import ChatClient, is_reply
+from src.protocol import FRAME_CMD, FRAME_DM, FRAME_MSG, FrameReader, encode_frame
+
+
+def _negotiated(**kwargs) -> ChatClient:
+    # cliente con "OK BINARY" ya recibido
+    c = ChatClient("127.0.0.1", 0, **kwargs)
+    c._frames = FrameReader()
+    return c
+
+
+def _frames(*items) -> bytes:
+    return b"".join(encode_frame(ftype, text.encode()) for ftype, text in items)
+
+
+def test_lines_are_split_per_recv_and_replies_recognized():
+    c = ChatClient("127.0.0.1", 0)
+    c._on_data(b"hola\nOK JOIN #a\nme")
+    c._on_data(b"dio\n")
+    assert list(c._received) == ["hola", "OK JOIN #a", "medio"]
+    assert is_reply("END") and is_reply("STAT clients 1") and not is_reply("ENDING")
+
+
+def test_resume_block_skips_seen_history_and_live_duplicates():
+    c = _negotiated(reconnect=True)
+    c.last_seq = 3
+    c._blocks.append("resume")
+    c._resuming = True
+    # "x" llegó en vivo antes del END: ya viene en el bloque HIST
+    c._on_data(_frames(
+        (FRAME_MSG, "x"), (FRAME_CMD, "HIST 3 visto"), (FRAME_CMD, "HIST 4 x"),
+        (FRAME_CMD, "END 4"), (FRAME_MSG, "vivo"),
+    ))
+    assert list(c._received) == ["x", "vivo"]
+    assert c.last_seq == 5
+
+
+def test_frames_right_after_ok_binary_are_not_lost():
+    async def body():
+        c = ChatClient("127.0.0.1", 0, binary=True)
+        c._hello = asyncio.get_running_loop().create_future()
+        c._on_data(
+            b"antes\nOK BINARY\n"
+            + encode_frame(FRAME_MSG, "después".encode())
+            + encode_frame(FRAME_CMD, b"PONG")
+        )
+        assert c._hello.done()
+        return list(c._received)
+
+    assert asyncio.run(body()) == ["antes", "después", "PONG"]
+
+
+def test_direct_messages_do_not_advance_the_sequence():
+    c = _negotiated(reconnect=True)
+    c.last_seq = 7
+    c._on_data(_frames((FRAME_DM, "MSG ana hola"), (FRAME_MSG, "difundido")))
+    assert list(c._received) == ["MSG ana hola", "difundido"]
+    assert c.last_seq == 8
+
+
+def test_reconnect_implies_binary_so_broadcasts_cannot_pose_as_replies():
+    c = _negotiated(reconnect=True)
+    assert c.binary
+    c.last_seq = 2
+    c._blocks.append("resume")
+    # difundidos que imitan respuestas: no cierran el bloque ni fijan la secuencia
+    c._on_data(_frames((FRAME_MSG, "END 99999"), (FRAME_MSG, "OK genial"), (FRAME_CMD, "END 4")))
+    assert list(c._received) == ["END 99999", "OK genial"]
+    assert c.last_seq == 4 and not c._blocks
+    # ni uno directo: "MSG ..." difundido cuenta como cualquier otro
+    c._on_data(_frames((FRAME_MSG, "MSG ana falso")))
+    assert c.last_seq == 5
+
+
+def test_more_continues_the_resume_with_another_since():
+    c = _negotiated(reconnect=True)
+    sent = []
+    c._write = sent.append
+    c.last_seq = 1
+    c._blocks.append("resume")
+    c._resuming = True
+    c._on_data(_frames(
+        (FRAME_MSG, "en vivo"), (FRAME_CMD, "HIST 2 b"), (FRAME_CMD, "HIST 3 c"),
+        (FRAME_CMD, "MORE 3"),
+    ))
+    # el bloque sigue abierto: lo en vivo lo trae el próximo SINCE
+    assert sent == [encode_frame(FRAME_CMD, b"SINCE 3")]
+    assert c.last_seq == 3 and c._blocks
+    c._on_data(_frames((FRAME_CMD, "HIST 4 en vivo"), (FRAME_CMD, "END 4"), (FRAME_MSG, "nuevo")))
+    assert list(c._received) == ["b", "c", "en vivo", "nuevo"]
+    assert c.last_seq == 5 and not c._blocks
@@ -0,0 +1,45 @@
+import socket
+import threading
+
+from src.cluster import HubBus, relay
+
+
+def test_relay_forwards_whole_lines_to_every_worker():
+    pairs = [socket.socketpair() for _ in range(2)]
+    hub_ends = [h for h, _ in pairs]
+    stop = threading.Event()
+    t = threading.Thread(target=relay, args=(hub_ends, stop, 0.05))
+    t.start()
+    try:
+        w0, w1 = pairs[0][1], pairs[1][1]
+        w0.sendall(b"uno\ndo")  # la línea incompleta no se reenvía todavía
+        w0.sendall(b"s\n")
+        for w in (w0, w1):
+            w.settimeout(1.0)
+            got = b""
+            while got.count(b"\n") < 2:
+                got += w.recv(100)
+            assert got == b"uno\ndos\n"
+    finally:
+        stop.set()
+        t.join(timeout=1.0)
+        for a, b in pairs:
+            a.close(); b.close()
+
+
+def test_hub_bus_publishes_and_delivers_batches():
+    a, b = socket.socketpair()
+    got = []
+    closed = threading.Event()
+    bus = HubBus(a, on_close=closed.set)
+    bus.start(got.append)
+    try:
+        bus.publish([(None, b"hola"), ("#sala", b"#sala chau")])
+        b.settimeout(1.0)
+        assert b.recv(100) == b"*hola\n@#sala chau\n"
+        b.sendall(b"*x\n@#s y\n")
+        b.close()
+        assert closed.wait(1.0)
+        assert got == [[(None, b"x"), ("#s", b"#s y")]]
+    finally:
+        bus.close()
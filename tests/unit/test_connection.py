@@ -0,0 +1,128 @@
+import socket
+
+import pytest
+
+from src.connection import (
+    Connection,
+    OutboundQueue,
+    DROP_NEWEST,
+    DROP_OLDEST,
+    DISCONNECT,
+)
+
+
+def test_queue_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        OutboundQueue(policy="ignore")
+
+
+def test_drop_newest_keeps_old_messages():
+    q = OutboundQueue(max_bytes=0, max_messages=2, policy=DROP_NEWEST)
+    assert q.push(b"a\n") and q.push(b"b\n") and q.push(b"c\n")
+    assert q.dropped == 1
+    assert q.pop_batch() == [b"a\n", b"b\n"]
+
+
+def test_drop_oldest_makes_room_by_bytes():
+    q = OutboundQueue(max_bytes=6, max_messages=0, policy=DROP_OLDEST)
+    for m in (b"uno\n", b"dos\n", b"tres\n"):
+        assert q.push(m)
+    assert q.dropped == 2
+    assert q.nbytes == 5
+    assert q.pop_batch() == [b"tres\n"]
+    assert q.pop_batch() == []
+
+
+def test_disconnect_policy_flags_overflow():
+    q = OutboundQueue(max_bytes=0, max_messages=1, policy=DISCONNECT)
+    assert q.push(b"a\n") is True
+    assert q.push(b"b\n") is False
+    assert q.overflowed
+    # una vez desbordada no acepta nada más
+    q.pop_batch()
+    assert q.push(b"c\n") is False
+
+
+def test_empty_queue_accepts_a_batch_over_the_limit():
+    for policy in (DISCONNECT, DROP_NEWEST, DROP_OLDEST):
+        q = OutboundQueue(max_bytes=10, max_messages=2, policy=policy)
+        assert q.push(b"x\n" * 300, count=300) is True
+        assert not q.overflowed and q.dropped == 0
+        # el siguiente sí cuenta contra lo que quedó esperando
+        assert q.push(b"y\n") is (policy != DISCONNECT)
+
+
+def test_pop_batch_respects_limit_with_whole_messages():
+    q = OutboundQueue(max_bytes=0, max_messages=0)
+    for _ in range(10):
+        q.push(b"x" * 10)
+    assert q.pop_batch(limit=35) == [b"x" * 10] * 3
+    assert q.nbytes == 70
+
+
+def test_connection_flush_keeps_partial_send_until_writable():
+    a, b = socket.socketpair()
+    try:
+        a.setblocking(False)
+        conn = Connection(a, OutboundQueue(max_bytes=0, max_messages=0))
+        payload = b"z" * 4096
+        for _ in range(1024):  # 4 MiB: más de lo que entra en el buffer del kernel
+            conn.outq.push(payload)
+        assert conn.flush() is False
+        assert conn.pending or len(conn.outq) > 0
+
+        # el peer lee todo y el resto termina de salir
+        b.settimeout(2.0)
+        received = 0
+        while received < 4 * 1024 * 1024:
+            received += len(b.recv(1 << 20))
+            conn.flush()
+        assert conn.flush() is True
+        assert received == 4 * 1024 * 1024
+    finally:
+        a.close(); b.close()
+
+
+def test_broadcast_shares_one_encoded_buffer():
+    from src.server import ChatServer
+
+    srv = ChatServer()
+    conns = [Connection(socket.socket(), OutboundQueue()) for _ in range(3)]
+    try:
+        for c in conns:
+            srv.clients.add(c)
+        srv._deliver = lambda _conns: None  # solo interesa lo encolado
+        srv.broadcast("hola")
+        batches = [c.outq.pop_batch() for c in conns]
+        assert batches[0] == [b"hola\n"]
+        # el mismo objeto en todas las colas: codificado una sola vez
+        assert all(b[0] is batches[0][0] for b in batches)
+    finally:
+        for c in conns:
+            c.sock.close()
+
+
+def test_coalesced_push_counts_every_message():
+    q = OutboundQueue(max_bytes=0, max_messages=4, policy=DROP_OLDEST)
+    assert q.push(b"a\nb\nc\n", 3)
+    assert q.push(b"d\ne\n", 2)  # 5 > 4: se descarta el lote viejo entero
+    assert q.dropped == 3
+    assert q.nmessages == 2
+    assert q.pop_batch() == [b"d\ne\n"]
+    assert q.nmessages == 0
+
+
+def test_feed_from_reused_buffer_keeps_only_the_partial_line():
+    a, b = socket.socketpair()
+    try:
+        conn = Connection(a, OutboundQueue(max_bytes=0, max_messages=0))
+        rx = bytearray(16)
+        rx[:11] = b"uno\ndos\ntr"
+        assert conn.feed(rx, 10) == [b"uno", b"dos"]
+        assert conn.inbuf == b"tr"
+        rx[:6] = b"es\nc\n?"  # el buffer se reutiliza: lo anterior no importa
+        assert conn.feed(rx, 5) == [b"tres", b"c"]
+        assert conn.inbuf == b""
+        assert conn.feed(rx, 0) == []
+    finally:
+        a.close(); b.close()
@@ -0,0 +1,84 @@
+import socket
+import threading
+import time
+
+from src.event_server import EventChatServer
+
+
+def _connect(addr):
+    s = socket.create_connection(addr, timeout=2.0)
+    rf = s.makefile("r", encoding="utf-8", newline="\n")
+    wf = s.makefile("w", encoding="utf-8", newline="\n")
+    return s, rf, wf
+
+
+def test_event_server_start_stop_and_broadcast_noop():
+    srv = EventChatServer(host="127.0.0.1", port=0)
+    srv.start()
+    try:
+        srv.broadcast("ping")
+        host, port = srv.address
+        assert host == "127.0.0.1"
+        assert port > 0
+    finally:
+        srv.stop()
+
+
+def test_event_server_broadcast_removes_dead_clients():
+    srv = EventChatServer(host="127.0.0.1", port=0)
+    srv.start()
+    try:
+        s, rf, wf = _connect(srv.address)
+        rf.close(); wf.close(); s.close()
+        time.sleep(0.05)
+        srv.broadcast("hola")
+        srv.broadcast("otra")
+        deadline = time.time() + 1.0
+        while srv.clients and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(srv.clients) == 0
+    finally:
+        srv.stop()
+
+
+def test_event_server_uses_single_io_thread_for_many_clients():
+    srv = EventChatServer(host="127.0.0.1", port=0)
+    srv.start()
+    conns = []
+    try:
+        before = threading.active_count()
+        conns = [_connect(srv.address) for _ in range(50)]
+        deadline = time.time() + 2.0
+        while len(srv.clients) < 50 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(srv.clients) == 50
+        # sin hilos nuevos por cliente
+        assert threading.active_count() == before
+
+        s, rf, wf = conns[0]
+        wf.write("hola a todos\n"); wf.flush()
+        for _, r, _ in conns:
+            assert r.readline() == "hola a todos\n"
+    finally:
+        for s, r, w in conns:
+            try: r.close(); w.close(); s.close()
+            except: pass
+        srv.stop()
+
+
+def test_event_server_handles_pipelined_and_partial_lines():
+    srv = EventChatServer(host="127.0.0.1", port=0)
+    srv.start()
+    try:
+        s, rf, wf = _connect(srv.address)
+        time.sleep(0.05)
+        s.sendall(b"uno\ndo")
+        time.sleep(0.05)
+        s.sendall(b"s\n   \n")
+        assert rf.readline() == "uno\n"
+        # el ERR va directo al emisor, los mensajes pasan por el broadcaster
+        got = {rf.readline(), rf.readline()}
+        assert got == {"dos\n", "ERR Invalid message\n"}
+        rf.close(); wf.close(); s.close()
+    finally:
+        srv.stop()
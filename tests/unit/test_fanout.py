@@ -0,0 +1,61 @@
+import socket
+import threading
+
+from src.connection import Connection, OutboundQueue
+from src.fanout import SenderShard
+from tests.helpers import wait_for
+
+
+def _conn():
+    return Connection(socket.socket(), OutboundQueue())
+
+
+def test_flush_all_delivers_members_and_flush_only_pending():
+    calls = []
+    lock = threading.Lock()
+
+    def deliver(conns):
+        with lock:
+            calls.append(set(conns))
+
+    shard = SenderShard(0, deliver)
+    a, b, c = _conn(), _conn(), _conn()
+    try:
+        shard.members.add(a); shard.members.add(b)
+        shard.start()
+        shard.flush_all()
+        assert wait_for(lambda: calls == [{a, b}])
+        shard.flush([c])
+        assert wait_for(lambda: len(calls) == 2)
+        assert calls[1] == {c}
+    finally:
+        shard.close()
+        for conn in (a, b, c):
+            conn.sock.close()
+    assert shard.thread is None
+
+
+def test_pending_signals_coalesce_while_busy():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def deliver(conns):
+        calls.append(set(conns))
+        started.set()
+        release.wait(2.0)
+
+    shard = SenderShard(1, deliver)
+    a, b = _conn(), _conn()
+    try:
+        shard.start()
+        shard.flush([a])
+        assert started.wait(2.0)
+        # el emisor está ocupado: los dos avisos salen juntos
+        shard.flush([a]); shard.flush([b])
+        release.set()
+        assert wait_for(lambda: len(calls) == 2)
+        assert calls[1] == {a, b}
+    finally:
+        release.set()
+        shard.close()
+        a.sock.close(); b.sock.close()
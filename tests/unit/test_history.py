@@ -0,0 +1,22 @@
+import pytest
+
+from src.history import History
+
+
+def test_ring_buffer_keeps_last_entries_with_sequence_numbers():
+    h = History(3)
+    assert h.last_seq == 0 and h.since(0) == []
+    h.extend([(None, b"a"), ("#x", b"#x b")])
+    assert h.since(0) == [(1, None, b"a"), (2, "#x", b"#x b")]
+    h.extend([(None, b"c"), (None, b"d")])  # pisa al más viejo
+    assert len(h) == 3
+    assert h.first_seq == 2 and h.last_seq == 4
+    assert [seq for seq, _, _ in h.since(0)] == [2, 3, 4]
+    assert h.since(3) == [(4, None, b"d")]
+    assert h.last(2) == [(3, None, b"c"), (4, None, b"d")]
+    assert h.last(10) == h.since(0)
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        History(0)
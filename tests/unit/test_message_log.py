@@ -0,0 +1,83 @@
+import os
+
+from src.message_log import MessageLog
+
+
+def _fill(log, n, start=1):
+    for first in range(start, start + n, 5):
+        log.append(first, [
+            ("#r" if seq % 3 == 0 else None, f"m{seq}".encode())
+            for seq in range(first, min(first + 5, start + n))
+        ])
+
+
+def test_append_rotates_segments_and_reads_from_any_sequence(tmp_path):
+    log = MessageLog(str(tmp_path), segment_bytes=500, index_every=64)
+    log.start()
+    _fill(log, 200)
+    got = log.read(120, 3)
+    assert got == [(121, None, b"m121"), (122, None, b"m122"), (123, "#r", b"m123")]
+    assert [seq for seq, _, _ in log.read(0, 1000)] == list(range(1, 201))
+    log.close()
+    names = os.listdir(tmp_path)
+    assert sum(n.endswith(".log") for n in names) > 1
+    assert sum(n.endswith(".idx") for n in names) >= 1
+
+
+def test_reopen_truncates_torn_tail_and_continues(tmp_path):
+    log = MessageLog(str(tmp_path), segment_bytes=500)
+    log.start()
+    _fill(log, 50)
+    log.close()
+    last = sorted(n for n in os.listdir(tmp_path) if n.endswith(".log"))[-1]
+    with open(tmp_path / last, "ab") as f:
+        f.write(b"\x00\x00\x00\x07registro a medio")
+
+    log = MessageLog(str(tmp_path), segment_bytes=500)
+    assert log.last_seq == 50
+    log.start()
+    log.append(51, [(None, b"nuevo")])
+    assert log.read(49, 10) == [(50, None, b"m50"), (51, None, b"nuevo")]
+    log.close()
+
+
+def test_reads_do_not_wait_for_fsync(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    import src.message_log as message_log
+
+    log = MessageLog(str(tmp_path), segment_bytes=200)
+    _fill(log, 10)
+    log.flush()
+    real_fsync, in_fsync, release = os.fsync, threading.Event(), threading.Event()
+
+    def slow_fsync(fd):
+        in_fsync.set()
+        release.wait(5.0)
+        real_fsync(fd)
+
+    monkeypatch.setattr(message_log.os, "fsync", slow_fsync)
+    try:
+        # fsync del activo y de un segmento rotado, ambos en curso
+        for action in (log.sync, lambda: (_fill(log, 10, start=11), log.flush())):
+            in_fsync.clear()
+            t = threading.Thread(target=action)
+            t.start()
+            assert in_fsync.wait(2.0)
+            started = time.monotonic()
+            got = log.read(0, 100, flush=False)
+            assert time.monotonic() - started < 1.0
+            assert [seq for seq, _, _ in got][:10] == list(range(1, 11))
+            release.set()
+            t.join()
+            release.clear()
+    finally:
+        release.set()
+    # sin flush solo se ve lo ya escrito al archivo
+    log.append(21, [(None, b"pendiente")])
+    assert log.flushed_seq == 20
+    assert log.read(20, 10, flush=False) == []
+    assert log.read(20, 10) == [(21, None, b"pendiente")]
+    monkeypatch.undo()
+    log.close()
@@ -0,0 +1,44 @@
+import threading
+
+from src.metrics import Histogram, Metrics
+
+
+def test_histogram_percentiles_are_bucket_upper_bounds():
+    h = Histogram()
+    for v in [1] * 98 + [1000, 5000]:
+        h.observe(v)
+    assert h.count == 100 and h.max == 5000
+    assert h.percentile(0.50) == 1
+    assert h.percentile(0.99) == 1023  # 1000 cae en la cubeta [512, 1023]
+    assert h.percentile(1.0) == 5000   # nunca más que el máximo visto
+    assert Histogram().percentile(0.5) == 0
+
+
+def test_histogram_stays_consistent_across_threads():
+    h = Histogram()
+
+    def hammer(value):
+        for _ in range(20_000):
+            h.observe(value)
+
+    threads = [threading.Thread(target=hammer, args=(v,)) for v in (1, 3, 700, 70_000)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # cubetas, count y total avanzan juntos: ninguna suma se pierde
+    assert h.count == sum(h.counts) == 80_000
+    assert h.total == 20_000 * (1 + 3 + 700 + 70_000)
+    assert h.summary()["avg"] == h.total // h.count
+
+
+def test_render_lists_counters_histograms_and_gauges():
+    m = Metrics()
+    m.received += 3
+    m.fanout_ns.observe(2000)
+    lines = m.render(clients=2)
+    assert lines[-1] == "END"
+    assert "STAT clients 2" in lines
+    assert "STAT received 3" in lines
+    assert "STAT fanout_ns_count 1" in lines
+    assert all(line.startswith("STAT ") for line in lines[:-1])
@@ -0,0 +1,34 @@
+import socket
+
+from src.connection import Connection, OutboundQueue
+from src.nicks import NickIndex
+from src.validation import is_valid_nick
+
+
+def _conn():
+    return Connection(socket.socket(), OutboundQueue())
+
+
+def test_nick_names():
+    assert is_valid_nick("ana_2") is True
+    assert is_valid_nick("") is False
+    assert is_valid_nick("#ana") is False
+    assert is_valid_nick("con espacio") is False
+    assert is_valid_nick("x" * 33) is False
+
+
+def test_register_rename_and_release():
+    idx = NickIndex()
+    a, b = _conn(), _conn()
+    try:
+        assert idx.register("ana", a) is True
+        assert idx.register("ana", b) is False  # de otra conexión
+        assert idx.register("ana", a) is True   # la misma: sin cambios
+        assert idx.register("anita", a) is True  # renombrar libera el anterior
+        assert idx.lookup("ana") is None and idx.lookup("anita") is a
+        assert idx.register("ana", b) is True
+        idx.release(a)
+        assert a.nick is None and idx.lookup("anita") is None
+        assert len(idx) == 1
+    finally:
+        a.sock.close(); b.sock.close()
@@ -18,3 +18,95 @@ def test_recv_line_respects_timeout_and_returns_none_on_eof():
         except: pass
         try: s1.close()
         except: pass
+
+def test_recv_stamped_into_returns_data_and_arrival_time():
+    import time
+    from src.protocol import enable_timestamps, recv_stamped_into
+
+    s1, s2 = socket.socketpair()
+    try:
+        enable_timestamps(s1)
+        before = time.time_ns()
+        s2.sendall(b"hola\n")
+        buf = bytearray(1024)
+        n, arrived = recv_stamped_into(s1, memoryview(buf))
+        assert buf[:n] == b"hola\n"
+        # marca del kernel o de lectura: en todo caso en reloj de pared
+        assert before - 1_000_000_000 < arrived <= time.time_ns()
+        s2.close()
+        assert recv_stamped_into(s1, memoryview(buf))[0] == 0
+    finally:
+        s1.close()
+
+def test_frame_reader_splits_frames_across_reads():
+    from src.protocol import FRAME_CMD, FRAME_MSG, FrameReader, encode_frame
+
+    data = encode_frame(FRAME_MSG, b"hola") + encode_frame(FRAME_CMD, b"JOIN #a")
+    r = FrameReader()
+    got = []
+    buf = bytearray(16)  # buffer compartido del motor: se reescribe en cada recv
+    for i in range(len(data)):  # un byte por vez
+        buf[0] = data[i]
+        got += r.feed(buf, 1)
+    assert got == [(FRAME_MSG, b"hola"), (FRAME_CMD, b"JOIN #a")]
+
+
+def test_frame_reader_keeps_only_the_partial_frame_and_rejects_oversized():
+    import pytest
+    from src.protocol import (
+        FRAME_HEADER, FRAME_MSG, MAX_FRAME, FrameError, FrameReader, encode_frame,
+    )
+
+    r = FrameReader()
+    big = encode_frame(FRAME_MSG, b"x" * MAX_FRAME)
+    frames = r.feed(big * 3 + big[:10])
+    assert len(frames) == 3 and frames[0][1] == b"x" * MAX_FRAME
+    # entre lecturas solo queda el frame incompleto
+    assert len(r.partial) == 10
+    assert r.feed(big[10:]) == [(FRAME_MSG, b"x" * MAX_FRAME)]
+    assert len(r.partial) == 0
+    # un header partido en dos lecturas
+    assert r.feed(big[:3]) == []
+    assert r.feed(big[3:] + big[:1]) == [(FRAME_MSG, b"x" * MAX_FRAME)]
+    r = FrameReader()
+    with pytest.raises(FrameError):
+        r.feed(FRAME_HEADER.pack(MAX_FRAME + 1, FRAME_MSG))
+
+
+def test_send_and_recv_frame_roundtrip():
+    from src.protocol import FRAME_MSG, recv_frame, send_frame
+
+    s1, s2 = socket.socketpair()
+    try:
+        send_frame(s1, FRAME_MSG, "ñandú".encode())
+        assert recv_frame(s2) == (FRAME_MSG, "ñandú".encode())
+        s1.close()
+        assert recv_frame(s2) is None
+    finally:
+        s2.close()
+
+
+def test_compressed_frames_roundtrip_and_reject_bad_payloads():
+    import zlib
+
+    import pytest
+    from src.protocol import (
+        FRAME_MSG, MAX_INFLATE, FrameError, compress_frames, decompress_frames, encode_frame,
+    )
+
+    msgs = [("#general hola %d, ¿alguien sabe?" % i).encode() for i in range(50)]
+    data = b"".join(encode_frame(FRAME_MSG, m) for m in msgs)
+    payload = compress_frames(data)
+    assert len(payload) < len(data) // 3
+    assert decompress_frames(payload) == [(FRAME_MSG, m) for m in msgs]
+    # un solo mensaje corto también gana gracias al diccionario
+    one = encode_frame(FRAME_MSG, b"hola, gracias")
+    assert len(compress_frames(one)) < len(one)
+
+    with pytest.raises(FrameError):
+        decompress_frames(b"no es deflate")
+    with pytest.raises(FrameError):
+        decompress_frames(compress_frames(data[:-3]))  # frame cortado
+    bomb = zlib.compressobj(9, zlib.DEFLATED, -15)
+    with pytest.raises(FrameError):
+        decompress_frames(bomb.compress(b"\0" * (MAX_INFLATE + 1)) + bomb.flush())
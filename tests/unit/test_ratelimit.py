@@ -0,0 +1,77 @@
+import time
+
+from src.ratelimit import TokenBucket
+from src.server import QUEUE_FULL_RETRY, ChatServer
+
+
+def test_bucket_allows_burst_then_reports_wait():
+    bucket = TokenBucket(rate=10, burst=3)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = bucket.take()
+    assert 0 < wait <= 0.1
+    time.sleep(wait)
+    assert bucket.take() == 0.0
+
+
+def test_refund_returns_token():
+    bucket = TokenBucket(rate=1, burst=1)
+    assert bucket.take() == 0.0
+    bucket.refund()
+    assert bucket.take() == 0.0
+
+
+def test_admit_checks_queue_and_both_buckets():
+    import socket
+
+    srv = ChatServer(max_pending=1, rate_limit=100, rate_burst=1, global_rate_limit=100, global_rate_burst=2)
+    a, b = socket.socketpair()
+    try:
+        conn = srv._new_connection(a)
+        other = srv._new_connection(b)
+        assert srv._admit(conn) == 0.0
+        assert srv._admit(conn) > 0          # bucket propio vacío
+        assert srv._admit(other) == 0.0      # el global todavía tenía
+        srv.msg_q.put((0, b"x", None))
+        assert srv._admit(other) == QUEUE_FULL_RETRY
+    finally:
+        a.close(); b.close()
+
+
+def test_only_admitted_items_are_validated():
+    import socket
+    from src.validation import Validator
+
+    class Recording(Validator):
+        def check_many(self, payloads):
+            seen.append(list(payloads))
+            return super().check_many(payloads)
+
+    seen, parked = [], []
+    srv = ChatServer(rate_limit=0.001, rate_burst=2)
+    srv.validator = Recording()
+    srv._throttle = lambda conn, items, index, wait: parked.append(index) or True
+    a, b = socket.socketpair()
+    try:
+        conn = srv._new_connection(a)
+        assert srv.handle_data(conn, b"a\nb\nc\nd\n", 1)
+        # primero el límite: lo que no entró ni se validó
+        assert seen == [[b"a", b"b"]]
+        assert parked == [2]
+        assert srv.msg_q.qsize() == 2
+    finally:
+        a.close(); b.close()
+
+
+def test_binary_switch_refunds_what_it_reparses():
+    import socket
+
+    srv = ChatServer(rate_limit=0.001, rate_burst=5)
+    a, b = socket.socketpair()
+    try:
+        conn = srv._new_connection(a)
+        # "x" se admitió como línea pero se vuelve a leer como frame (incompleto)
+        assert srv.handle_data(conn, b"BINARY\nx\n", 1)
+        assert conn.reader is not None
+        assert round(conn.bucket.tokens) == 4
+    finally:
+        a.close(); b.close()
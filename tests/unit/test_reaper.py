@@ -0,0 +1,31 @@
+import pytest
+
+from src.reaper import IdleReaper
+
+
+class _Conn:
+    def __init__(self, last_active):
+        self.last_active = last_active
+        self.closed = False
+
+
+def test_reaper_returns_only_idle_connections():
+    reaper = IdleReaper(10)
+    idle, busy, gone = _Conn(0), _Conn(0), _Conn(0)
+    for conn in (idle, busy, gone):
+        reaper.add(conn)
+    assert reaper.next_deadline() == 10
+    assert reaper.expired(now=5) == []
+
+    busy.last_active = 8   # recibió algo: vence más tarde
+    gone.closed = True     # cerrada por otro camino: se olvida
+    assert reaper.expired(now=10) == [idle]
+    assert len(reaper) == 1
+    assert reaper.next_deadline() == 18
+    assert reaper.expired(now=18) == [busy]
+    assert reaper.next_deadline() is None
+
+
+def test_reaper_rejects_non_positive_timeout():
+    with pytest.raises(ValueError):
+        IdleReaper(0)
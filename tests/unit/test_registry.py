@@ -0,0 +1,33 @@
+from src.registry import ClientRegistry
+
+
+class _Fake:
+    pass
+
+
+def test_snapshot_is_reused_until_membership_changes():
+    reg = ClientRegistry()
+    a, b = _Fake(), _Fake()
+    reg.add(a)
+    first = reg.snapshot()
+    assert first == (a,)
+    assert reg.snapshot() is first  # sin copia por broadcast
+
+    reg.add(b)
+    second = reg.snapshot()
+    assert second is not first and set(second) == {a, b}
+    # el snapshot viejo no cambia (copy-on-write)
+    assert first == (a,)
+
+
+def test_remove_is_idempotent_and_bumps_version():
+    reg = ClientRegistry()
+    a = _Fake()
+    reg.add(a)
+    v = reg.version
+    assert a in reg
+    assert reg.remove(a) is True
+    assert reg.remove(a) is False
+    assert a not in reg and len(reg) == 0
+    assert reg.version == v + 1
+    assert reg.snapshot() == ()
@@ -0,0 +1,39 @@
+import socket
+
+from src.connection import Connection, OutboundQueue
+from src.rooms import RoomIndex
+from src.validation import is_valid_room
+
+
+def _conn():
+    return Connection(socket.socket(), OutboundQueue())
+
+
+def test_room_names():
+    assert is_valid_room("#general") is True
+    assert is_valid_room("#dev-ops_2") is True
+    assert is_valid_room("general") is False
+    assert is_valid_room("#") is False
+    assert is_valid_room("#con espacio") is False
+    assert is_valid_room("#" + "x" * 33) is False
+
+
+def test_join_part_and_leave_all_keep_index_consistent():
+    idx = RoomIndex()
+    a, b = _conn(), _conn()
+    try:
+        assert idx.join("#uno", a) and idx.join("#uno", b) and idx.join("#dos", a)
+        assert idx.join("#uno", a) is False  # ya era miembro
+        assert set(idx.members("#uno")) == {a, b}
+        assert a.rooms == {"#uno", "#dos"}
+
+        assert idx.part("#uno", b) is True
+        assert idx.part("#uno", b) is False
+        assert idx.members("#uno") == (a,)
+
+        idx.leave_all(a)
+        assert a.rooms == set()
+        assert idx.members("#uno") == () and idx.members("#dos") == ()
+        assert len(idx) == 0  # las salas vacías se borran
+    finally:
+        a.sock.close(); b.sock.close()
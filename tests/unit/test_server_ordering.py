@@ -0,0 +1,154 @@
+import threading
+
+from src.server import ChatServer
+
+
+def test_broadcast_loop_orders_messages_by_arrival():
+    srv = ChatServer(host="127.0.0.1", port=0)
+    sent = []
+    srv._fanout = lambda groups, record=None: sent.extend(p for _room, ps in groups for p in ps)
+    # dos lectores encolaron al revés de como llegaron los datos
+    srv.msg_q.put((200, b"segundo", None))
+    srv.msg_q.put((100, b"primero", None))
+    srv.msg_q.put((300, b"tercero", None))
+    srv.msg_q.put(None)
+
+    t = threading.Thread(target=srv.broadcast_loop)
+    t.start()
+    t.join(timeout=2.0)
+    assert not t.is_alive()
+    assert sent == [b"primero", b"segundo", b"tercero"]
+
+
+def test_broadcast_loop_releases_stamps_from_the_future():
+    import time
+
+    srv = ChatServer(host="127.0.0.1", port=0, batch_linger=0.005)
+    sent = []
+    srv._fanout = lambda groups, record=None: sent.extend(p for _room, ps in groups for p in ps)
+    t = threading.Thread(target=srv.broadcast_loop)
+    t.start()
+    try:
+        # el reloj de pared saltó hacia atrás: la marca del kernel queda adelante
+        srv.msg_q.put((time.time_ns() + 60 * 10**9, b"adelantado", None))
+        deadline = time.monotonic() + 1.0
+        while not sent and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert sent == [b"adelantado"]
+    finally:
+        srv.msg_q.put(None)
+        t.join(timeout=2.0)
+
+
+def test_broadcast_loop_coalesces_batch_into_one_send_per_client():
+    import socket
+    from src.connection import Connection, OutboundQueue
+
+    srv = ChatServer(host="127.0.0.1", port=0)
+    a, b = socket.socketpair()
+    try:
+        conn = Connection(a, OutboundQueue(max_bytes=0, max_messages=0))
+        srv.clients.add(conn)
+        srv._deliver = lambda _conns: None  # solo interesa lo encolado
+        for i in range(3):
+            srv.msg_q.put((i, f"m{i}".encode(), None))
+        srv.msg_q.put(None)
+
+        t = threading.Thread(target=srv.broadcast_loop)
+        t.start()
+        t.join(timeout=2.0)
+        assert conn.outq.nmessages == 3
+        assert conn.outq.pop_batch() == [b"m0\nm1\nm2\n"]
+    finally:
+        a.close(); b.close()
+
+
+def test_broadcaster_registers_backlogged_clients_first():
+    import socket
+
+    srv = ChatServer(host="127.0.0.1", port=0)
+    srv.sock = srv._listen()  # sin hilo de accept: el cliente queda en el backlog
+    srv.running.set()
+    c = socket.create_connection(srv.address, timeout=1.0)
+    try:
+        srv.msg_q.put((0, b"hola", None))
+        srv.msg_q.put(None)
+        t = threading.Thread(target=srv.broadcast_loop)
+        t.start()
+        t.join(timeout=2.0)
+        assert len(srv.clients) == 1
+        assert c.recv(100) == b"hola\n"
+    finally:
+        c.close()
+        srv.stop()
+
+
+def test_one_recv_is_one_queue_item_split_by_batch_max():
+    import socket
+    from src.connection import Connection, OutboundQueue
+
+    srv = ChatServer(host="127.0.0.1", port=0, batch_max=64)
+    a, b = socket.socketpair()
+    try:
+        conn = Connection(a, OutboundQueue(max_bytes=0, max_messages=0))
+        rx = bytearray(b"".join(b"m%d\n" % i for i in range(100)))
+        assert srv.handle_data(conn, rx, 1, len(rx))
+        # 100 mensajes en un solo ítem, que igual cuenta como 100
+        assert srv.msg_q.qsize() == 100
+        assert len(srv.msg_q.queue) == 1
+
+        batches = []
+        srv._fanout = lambda groups, record=None: batches.append(record)
+        srv.msg_q.put(None)
+        t = threading.Thread(target=srv.broadcast_loop)
+        t.start()
+        t.join(timeout=2.0)
+        assert [len(batch) for batch in batches] == [64, 36]
+        assert [p for batch in batches for _room, p in batch] == [b"m%d" % i for i in range(100)]
+        assert srv.metrics.queue_delay_ns.count == 100
+    finally:
+        a.close(); b.close()
+
+
+def test_push_payloads_waits_for_a_binary_switch_in_flight():
+    import socket
+    from src.connection import Connection, OutboundQueue
+    from src.protocol import FRAME_MSG, encode_frame
+
+    srv = ChatServer(host="127.0.0.1", port=0)
+    a, b = socket.socketpair()
+    try:
+        conn = Connection(a, OutboundQueue(max_bytes=0, max_messages=0))
+        # "BINARY" a medio aplicar: la codificación se decide recién al soltarlo
+        with conn.mode_lock:
+            t = threading.Thread(target=srv._push_payloads, args=(conn, [b"dm"], FRAME_MSG))
+            t.start()
+            t.join(timeout=0.1)
+            assert t.is_alive()
+            assert len(conn.outq) == 0
+            conn.binary = True
+        t.join(timeout=2.0)
+        assert not t.is_alive()
+        assert b"".join(conn.outq.pop_batch()) == encode_frame(FRAME_MSG, b"dm")
+    finally:
+        a.close(); b.close()
+
+
+def test_push_payloads_does_not_wait_for_a_fanout():
+    import socket
+    from src.connection import Connection, OutboundQueue
+    from src.protocol import FRAME_MSG
+
+    srv = ChatServer(host="127.0.0.1", port=0)
+    a, b = socket.socketpair()
+    try:
+        conn = Connection(a, OutboundQueue(max_bytes=0, max_messages=0))
+        # la difusión encolando un lote: un mensaje directo no la espera
+        with srv._order_lock:
+            t = threading.Thread(target=srv._push_payloads, args=(conn, [b"dm"], FRAME_MSG))
+            t.start()
+            t.join(timeout=1.0)
+            assert not t.is_alive()
+        assert b"".join(conn.outq.pop_batch()) == b"dm\n"
+    finally:
+        a.close(); b.close()
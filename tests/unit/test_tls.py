@@ -0,0 +1,90 @@
+import shutil
+import socket
+import ssl
+import threading
+
+import pytest
+
+from src.metrics import Metrics
+from src.tls import (
+    TLSHandshaker,
+    generate_self_signed,
+    make_client_context,
+    make_server_context,
+)
+from tests.helpers import wait_for
+
+pytestmark = pytest.mark.skipif(shutil.which("openssl") is None, reason="requiere openssl")
+
+
+@pytest.fixture(scope="module")
+def cert(tmp_path_factory):
+    return generate_self_signed(str(tmp_path_factory.mktemp("tls")))
+
+
+def test_self_signed_cert_loads_and_contexts_enable_tickets(cert):
+    ctx = make_server_context(*cert)
+    assert ctx.num_tickets > 0
+    assert not ctx.options & ssl.OP_NO_TICKET
+    assert make_client_context(cert[0]).verify_mode == ssl.CERT_REQUIRED
+
+
+def test_silent_client_does_not_block_other_handshakes(cert):
+    listener = socket.create_server(("127.0.0.1", 0))
+    ready = []
+    metrics = Metrics()
+    hs = TLSHandshaker(make_server_context(*cert), ready.append, timeout=0.5, metrics=metrics)
+    hs.start()
+    silent = socket.create_connection(listener.getsockname())
+    hs.submit(listener.accept()[0])
+    try:
+        # mientras el mudo sigue en curso, otro cliente negocia completo
+        done = threading.Event()
+
+        def client():
+            raw = socket.create_connection(listener.getsockname(), timeout=3.0)
+            with make_client_context(cert[0]).wrap_socket(raw, server_hostname="localhost"):
+                done.set()
+
+        t = threading.Thread(target=client)
+        t.start()
+        hs.submit(listener.accept()[0])
+        t.join(timeout=3.0)
+        assert done.is_set()
+        assert wait_for(lambda: len(ready) == 1)
+        assert isinstance(ready[0], ssl.SSLSocket)
+        assert metrics.tls_handshakes == 1 and metrics.tls_failed == 0
+
+        # el mudo vence y se cierra
+        assert wait_for(lambda: metrics.tls_failed == 1)
+        assert len(hs) == 0
+        silent.settimeout(1.0)
+        assert silent.recv(100) == b""
+    finally:
+        hs.close()
+        silent.close()
+        listener.close()
+        for s in ready:
+            s.close()
+
+
+def test_plaintext_client_fails_handshake(cert):
+    listener = socket.create_server(("127.0.0.1", 0))
+    metrics = Metrics()
+    hs = TLSHandshaker(make_server_context(*cert), lambda s: s.close(), metrics=metrics)
+    hs.start()
+    plain = socket.create_connection(listener.getsockname(), timeout=1.0)
+    try:
+        plain.sendall(b"hola\n")
+        hs.submit(listener.accept()[0])
+        assert wait_for(lambda: metrics.tls_failed == 1)
+        assert metrics.tls_handshakes == 0
+    finally:
+        hs.close()
+        plain.close()
+        listener.close()
+
+
+def test_handshaker_rejects_non_positive_timeout(cert):
+    with pytest.raises(ValueError):
+        TLSHandshaker(make_server_context(*cert), print, timeout=0)
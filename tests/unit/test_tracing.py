@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from src.tracing import SPANS, Tracer
+
+
+def _item(payload=b"hola"):
+    return (time.time_ns(), payload, None)
+
+
+def test_sampling_and_stage_spans():
+    tracer = Tracer(sample=3, slowest=2)
+    items = [_item() for _ in range(9)]
+    for item in items:
+        tracer.enqueued(item)
+    traces = [t for t in (tracer.dequeued(item) for item in items) if t is not None]
+    assert len(traces) == 3  # uno de cada 3
+    assert tracer.dequeued(items[2]) is None  # ya salió
+
+    tracer.publishing(traces)
+    assert tracer.take_batch() is traces
+    assert tracer.take_batch() is None  # una sola vez por lote
+    tracer.fanned_out(traces)
+    tracer.wrote(traces, "a")
+    time.sleep(0.002)
+    tracer.wrote(traces[:1], "b")
+    assert tracer.traces == 3
+    assert tracer.spans["fanout"].count == 3 and tracer.spans["write"].count == 4
+    for t in traces:
+        assert t.read <= t.enqueue <= t.dequeue <= t.batch <= t.fanout <= t.write
+    # los dos más lentos, del más lento al más rápido
+    slow = tracer.slowest_recipients()
+    assert [who for _, who in slow] == ["b", "a"] and slow[0][0] >= slow[1][0]
+
+    lines = tracer.render()
+    assert lines[0] == "TRACE sampled 3 1/3"
+    assert [line.split()[1] for line in lines[1:1 + len(SPANS)]] == list(SPANS)
+    assert lines[-3].startswith("TRACE slow ") and lines[-1] == "END"
+
+
+def test_batch_traces_are_per_thread():
+    import threading
+
+    tracer = Tracer(sample=1)
+    item = _item()
+    tracer.enqueued(item)
+    tracer.publishing([tracer.dequeued(item)])
+    seen = []
+    t = threading.Thread(target=lambda: seen.append(tracer.take_batch()))
+    t.start(); t.join()
+    assert seen == [None] and tracer.take_batch() is not None
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        Tracer(sample=0)
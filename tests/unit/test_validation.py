@@ -20,3 +20,32 @@ def test_rejects_too_long():
 
 def test_accepts_exact_limit():
     assert is_valid_message("a" * 256) is True
+
+def test_payload_matches_text_rules():
+    from src.validation import is_valid_payload
+    for text in ["hola", "  hola  ", "", "   ", "\x1c", "a" * 256, "a" * 257, "ñ" * 256, "ñ" * 257]:
+        assert is_valid_payload(text.encode()) is is_valid_message(text)
+    assert is_valid_payload(b"dos\nlineas") is False
+    assert is_valid_payload(b"\xff") is False
+
+def test_validator_units_and_control():
+    from src.validation import BYTES, Validator
+    chars, nbytes = Validator(max_len=4), Validator(max_len=4, unit=BYTES)
+    assert chars.check("ññññ".encode()) is True
+    assert nbytes.check("ññññ".encode()) is False
+    assert nbytes.check("ññ".encode()) is True
+    strict = Validator(reject_control=True)
+    assert strict.check(b"con\ttab") is True
+    assert strict.check(b"hola\r") is True  # '\r' final de una línea CRLF
+    for bad in [b"a\x00b", b"a\x1bb", b"a\x7f", "a\x85".encode()]:
+        assert strict.check(bad) is False
+        assert Validator().check(bad) is True
+
+def test_check_many_matches_check():
+    from src.validation import Validator
+    batch = [b"hola", b"   ", b"", b"a" * 257, "ñandú".encode(), b"\xff", b"x\r", b"dos\nlineas"]
+    for validator in (Validator(), Validator(max_len=5, reject_control=True)):
+        assert validator.check_many(batch) == [validator.check(p) for p in batch]
+        assert validator.check_many([b"ok"] * 3) == [True] * 3
+        assert validator.check_many(["ñu".encode()] * 3) == [True] * 3
+    assert Validator().check_many([]) == []